@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the throughput of the bulk import.
+
+Random transactions are imported into a new database with the pipeline of
+`import_heath_transactions`, once in chronological order and once in random
+order, which touches many more rollups and checkpoints per batch. The rows
+per second of each order are printed and written to a JSON file::
+
+    python benchmarks/imports.py --size 1000000 --output imports.json
+
+Pass `--compare` with the output of an earlier run to print the changes, and
+`--min-rate` to fail if an order imports fewer rows per second, for example
+in a scheduled job that catches regressions of the ledger aggregates.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+from heath import models
+from heath.models.meta import Base
+from heath.scripts.import_transactions import Row, import_rows
+
+from routes import DEFAULT_SETTINGS, seed_rows
+
+
+ORDERS = ("sorted", "random")
+
+
+def rows_in_order(size: int, seed: int, order: str) -> List[Row]:
+    """Return the seeded rows, shuffled for the random order."""
+    rows = list(seed_rows(size, seed))
+    if order == "random":
+        random.Random(seed).shuffle(rows)
+    return rows
+
+
+def measure(directory: str, rows: List[Row], order: str, batch_size: int,
+            settings: Dict[str, str]) -> float:
+    """Import the rows into a new database, return the rows per second."""
+    path = os.path.join(directory, "import-{}.sqlite".format(order))
+    engine = models.get_engine(dict(
+        settings,
+        **{"sqlalchemy.url": "sqlite:///" + path}
+    ))
+    Base.metadata.create_all(engine)
+    started = time.perf_counter()
+    import_rows(
+        engine,
+        rows,
+        batch_size=batch_size,
+        commit_every=10,
+        report=lambda message: None,
+    )
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return len(rows) / elapsed
+
+
+def compare(rates: Dict[str, float], previous_path: str):
+    with open(previous_path) as stream:
+        previous = json.load(stream)["rows_per_second"]
+    for order in ORDERS:
+        if not previous.get(order):
+            continue
+        print("{:<8} {:>9.0f} rows/s -> {:>9.0f} rows/s ({:+.0%})".format(
+            order,
+            previous[order],
+            rates[order],
+            rates[order] / previous[order] - 1,
+        ))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the throughput of the bulk import.",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=100000,
+        help="Number of imported transactions (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=1,
+        help="Seed of the random transactions (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        default=10000,
+        help="Rows per batch (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--output",
+        default="import-results.json",
+        help="File to write the results to (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--compare",
+        help="Results of an earlier run to compare with.",
+    )
+    parser.add_argument(
+        "--min-rate",
+        type=float,
+        help="Fail if an order imports fewer rows per second.",
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    rates = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for order in ORDERS:
+            rows = rows_in_order(args.size, args.seed, order)
+            rates[order] = measure(
+                directory,
+                rows,
+                order,
+                args.batch_size,
+                DEFAULT_SETTINGS,
+            )
+            print("{:<8} {:>9.0f} rows/s".format(order, rates[order]))
+    output = {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "size": args.size,
+        "batch_size": args.batch_size,
+        "rows_per_second": rates,
+    }
+    with open(args.output, "w") as stream:
+        json.dump(output, stream, indent=2)
+    if args.compare:
+        compare(rates, args.compare)
+    if args.min_rate is not None:
+        slow = [order for order in ORDERS if rates[order] < args.min_rate]
+        if slow:
+            print("Below {:.0f} rows/s: {}".format(
+                args.min_rate, ", ".join(slow)))
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
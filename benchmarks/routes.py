@@ -0,0 +1,435 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark every route of the application against large datasets.
+
+For each dataset size a database with that many transactions spread over
+many accounts is seeded with the bulk import pipeline. Seeded databases are
+cached in the data directory and copied before each run, because some of
+the benchmarked requests write. Every route in `heath/routes.py` is then
+requested through WebTest against the app created by `heath.main`, and the
+p50/p95 latency and the peak Python memory of each request are written to a
+JSON file::
+
+    python benchmarks/routes.py --sizes 10000 100000 1000000 \\
+        --output results.json
+
+Pass `--compare` with the output of an earlier run to print the change of
+the p95 latency per route.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import shutil
+import sqlite3
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional
+
+from pyramid.interfaces import IRoutesMapper
+from pyramid.paster import get_appsettings
+from webtest import TestApp
+
+from heath import main, models
+from heath.models.meta import Base
+from heath.scripts.import_transactions import Row, import_rows
+
+
+DEFAULT_SIZES = (10000, 100000, 1000000)
+
+# Settings used unless a configuration file is given. They match the
+# production profile.
+DEFAULT_SETTINGS = {
+    "heath.sqlite.journal_mode": "wal",
+    "heath.sqlite.synchronous": "normal",
+    "heath.sqlite.busy_timeout": "5000",
+    "heath.sqlite.mmap_size": "268435456",
+    "heath.sqlite.cache_size": "-65536",
+    "heath.sqlite.temp_store": "memory",
+    "heath.timing": "true",
+}
+
+# One account per this many transactions, but at least ten.
+TRANSACTIONS_PER_ACCOUNT = 1000
+SEED_PERIOD = timedelta(days=5 * 365)
+
+
+class Case(NamedTuple):
+    """A request to benchmark. `path` gets the dataset size and iteration."""
+
+    name: str
+    route: str
+    path: Callable[[int, int], str]
+    method: str = "GET"
+    params: Optional[Callable[[int], Dict[str, str]]] = None
+    status: int = 200
+    slow: bool = False
+    # Send the ETag of the page, fetched once before the requests, in
+    # If-None-Match like a polling client. The path may not depend on the
+    # iteration then.
+    conditional: bool = False
+    # Sent with every request of the case.
+    headers: Optional[Dict[str, str]] = None
+
+
+def account_count(size: int) -> int:
+    return max(10, size // TRANSACTIONS_PER_ACCOUNT)
+
+
+CASES = (
+    Case("landing", "landing", lambda size, i: "/"),
+    Case("home", "home", lambda size, i: "/home"),
+    Case("status", "status", lambda size, i: "/status"),
+    Case("static", "__static/",
+         lambda size, i: "/static/theme.css"),
+    Case("account create form", "accounts.create",
+         lambda size, i: "/accounts/create"),
+    Case("account create", "accounts.create",
+         lambda size, i: "/accounts/create", method="POST",
+         params=lambda i: {"name": "Benchmark {}".format(i)}, status=302),
+    Case("account balance as of", "accounts.balance",
+         lambda size, i: "/accounts/{}/balance?as_of=2022-{:02d}-15".format(
+             i % account_count(size) + 1, i % 12 + 1)),
+    Case("transaction list", "transaction.list",
+         lambda size, i: "/transactions/"),
+    Case("transaction list account", "transaction.list",
+         lambda size, i: "/transactions/?account={}".format(
+             i % account_count(size) + 1)),
+    Case("transaction list all", "transaction.list",
+         lambda size, i: "/transactions/?all=true", slow=True),
+    Case("transaction list gzip", "transaction.list",
+         lambda size, i: "/transactions/",
+         headers={"Accept-Encoding": "gzip"}),
+    Case("transaction list all gzip", "transaction.list",
+         lambda size, i: "/transactions/?all=true", slow=True,
+         headers={"Accept-Encoding": "gzip"}),
+    Case("transaction list not modified", "transaction.list",
+         lambda size, i: "/transactions/", status=304, conditional=True),
+    Case("transaction search", "transaction.search",
+         lambda size, i: "/transactions/search?q=transaction+{}".format(
+             (i * 7919) % size)),
+    # Every seeded description contains this word.
+    Case("transaction search common word", "transaction.search",
+         lambda size, i: "/transactions/search?q=transaction"),
+    Case("transaction create form", "transaction.create",
+         lambda size, i: "/transactions/create"),
+    Case("transaction create", "transaction.create",
+         lambda size, i: "/transactions/create", method="POST",
+         params=lambda i: {"description": "Benchmark", "amount": "1.00"},
+         status=302),
+    Case("transaction detail", "transaction.detail",
+         lambda size, i: "/transactions/{}".format(size // 2 + i)),
+    Case("transaction update form", "transaction.update",
+         lambda size, i: "/transactions/{}/update".format(size // 2 + i)),
+    Case("transaction update", "transaction.update",
+         lambda size, i: "/transactions/{}/update".format(size // 2 + i),
+         method="POST",
+         params=lambda i: {"description": "Updated", "amount": "2.00"},
+         status=302),
+    Case("transaction delete form", "transaction.delete",
+         lambda size, i: "/transactions/{}/delete".format(size // 3 + i)),
+    Case("transaction delete", "transaction.delete",
+         lambda size, i: "/transactions/{}/delete".format(size // 3 + i),
+         method="POST", params=lambda i: {"delete.confirm": "delete.confirm"},
+         status=302),
+    Case("reports", "reports", lambda size, i: "/reports/"),
+    Case("reports weekly account", "reports",
+         lambda size, i: "/reports/?period=week&account={}".format(
+             i % account_count(size) + 1)),
+    Case("transaction export csv", "transaction.export",
+         lambda size, i: "/transactions/export.csv", slow=True),
+    Case("transaction export ndjson", "transaction.export",
+         lambda size, i: "/transactions/export.ndjson", slow=True),
+)
+
+
+def seed_rows(size: int, seed: int) -> Iterator[Row]:
+    """Yield `size` random transactions in chronological order."""
+    generator = random.Random(seed)
+    accounts = account_count(size)
+    start = datetime(2020, 1, 1)
+    step = SEED_PERIOD / size
+    for number in range(size):
+        yield Row(
+            description="Transaction {}".format(number),
+            amount=Decimal(generator.randint(-50000, 50000)).scaleb(-2),
+            created=start + step * number,
+            account="Account {}".format(generator.randrange(accounts)),
+        )
+
+
+def seeded_database(data_dir: str, size: int, seed: int, settings) -> str:
+    """Return the path of a seeded database, creating it if needed."""
+    path = os.path.join(data_dir, "heath-{}-{}.sqlite".format(size, seed))
+    if os.path.exists(path):
+        return path
+    partial = path + ".partial"
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(partial + suffix):
+            os.remove(partial + suffix)
+    engine = models.get_engine(dict(
+        settings,
+        **{"sqlalchemy.url": "sqlite:///" + partial}
+    ))
+    Base.metadata.create_all(engine)
+    import_rows(
+        engine,
+        seed_rows(size, seed),
+        batch_size=10000,
+        commit_every=10,
+        report=lambda message: print(message, file=sys.stderr),
+    )
+    engine.dispose()
+    # Fold the WAL into the database file, so it can be copied alone.
+    with sqlite3.connect(partial) as connection:
+        connection.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        connection.execute("PRAGMA journal_mode = delete")
+    os.replace(partial, path)
+    return path
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    """Return the nearest-rank percentile of the values."""
+    ordered = sorted(values)
+    index = max(0, int(round(fraction * len(ordered) + 0.5)) - 1)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def drain_body(app):
+    """
+    Consume the response body inside the app and hand an empty one on.
+
+    WebTest buffers the whole body, which would dominate the memory of the
+    export routes. The size of the body is passed on in a header.
+    """
+    def wrapper(environ, start_response):
+        captured = {}
+
+        def capture(status, headers, exc_info=None):
+            captured["status"] = status
+            captured["headers"] = [
+                (name, value) for name, value in headers
+                if name.lower() != "content-length"
+            ]
+            return lambda data: None
+
+        app_iter = app(environ, capture)
+        size = 0
+        try:
+            for chunk in app_iter:
+                size += len(chunk)
+        finally:
+            if hasattr(app_iter, "close"):
+                app_iter.close()
+        start_response(
+            captured["status"],
+            captured["headers"] + [("X-Benchmark-Body-Size", str(size))],
+        )
+        return [b""]
+
+    return wrapper
+
+
+def request(testapp: TestApp, case: Case, size: int, iteration: int,
+            headers: Optional[Dict[str, str]] = None):
+    path = case.path(size, iteration)
+    params = case.params(iteration) if case.params else None
+    headers = dict(case.headers or {}, **(headers or {}))
+    if case.method == "POST":
+        return testapp.post(path, params, status=case.status)
+    return testapp.get(path, params, headers=headers, status=case.status)
+
+
+def benchmark_case(testapp, case, size, iterations, warmup) -> Dict:
+    """Time `iterations` requests, then measure the memory of one more."""
+    headers = None
+    if case.conditional:
+        etag = testapp.get(
+            case.path(size, 0),
+            headers=case.headers,
+        ).headers["ETag"]
+        headers = {"If-None-Match": etag}
+    for iteration in range(warmup):
+        request(testapp, case, size, iteration, headers)
+    durations = []
+    for iteration in range(warmup, warmup + iterations):
+        started = time.perf_counter()
+        response = request(testapp, case, size, iteration, headers)
+        durations.append((time.perf_counter() - started) * 1000)
+
+    tracemalloc.start()
+    try:
+        request(testapp, case, size, warmup + iterations, headers)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "size": size,
+        "name": case.name,
+        "route": case.route,
+        "method": case.method,
+        "iterations": iterations,
+        "p50_ms": round(percentile(durations, 0.50), 3),
+        "p95_ms": round(percentile(durations, 0.95), 3),
+        "mean_ms": round(sum(durations) / len(durations), 3),
+        "peak_memory_kib": round(peak / 1024, 1),
+        "body_bytes": int(response.headers["X-Benchmark-Body-Size"]),
+    }
+
+
+def check_coverage(app):
+    """Fail if a route of the application has no benchmark case."""
+    routes = set(
+        route.name
+        for route in app.registry.getUtility(IRoutesMapper).get_routes()
+    )
+    missing = routes - set(case.route for case in CASES)
+    if missing:
+        raise SystemExit(
+            "Routes without benchmark: {}".format(", ".join(sorted(missing))))
+
+
+def benchmark_size(args, settings, size) -> List[Dict]:
+    source = seeded_database(args.data_dir, size, args.seed, settings)
+    path = os.path.join(args.data_dir, "run-{}.sqlite".format(size))
+    shutil.copyfile(source, path)
+    app = main({}, **dict(settings, **{"sqlalchemy.url": "sqlite:///" + path}))
+    check_coverage(app)
+    testapp = TestApp(drain_body(app))
+
+    results = []
+    for case in CASES:
+        if args.only and case.name not in args.only:
+            continue
+        iterations = args.slow_iterations if case.slow else args.iterations
+        result = benchmark_case(testapp, case, size, iterations, args.warmup)
+        print(
+            "{size:>8} {name:<28} p50 {p50_ms:>9.2f}ms "
+            "p95 {p95_ms:>9.2f}ms peak {peak_memory_kib:>10.1f}KiB".format(
+                **result),
+            file=sys.stderr,
+        )
+        results.append(result)
+
+    app.registry["engine"].dispose()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    return results
+
+
+def compare(results: List[Dict], previous_path: str):
+    """Print the change of the p95 latency against an earlier run."""
+    with open(previous_path) as stream:
+        previous = dict(
+            ((result["size"], result["name"]), result)
+            for result in json.load(stream)["results"]
+        )
+    for result in results:
+        before = previous.get((result["size"], result["name"]))
+        if not before or not before["p95_ms"]:
+            continue
+        change = result["p95_ms"] / before["p95_ms"] - 1
+        print("{:>8} {:<28} p95 {:>9.2f}ms -> {:>9.2f}ms ({:+.0%})".format(
+            result["size"],
+            result["name"],
+            before["p95_ms"],
+            result["p95_ms"],
+            change,
+        ))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the routes against seeded databases.",
+    )
+    parser.add_argument(
+        "--config",
+        help="Configuration file to take the settings from. The database "
+             "URL is always replaced.",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=DEFAULT_SIZES,
+        help="Number of transactions to seed (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--iterations",
+        type=int,
+        default=50,
+        help="Timed requests per route (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--slow-iterations",
+        type=int,
+        default=5,
+        help="Timed requests per export route (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--warmup",
+        type=int,
+        default=3,
+        help="Untimed requests per route (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--only",
+        action="append",
+        help="Only run the named benchmark. Can be repeated.",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument(
+        "--data-dir",
+        default=os.path.join(os.path.dirname(__file__), "data"),
+        help="Directory for the seeded databases (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--output",
+        default="benchmark-results.json",
+        help="File to write the results to (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--compare",
+        help="Results of an earlier run to compare with.",
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main_benchmark(argv=sys.argv):
+    args = parse_args(argv)
+    settings = (
+        dict(get_appsettings(args.config)) if args.config
+        else dict(DEFAULT_SETTINGS)
+    )
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = []
+    for size in args.sizes:
+        results.extend(benchmark_size(args, settings, size))
+
+    output = {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "seed": args.seed,
+        "peak_rss_kib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+    with open(args.output, "w") as stream:
+        json.dump(output, stream, indent=2)
+    if args.compare:
+        compare(results, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_benchmark())
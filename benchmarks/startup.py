@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+
+"""
+Benchmark the start of a worker process.
+
+Every run starts a new Python process, which imports `heath`, creates the
+application with `heath.main`, warms it up if ``heath.warmup`` is set and
+requests a page. The durations of the import, of `main()`, of the warm-up
+and of the first two requests, and the time from the start of the process
+to the first response are written to a JSON file::
+
+    python benchmarks/startup.py --runs 20 --output startup.json
+
+The page is requested from an empty database unless `--database` names a
+seeded one, like the databases cached by `benchmarks/routes.py`. Pass
+`--compare` with the output of an earlier run to print the changes.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List
+
+
+PHASES = (
+    "process_ms",
+    "import_ms",
+    "main_ms",
+    "warmup_ms",
+    "first_request_ms",
+    "second_request_ms",
+    "first_response_ms",
+)
+
+
+def measure(settings: Dict[str, str], path: str) -> Dict:
+    """Start the application in this process and time the phases."""
+    started = time.perf_counter()
+    from heath import main
+    imported = time.perf_counter()
+    app = main({}, **settings)
+    created = time.perf_counter()
+    from pyramid.settings import asbool
+    if asbool(settings.get("heath.warmup", False)):
+        # Like the server of the production configuration.
+        from heath.warmup import warm_up
+        warm_up(app)
+    warmed = time.perf_counter()
+
+    from webob import Request
+    durations = []
+    for _ in range(2):
+        request_started = time.perf_counter()
+        response = Request.blank(path).get_response(app)
+        if response.status_code != 200:
+            raise SystemExit("{} answered with {}".format(
+                path, response.status))
+        durations.append(time.perf_counter() - request_started)
+        if len(durations) == 1:
+            # Wall clock time, compared with the start of the process.
+            first_response = time.time()
+
+    return {
+        "import_ms": (imported - started) * 1000,
+        "main_ms": (created - imported) * 1000,
+        "warmup_ms": (warmed - created) * 1000,
+        "first_request_ms": durations[0] * 1000,
+        "second_request_ms": durations[1] * 1000,
+        "first_response": first_response,
+        "modules": len(sys.modules),
+    }
+
+
+def run(settings: Dict[str, str], path: str) -> Dict:
+    """Measure the start in a new process."""
+    started = time.time()
+    process = subprocess.run(
+        [sys.executable, __file__, "--measure", json.dumps(settings), path],
+        check=True,
+        stdout=subprocess.PIPE,
+    )
+    result = json.loads(process.stdout)
+    result["process_ms"] = (time.time() - started) * 1000
+    result["first_response_ms"] = (
+        result.pop("first_response") - started) * 1000
+    return result
+
+
+def summarize(runs: List[Dict]) -> Dict:
+    summary = {
+        phase: round(statistics.median(run[phase] for run in runs), 3)
+        for phase in PHASES
+    }
+    summary["modules"] = runs[0]["modules"]
+    return summary
+
+
+def empty_database(directory: str) -> str:
+    from sqlalchemy import create_engine
+    from heath.models.meta import Base
+    url = "sqlite:///" + os.path.join(directory, "startup.sqlite")
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+def compare(summary: Dict, previous_path: str):
+    with open(previous_path) as stream:
+        previous = json.load(stream)["median"]
+    for phase in PHASES:
+        if not previous.get(phase):
+            continue
+        print("{:<20} {:>9.2f}ms -> {:>9.2f}ms ({:+.0%})".format(
+            phase,
+            previous[phase],
+            summary[phase],
+            summary[phase] / previous[phase] - 1,
+        ))
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Benchmark the start of a worker process.",
+    )
+    parser.add_argument(
+        "--config",
+        help="Configuration file to take the settings from. The database "
+             "URL is always replaced.",
+    )
+    parser.add_argument(
+        "--database",
+        help="SQLite database file to start with (default: a new empty "
+             "database).",
+    )
+    parser.add_argument(
+        "--path",
+        default="/transactions/",
+        help="Page requested after the start (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--runs",
+        type=int,
+        default=10,
+        help="Number of started processes (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--output",
+        default="startup-results.json",
+        help="File to write the results to (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--compare",
+        help="Results of an earlier run to compare with.",
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main_measure(argv):
+    """Entry point of the measured processes."""
+    print(json.dumps(measure(json.loads(argv[2]), argv[3])))
+    return 0
+
+
+def main_benchmark(argv=sys.argv):
+    args = parse_args(argv)
+    from pyramid.paster import get_appsettings
+    from routes import DEFAULT_SETTINGS
+    settings = (
+        dict(get_appsettings(args.config)) if args.config
+        else dict(DEFAULT_SETTINGS)
+    )
+
+    with tempfile.TemporaryDirectory() as directory:
+        settings["sqlalchemy.url"] = (
+            "sqlite:///" + os.path.abspath(args.database) if args.database
+            else empty_database(directory)
+        )
+        runs = [run(settings, args.path) for _ in range(args.runs)]
+
+    summary = summarize(runs)
+    for phase in PHASES:
+        print("{:<20} p50 {:>9.2f}ms".format(phase, summary[phase]))
+    output = {
+        "created": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "path": args.path,
+        "median": summary,
+        "runs": runs,
+    }
+    with open(args.output, "w") as stream:
+        json.dump(output, stream, indent=2)
+    if args.compare:
+        compare(summary, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--measure"]:
+        sys.exit(main_measure(sys.argv))
+    sys.exit(main_benchmark())
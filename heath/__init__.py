@@ -6,7 +6,13 @@ def main(global_config, **settings):
     """
     with Configurator(settings=settings) as config:
         config.include('.models')
+        config.include('.timing')
+        config.include('.compression')
+        config.include('.queryguard')
+        config.include('.httpcache')
+        config.include('.warmup')
         config.include('pyramid_jinja2')
+        config.include('.fragments')
         config.include('.routes')
-        config.scan()
+        config.scan('.views')
     return config.make_wsgi_app()
@@ -13,6 +13,11 @@ settings = get_appsettings(config.config_file_name)
 target_metadata = Base.metadata
 
 
+def include_name(name, type_, parent_names):
+    """Leave the full-text index and its shadow tables out of comparisons."""
+    return not (type_ == "table" and name.startswith("transactions_fts"))
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -47,6 +52,7 @@ def run_migrations_online():
         # these have to be done as "batch" migrations.
         # See also: https://alembic.sqlalchemy.org/en/latest/batch.html
         render_as_batch=True,
+        include_name=include_name,
     )
 
     try:
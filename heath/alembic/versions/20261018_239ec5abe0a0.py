@@ -0,0 +1,60 @@
+"""Add spending rollups
+
+Revision ID: 239ec5abe0a0
+Revises: dc0b42fddedc
+Create Date: 2026-10-18 03:24:49.768139
+
+The rollups are filled from the existing transactions. Weeks start on
+Monday, the same as in `heath.models.rollup`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '239ec5abe0a0'
+down_revision = 'dc0b42fddedc'
+branch_labels = None
+depends_on = None
+
+# SQLite expressions of the first day of the week and month of `created`.
+BUCKETS = {
+    'week': "date(created, 'weekday 0', '-6 days')",
+    'month': "date(created, 'start of month')",
+}
+
+def upgrade():
+    op.create_table('spending_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('period', sa.Text(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=True),
+    sa.Column('bucket', sa.Date(), nullable=False),
+    sa.Column('income', sa.BigInteger(), nullable=False),
+    sa.Column('expenses', sa.BigInteger(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_spending_rollups'))
+    )
+    with op.batch_alter_table('spending_rollups', schema=None) as batch_op:
+        batch_op.create_index('ix_spending_rollups_period_bucket_account_id', ['period', 'bucket', 'account_id'], unique=False)
+
+    # Backfill the rollups from the existing transactions.
+    for period, bucket in BUCKETS.items():
+        op.execute(
+            "INSERT INTO spending_rollups "
+            "(period, account_id, bucket, income, expenses, transaction_count) "
+            "SELECT '{period}', account_id, {bucket}, "
+            "COALESCE(SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END), 0), "
+            "COALESCE(SUM(CASE WHEN amount <= 0 THEN amount ELSE 0 END), 0), "
+            "COUNT(id) FROM transactions WHERE created IS NOT NULL "
+            "GROUP BY account_id, {bucket}".format(
+                period=period,
+                bucket=bucket,
+            )
+        )
+
+def downgrade():
+    with op.batch_alter_table('spending_rollups', schema=None) as batch_op:
+        batch_op.drop_index('ix_spending_rollups_period_bucket_account_id')
+
+    op.drop_table('spending_rollups')
@@ -0,0 +1,34 @@
+"""Add unique key of spending rollups
+
+Revision ID: 3a4790dd9ca6
+Revises: d317dd9c178f
+Create Date: 2026-10-18 04:37:17.056544
+
+The key is the conflict target of the upsert of the ledger changes. Rows
+without an account are indexed with an account id of 0, because a unique
+index treats every NULL as distinct.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3a4790dd9ca6'
+down_revision = 'd317dd9c178f'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index(
+        'ux_spending_rollups_period_account_id_bucket',
+        'spending_rollups',
+        ['period', sa.text('ifnull(account_id, 0)'), 'bucket'],
+        unique=True,
+    )
+
+def downgrade():
+    op.drop_index(
+        'ux_spending_rollups_period_account_id_bucket',
+        table_name='spending_rollups',
+    )
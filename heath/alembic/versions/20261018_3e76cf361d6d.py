@@ -0,0 +1,63 @@
+"""Add full-text search index
+
+Revision ID: 3e76cf361d6d
+Revises: d5aaa0c35103
+Create Date: 2026-10-18 03:34:50.471186
+
+The FTS5 index of the transaction descriptions is an external content table,
+kept in sync by triggers and filled from the existing transactions, as in
+`heath.models.search`. It is skipped if SQLite is compiled without FTS5;
+searches then fall back to scanning the descriptions.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3e76cf361d6d'
+down_revision = 'd5aaa0c35103'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    bind = op.get_bind()
+    try:
+        bind.exec_driver_sql(
+            "CREATE VIRTUAL TABLE temp.heath_fts5_probe USING fts5(probe)")
+    except sa.exc.OperationalError:
+        return
+    bind.exec_driver_sql("DROP TABLE temp.heath_fts5_probe")
+
+    op.execute(
+        "CREATE VIRTUAL TABLE transactions_fts USING fts5("
+        "description, content='transactions', content_rowid='id', "
+        "prefix='2 3', tokenize='unicode61 remove_diacritics 2')"
+    )
+    op.execute(
+        "CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions "
+        "BEGIN INSERT INTO transactions_fts (rowid, description) "
+        "VALUES (new.id, new.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions "
+        "BEGIN INSERT INTO transactions_fts (transactions_fts, rowid, "
+        "description) VALUES ('delete', old.id, old.description); END"
+    )
+    op.execute(
+        "CREATE TRIGGER transactions_fts_update "
+        "AFTER UPDATE OF description ON transactions "
+        "BEGIN INSERT INTO transactions_fts (transactions_fts, rowid, "
+        "description) VALUES ('delete', old.id, old.description); "
+        "INSERT INTO transactions_fts (rowid, description) "
+        "VALUES (new.id, new.description); END"
+    )
+    op.execute(
+        "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')"
+    )
+
+def downgrade():
+    op.execute("DROP TRIGGER IF EXISTS transactions_fts_insert")
+    op.execute("DROP TRIGGER IF EXISTS transactions_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS transactions_fts_update")
+    op.execute("DROP TABLE IF EXISTS transactions_fts")
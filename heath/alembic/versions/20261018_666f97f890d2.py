@@ -0,0 +1,32 @@
+"""Add ledger summary
+
+Revision ID: 666f97f890d2
+Revises: 310b816b25b6
+Create Date: 2026-10-18 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '666f97f890d2'
+down_revision = '310b816b25b6'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('ledger_summary',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total', sa.Float(precision=2, decimal_return_scale=2), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_ledger_summary'))
+    )
+    # Backfill the summary from the existing transactions.
+    op.execute(
+        "INSERT INTO ledger_summary (id, total, transaction_count) "
+        "SELECT 1, COALESCE(SUM(amount), 0.0), COUNT(id) FROM transactions"
+    )
+
+def downgrade():
+    op.drop_table('ledger_summary')
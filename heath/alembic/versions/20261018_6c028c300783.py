@@ -0,0 +1,24 @@
+"""Add data version
+
+Revision ID: 6c028c300783
+Revises: 3a4790dd9ca6
+Create Date: 2026-10-18 04:47:09.337010
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6c028c300783'
+down_revision = '3a4790dd9ca6'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('ledger_summary', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('data_version', sa.Integer(), server_default='0', nullable=False))
+
+def downgrade():
+    with op.batch_alter_table('ledger_summary', schema=None) as batch_op:
+        batch_op.drop_column('data_version')
@@ -0,0 +1,39 @@
+"""Add cached balances to accounts
+
+Revision ID: 79a10fcc819c
+Revises: 666f97f890d2
+Create Date: 2026-10-18 10:02:17.220934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '79a10fcc819c'
+down_revision = '666f97f890d2'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('balance', sa.Float(precision=2, decimal_return_scale=2), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('transaction_count', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('last_activity', sa.DateTime(), nullable=True))
+
+    # Backfill the cached values from the existing transactions.
+    op.execute(
+        "UPDATE accounts SET "
+        "balance = COALESCE((SELECT SUM(amount) FROM transactions "
+        "WHERE transactions.account_id = accounts.id), 0.0), "
+        "transaction_count = (SELECT COUNT(id) FROM transactions "
+        "WHERE transactions.account_id = accounts.id), "
+        "last_activity = (SELECT MAX(created) FROM transactions "
+        "WHERE transactions.account_id = accounts.id)"
+    )
+
+def downgrade():
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.drop_column('last_activity')
+        batch_op.drop_column('transaction_count')
+        batch_op.drop_column('balance')
@@ -0,0 +1,26 @@
+"""Add indexes for listing and account lookups
+
+Revision ID: 873d7843834a
+Revises: d25e6b878324
+Create Date: 2026-10-18 13:05:31.662710
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '873d7843834a'
+down_revision = 'd25e6b878324'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_created_id', ['created', 'id'], unique=False)
+        batch_op.create_index('ix_transactions_account_id_created', ['account_id', 'created'], unique=False)
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_account_id_created')
+        batch_op.drop_index('ix_transactions_created_id')
@@ -0,0 +1,95 @@
+"""Store amounts as integer cents
+
+Revision ID: d25e6b878324
+Revises: 79a10fcc819c
+Create Date: 2026-10-18 11:40:53.118407
+
+The amounts of the transactions are converted in chunks, each committed on
+its own, so the table is never locked for long. The conversion is
+resumable: rows that already have a value in `amount_cents` are skipped, so
+an interrupted upgrade can simply be started again. The chunk size can be
+set with `alembic -x chunk_size=50000 upgrade head`.
+
+"""
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd25e6b878324'
+down_revision = '79a10fcc819c'
+branch_labels = None
+depends_on = None
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def convert_in_chunks(bind, chunk_size):
+    """Fill `amount_cents` from `amount` in chunks of ascending ids."""
+    last_id = 0
+    while True:
+        upper_id = bind.execute(sa.text(
+            "SELECT MAX(id) FROM (SELECT id FROM transactions "
+            "WHERE id > :last_id ORDER BY id LIMIT :chunk_size)"
+        ), {"last_id": last_id, "chunk_size": chunk_size}).scalar()
+        if upper_id is None:
+            return
+        bind.execute(sa.text(
+            "UPDATE transactions "
+            "SET amount_cents = CAST(ROUND(amount * 100) AS INTEGER) "
+            "WHERE id > :last_id AND id <= :upper_id "
+            "AND amount_cents IS NULL"
+        ), {"last_id": last_id, "upper_id": upper_id})
+        last_id = upper_id
+
+
+def upgrade():
+    chunk_size = int(context.get_x_argument(as_dictionary=True).get(
+        'chunk_size', DEFAULT_CHUNK_SIZE))
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        columns = [
+            column['name']
+            for column in sa.inspect(bind).get_columns('transactions')
+        ]
+        # The column survives an interrupted upgrade.
+        if 'amount_cents' not in columns:
+            op.add_column('transactions', sa.Column('amount_cents', sa.BigInteger(), nullable=True))
+        convert_in_chunks(bind, chunk_size)
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_column('amount')
+        batch_op.alter_column('amount_cents', new_column_name='amount', existing_type=sa.BigInteger(), nullable=False)
+
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.alter_column('balance', existing_type=sa.Float(precision=2, decimal_return_scale=2), type_=sa.BigInteger(), existing_nullable=False, existing_server_default='0')
+
+    with op.batch_alter_table('ledger_summary', schema=None) as batch_op:
+        batch_op.alter_column('total', existing_type=sa.Float(precision=2, decimal_return_scale=2), type_=sa.BigInteger(), existing_nullable=False)
+
+    # The cached aggregates are small, recompute them from the exact values.
+    op.execute(
+        "UPDATE ledger_summary SET "
+        "total = (SELECT COALESCE(SUM(amount), 0) FROM transactions)"
+    )
+    op.execute(
+        "UPDATE accounts SET "
+        "balance = COALESCE((SELECT SUM(amount) FROM transactions "
+        "WHERE transactions.account_id = accounts.id), 0)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.alter_column('amount', existing_type=sa.BigInteger(), type_=sa.Float(precision=2, decimal_return_scale=2), existing_nullable=False)
+
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.alter_column('balance', existing_type=sa.BigInteger(), type_=sa.Float(precision=2, decimal_return_scale=2), existing_nullable=False, existing_server_default='0')
+
+    with op.batch_alter_table('ledger_summary', schema=None) as batch_op:
+        batch_op.alter_column('total', existing_type=sa.BigInteger(), type_=sa.Float(precision=2, decimal_return_scale=2), existing_nullable=False)
+
+    op.execute("UPDATE transactions SET amount = amount / 100.0")
+    op.execute("UPDATE accounts SET balance = balance / 100.0")
+    op.execute("UPDATE ledger_summary SET total = total / 100.0")
@@ -0,0 +1,38 @@
+"""Add row versions
+
+Revision ID: d317dd9c178f
+Revises: 3e76cf361d6d
+Create Date: 2026-10-18 03:43:39.087266
+
+Existing rows start at version 1. The columns are dropped without
+recreating the transactions table, which would drop the triggers of the
+full-text index.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd317dd9c178f'
+down_revision = '3e76cf361d6d'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('accounts', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('version', sa.Integer(), server_default='1', nullable=False))
+
+def downgrade():
+    with op.batch_alter_table(
+        'transactions', schema=None, recreate='never',
+    ) as batch_op:
+        batch_op.drop_column('version')
+
+    with op.batch_alter_table(
+        'accounts', schema=None, recreate='never',
+    ) as batch_op:
+        batch_op.drop_column('version')
@@ -0,0 +1,57 @@
+"""Add balance checkpoints
+
+Revision ID: d5aaa0c35103
+Revises: 239ec5abe0a0
+Create Date: 2026-10-18 03:30:59.090851
+
+The checkpoints are filled from the existing transactions: one at the start
+of each month following a month with transactions, per account and for the
+whole ledger (`account_id` NULL), as in `heath.models.checkpoint`.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5aaa0c35103'
+down_revision = '239ec5abe0a0'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('balance_checkpoints',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('account_id', sa.Integer(), nullable=True),
+    sa.Column('at', sa.DateTime(), nullable=False),
+    sa.Column('balance', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id', name=op.f('pk_balance_checkpoints'))
+    )
+    with op.batch_alter_table('balance_checkpoints', schema=None) as batch_op:
+        batch_op.create_index('ix_balance_checkpoints_account_id_at', ['account_id', 'at'], unique=False)
+
+    # Backfill the checkpoints with the running totals of the months. The
+    # times are stored in the format of SQLAlchemy's DateTime type.
+    op.execute(
+        "INSERT INTO balance_checkpoints (account_id, at, balance) "
+        "SELECT account_id, datetime(month, '+1 month') || '.000000', "
+        "SUM(total) OVER (PARTITION BY account_id ORDER BY month) "
+        "FROM (SELECT account_id, date(created, 'start of month') AS month, "
+        "SUM(amount) AS total FROM transactions "
+        "WHERE created IS NOT NULL AND account_id IS NOT NULL "
+        "GROUP BY account_id, month)"
+    )
+    op.execute(
+        "INSERT INTO balance_checkpoints (account_id, at, balance) "
+        "SELECT NULL, datetime(month, '+1 month') || '.000000', "
+        "SUM(total) OVER (ORDER BY month) "
+        "FROM (SELECT date(created, 'start of month') AS month, "
+        "SUM(amount) AS total FROM transactions "
+        "WHERE created IS NOT NULL GROUP BY month)"
+    )
+
+def downgrade():
+    with op.batch_alter_table('balance_checkpoints', schema=None) as batch_op:
+        batch_op.drop_index('ix_balance_checkpoints_account_id_at')
+
+    op.drop_table('balance_checkpoints')
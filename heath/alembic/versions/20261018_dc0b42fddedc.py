@@ -0,0 +1,26 @@
+"""Add indexes for sorting and filtering by amount
+
+Revision ID: dc0b42fddedc
+Revises: 873d7843834a
+Create Date: 2026-10-18 03:16:10.416143
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'dc0b42fddedc'
+down_revision = '873d7843834a'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.create_index('ix_transactions_account_id_amount', ['account_id', 'amount'], unique=False)
+        batch_op.create_index('ix_transactions_amount_id', ['amount', 'id'], unique=False)
+
+def downgrade():
+    with op.batch_alter_table('transactions', schema=None) as batch_op:
+        batch_op.drop_index('ix_transactions_amount_id')
+        batch_op.drop_index('ix_transactions_account_id_amount')
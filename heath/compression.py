@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+
+"""
+Compress responses with the best encoding the client accepts.
+
+The tween negotiates ``Accept-Encoding`` between Brotli, when the optional
+``brotli`` package is installed, and gzip. Text responses of at least
+``heath.compression.min_size`` bytes (default 1024) are compressed, smaller
+ones are sent as they are, because the compression would barely pay off.
+Responses without a known length, like streamed pages and exports, are
+compressed chunk by chunk while they are sent. Every chunk is flushed, so
+the client gets what the application produced without waiting for the end.
+
+Responses that already have a ``Content-Encoding``, like the precompressed
+static files written by ``build_heath_static``, are left alone.
+
+The ETag of a compressed response is made weak, because the compressed
+bytes are not the ones the ETag was computed for. ``If-None-Match`` uses the
+weak comparison, so conditional requests still get ``304 Not Modified``.
+"""
+
+import zlib
+from typing import Iterable, Iterator, Optional
+
+from pyramid.request import Request
+from pyramid.response import Response
+from pyramid.tweens import INGRESS
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+MIN_SIZE = 1024
+
+GZIP_LEVEL = 6
+# Quality for responses compressed while the client waits. The build step
+# of the static files uses the best, and slowest, quality.
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_TYPES = frozenset((
+    "application/javascript",
+    "application/json",
+    "application/x-ndjson",
+    "image/svg+xml",
+    "text/css",
+    "text/csv",
+    "text/html",
+    "text/javascript",
+    "text/plain",
+))
+
+
+class GzipEncoder(object):
+    def __init__(self):
+        self.compressor = zlib.compressobj(
+            GZIP_LEVEL,
+            zlib.DEFLATED,
+            16 + zlib.MAX_WBITS,
+        )
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress and flush the data, so it can be sent."""
+        return (
+            self.compressor.compress(data)
+            + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+        )
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliEncoder(object):
+    def __init__(self):
+        self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress and flush the data, so it can be sent."""
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+# Encoders by content coding, preferred first.
+ENCODERS = {"gzip": GzipEncoder}
+if brotli is not None:  # pragma: no cover
+    ENCODERS = {"br": BrotliEncoder, "gzip": GzipEncoder}
+
+
+def negotiate(request: Request) -> Optional[str]:
+    """Return the preferred encoding the client accepts, if any."""
+    # Without the header, clients get the response as it is.
+    if not request.accept_encoding:
+        return None
+    offers = request.accept_encoding.acceptable_offers(list(ENCODERS))
+    return offers[0][0] if offers else None
+
+
+def compressed_chunks(app_iter: Iterable[bytes], encoder) -> Iterator[bytes]:
+    """Compress the body while it is sent and close the original."""
+    try:
+        for chunk in app_iter:
+            if chunk:
+                yield encoder.compress(chunk)
+        yield encoder.finish()
+    finally:
+        close = getattr(app_iter, "close", None)
+        if close is not None:
+            close()
+
+
+def is_compressible(response: Response, min_size: int) -> bool:
+    return (
+        response.status_code == 200
+        and "Content-Encoding" not in response.headers
+        and response.content_type in COMPRESSIBLE_TYPES
+        and (
+            response.content_length is None
+            or response.content_length >= min_size
+        )
+    )
+
+
+def compress(response: Response, encoding: str):
+    """Replace the body of the response with the compressed body."""
+    encoder = ENCODERS[encoding]()
+    if isinstance(response.app_iter, (list, tuple)):
+        response.body = b"".join(
+            [encoder.compress(chunk) for chunk in response.app_iter]
+            + [encoder.finish()]
+        )
+    else:
+        response.app_iter = compressed_chunks(response.app_iter, encoder)
+        response.content_length = None
+    response.content_encoding = encoding
+    if response.etag and response.etag_strong:
+        response.etag = (response.etag, False)
+
+
+def compression_tween_factory(handler, registry):
+    """Compress the responses of clients accepting it, see the module."""
+    min_size = int(registry.settings.get("heath.compression.min_size",
+                                         MIN_SIZE))
+
+    def compression_tween(request: Request):
+        response = handler(request)
+        encoding = negotiate(request)
+        if response.status_code == 304:
+            # Answer with the ETag of the compressed response the client
+            # has stored.
+            stored = request.headers.get("If-None-Match", "")
+            if (encoding and response.etag
+                    and 'W/"{}"'.format(response.etag) in stored):
+                response.etag = (response.etag, False)
+            return response
+        if not is_compressible(response, min_size):
+            return response
+        if "Accept-Encoding" not in (response.vary or ()):
+            response.vary = tuple(response.vary or ()) + ("Accept-Encoding",)
+        if encoding is not None:
+            compress(response, encoding)
+        return response
+
+    return compression_tween
+
+
+def includeme(config):
+    """
+    Compress responses.
+
+    Activate this setup using ``config.include('heath.compression')``. The
+    tween is placed at the top, over the debug toolbar, which changes the
+    body of pages after the views.
+
+    """
+    config.add_tween(
+        "heath.compression.compression_tween_factory",
+        under=INGRESS,
+    )
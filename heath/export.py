@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+"""Define helpers to stream query results as CSV or NDJSON."""
+
+import csv
+import io
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Iterable, Iterator, List, Sequence
+
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql import Select
+
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def stream_partitions(
+    engine: Engine,
+    statement: Select,
+    batch_size: int = EXPORT_BATCH_SIZE,
+) -> Iterator[List]:
+    """
+    Yield the rows of a statement in lists of up to `batch_size` rows.
+
+    The rows are read from a connection of their own. A generator returned as
+    the ``app_iter`` of a response is only consumed after ``pyramid_tm`` has
+    closed the request's session, so it can not use ``request.dbsession``.
+    The connection is closed when the generator is exhausted or closed.
+    """
+    with engine.connect() as connection:
+        result = connection.execution_options(
+            stream_results=True,
+            yield_per=batch_size,
+        ).execute(statement)
+        yield from result.partitions()
+
+
+def _serializable(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return "{:.2f}".format(value)
+    return value
+
+
+def csv_chunks(
+    partitions: Iterable[List],
+    columns: Sequence[str],
+) -> Iterator[bytes]:
+    """Encode partitions of rows as CSV with a header line."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> bytes:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk.encode("utf-8")
+
+    writer.writerow(columns)
+    yield flush()
+    for rows in partitions:
+        writer.writerows(
+            [_serializable(value) for value in row] for row in rows
+        )
+        yield flush()
+
+
+def ndjson_chunks(
+    partitions: Iterable[List],
+    columns: Sequence[str],
+) -> Iterator[bytes]:
+    """Encode partitions of rows as newline delimited JSON objects."""
+    for rows in partitions:
+        yield "".join(
+            json.dumps(dict(zip(
+                columns,
+                (_serializable(value) for value in row),
+            ))) + "\n"
+            for row in rows
+        ).encode("utf-8")
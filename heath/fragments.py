@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+
+"""
+Cache rendered template fragments of rows.
+
+Templates mark the rendering of a row with the ``cache`` tag::
+
+    {% cache "transaction", transaction.id, transaction.version %}
+      <td>{{ transaction.description }}</td>
+    {% endcache %}
+
+The fragment is cached with the name of the template and the values of the
+tag: the kind of row, its id, its version and, optionally, more values the
+fragment depends on. The version of a row is incremented by every change,
+so a changed row is never rendered from the cache. The fragment may only
+depend on the values of its key. Links in fragments are paths, like those
+of ``request.route_path``, so fragments do not depend on the host of the
+request, and those rendered by the warm-up of a worker match real requests.
+
+The cache holds fragments up to about ``heath.fragment_cache.size`` bytes
+(default 8000000) and evicts the least recently used fragments beyond that.
+Each fragment is counted with its length and the memory taken by its entry,
+see `ENTRY_SIZE`. A size of 0 disables the cache. Fragments of changed rows
+are removed when the change is committed, see `fragments_changed`, so they
+do not take up space until they are evicted.
+
+Templates rendered with a false ``cache_new_fragments`` value only read the
+cache. Pages showing many rows once, like the unpaginated transaction list,
+would otherwise evict the fragments of the rows shown all the time.
+"""
+
+import threading
+from collections import OrderedDict, defaultdict
+from typing import DefaultDict, Hashable, Optional, Set, Tuple
+
+from jinja2 import nodes
+from jinja2.ext import Extension
+from pyramid.request import Request
+from pyramid_jinja2 import EXTRAS_CONFIG_PHASE
+
+
+DEFAULT_SIZE = 8000000
+
+# Approximate memory of a cache entry besides the text of the fragment: the
+# string object, the key and the bookkeeping of the cache.
+ENTRY_SIZE = 560
+
+# (template name, kind of row, row id, row version, other values)
+FragmentKey = Tuple[Hashable, ...]
+
+
+def size_of(fragment: str) -> int:
+    """Return the approximate memory a cached fragment takes up."""
+    return len(fragment) + ENTRY_SIZE
+
+
+class FragmentCache(object):
+    """Rendered fragments with least recently used eviction."""
+
+    def __init__(self, size: int = DEFAULT_SIZE):
+        self.size = size
+        self.used = 0
+        self.fragments: OrderedDict[FragmentKey, str] = OrderedDict()
+        # Keys of the cached fragments of each row, by (kind, row id).
+        self.rows: DefaultDict[Tuple, Set[FragmentKey]] = defaultdict(set)
+        self.lock = threading.Lock()
+
+    def get(self, key: FragmentKey) -> Optional[str]:
+        with self.lock:
+            fragment = self.fragments.get(key)
+            if fragment is not None:
+                self.fragments.move_to_end(key)
+            return fragment
+
+    def set(self, key: FragmentKey, fragment: str):
+        if size_of(fragment) > self.size:
+            return
+        with self.lock:
+            self.discard(key)
+            self.fragments[key] = fragment
+            self.rows[key[1:3]].add(key)
+            self.used += size_of(fragment)
+            while self.used > self.size:
+                self.discard(next(iter(self.fragments)))
+
+    def invalidate(self, kind: str, row_id):
+        """Remove all fragments of a row."""
+        with self.lock:
+            for key in list(self.rows.get((kind, row_id), ())):
+                self.discard(key)
+
+    def discard(self, key: FragmentKey):
+        """Remove a fragment. The lock has to be held."""
+        fragment = self.fragments.pop(key, None)
+        if fragment is None:
+            return
+        self.used -= size_of(fragment)
+        row = key[1:3]
+        self.rows[row].discard(key)
+        if not self.rows[row]:
+            del self.rows[row]
+
+    def __len__(self) -> int:
+        return len(self.fragments)
+
+
+class FragmentCacheExtension(Extension):
+    """Add the ``cache`` tag to Jinja2, see the module."""
+
+    tags = {"cache"}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key = [nodes.Const(parser.name), parser.parse_expression()]
+        while parser.stream.skip_if("comma"):
+            key.append(parser.parse_expression())
+        if len(key) < 4:
+            parser.fail(
+                "cache needs the kind, id and version of the row",
+                lineno,
+            )
+        body = parser.parse_statements(("name:endcache",), drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method("_render", [
+                nodes.ContextReference(),
+                nodes.Tuple(key, "load"),
+            ]),
+            [],
+            [],
+            body,
+        ).set_lineno(lineno)
+
+    def _render(self, context, key: FragmentKey, caller) -> str:
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        fragment = cache.get(key)
+        if fragment is None:
+            fragment = caller()
+            if context.get("cache_new_fragments", True):
+                cache.set(key, fragment)
+        return fragment
+
+
+def get_fragment_cache(registry) -> Optional[FragmentCache]:
+    return registry.get("fragment_cache")
+
+
+def fragments_changed(request: Request, kind: str, *row_ids):
+    """
+    Remove the fragments of rows when the transaction of the request commits.
+
+    The fragments would not be used anymore anyway, because the versions of
+    the rows changed. Removing them after the commit makes sure they are not
+    cached again from the old data.
+    """
+    cache = get_fragment_cache(request.registry)
+    if cache is None:
+        return
+
+    def invalidate(committed: bool):
+        if committed:
+            for row_id in row_ids:
+                cache.invalidate(kind, row_id)
+
+    request.tm.get().addAfterCommitHook(invalidate)
+
+
+def includeme(config):
+    """
+    Set up the fragment cache.
+
+    Activate this setup using ``config.include('heath.fragments')`` after
+    including ``pyramid_jinja2``. The ``cache`` tag is always available, it
+    renders the fragment every time if the cache is disabled.
+
+    """
+    size = int(config.get_settings().get(
+        "heath.fragment_cache.size",
+        DEFAULT_SIZE,
+    ))
+    cache = config.registry["fragment_cache"] = (
+        FragmentCache(size) if size > 0 else None)
+    config.add_jinja2_extension(FragmentCacheExtension)
+
+    def set_cache():
+        config.get_jinja2_environment().fragment_cache = cache
+
+    # After the extension is added, which is also an action of this phase.
+    config.action(None, set_cache, order=EXTRAS_CONFIG_PHASE)
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+
+"""
+Answer repeated requests of unchanged pages with ``304 Not Modified``.
+
+The ledger summary holds a data version, which is incremented by every
+write in the same database transaction (see `heath.models.ledger`). Views
+declared with ``@view_config(..., etag=True)`` get a strong ETag derived
+from it. If the request's ``If-None-Match`` header contains the current
+ETag, the view is not called and ``304 Not Modified`` is returned, after a
+single primary key lookup of the version and without rendering. Responses
+carry ``Cache-Control: no-cache``, so clients store them but revalidate
+every time.
+
+Only views whose responses depend on nothing but the stored data and the
+request URL may be declared with ``etag=True``.
+
+The version is stored with the data, so writes through other workers and
+the import, generate and rebuild scripts change the ETags of all processes.
+The ETags also contain a token of the deployed code, so pages rendered by
+earlier code, or from an earlier database with the same version, do not
+match. It is ``heath.etag_token`` if set, like the revision of a deploy,
+otherwise a hash of the package version, the code, the templates and the
+manifest of the static files.
+"""
+
+import hashlib
+import os
+from importlib.metadata import PackageNotFoundError, version
+
+from pyramid.httpexceptions import HTTPNotModified
+
+from heath.models.ledger import get_data_version
+
+
+SAFE_METHODS = ("GET", "HEAD")
+
+# Files of the package that change the rendered pages.
+DEPLOYED_SUFFIXES = (".py", ".jinja2", ".json")
+
+TOKEN_LENGTH = 12
+
+
+def code_token() -> str:
+    """Return a hash of the package version and the deployed files."""
+    digest = hashlib.sha256()
+    try:
+        digest.update(version("heath").encode())
+    except PackageNotFoundError:  # pragma: no cover
+        pass
+    root = os.path.dirname(os.path.abspath(__file__))
+    for directory, directories, filenames in os.walk(root):
+        directories[:] = sorted(
+            name for name in directories if name != "__pycache__")
+        for filename in sorted(filenames):
+            if not filename.endswith(DEPLOYED_SUFFIXES):
+                continue
+            path = os.path.join(directory, filename)
+            digest.update(os.path.relpath(path, root).encode())
+            with open(path, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:TOKEN_LENGTH]
+
+
+def get_etag_token(settings) -> str:
+    return settings.get("heath.etag_token") or code_token()
+
+
+def etag_view(view, info):
+    """Answer conditional requests of views with ``etag=True``."""
+    if not info.options.get("etag"):
+        return view
+    token = info.registry["etag_token"]
+
+    def wrapper(context, request):
+        if request.method not in SAFE_METHODS:
+            return view(context, request)
+        # Read before the view reads, so the response is at least as new.
+        etag = "{}-{}".format(token, get_data_version(request.dbsession))
+        if etag in request.if_none_match:
+            response = HTTPNotModified()
+        else:
+            response = view(context, request)
+            if response.status_code != 200:
+                return response
+        response.etag = etag
+        response.cache_control.no_cache = True
+        return response
+
+    return wrapper
+
+
+etag_view.options = ("etag",)
+
+
+def includeme(config):
+    """
+    Set up the token of the deployed code and ETags.
+
+    Activate this setup using ``config.include('heath.httpcache')``.
+
+    """
+    config.registry["etag_token"] = get_etag_token(config.get_settings())
+    config.add_view_deriver(etag_view)
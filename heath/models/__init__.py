@@ -7,6 +7,14 @@ import zope.sqlalchemy
 # Base.metadata prior to any initialization routines
 from heath.models.transaction import Transaction  # noqa: F401
 from heath.models.account import Account  # noqa: F401
+from heath.models.checkpoint import BalanceCheckpoint  # noqa: F401
+from heath.models.ledger import LedgerSummary  # noqa: F401
+from heath.models.rollup import SpendingRollup  # noqa: F401
+# creates the full-text index with the transactions table
+from heath.models import search  # noqa: F401
+from heath.models.ledger import register_ledger_events
+from heath.models.readonly import get_read_only_session, is_read_only
+from heath.models.sqlite import apply_pragmas, pragmas_from_settings
 
 # run configure_mappers after defining all of the models to ensure
 # all relationships can be setup
@@ -14,12 +22,17 @@ configure_mappers()
 
 
 def get_engine(settings, prefix='sqlalchemy.'):
-    return engine_from_config(settings, prefix)
+    engine = engine_from_config(settings, prefix)
+    # apply the heath.sqlite.* pragmas to every pooled connection
+    apply_pragmas(engine, pragmas_from_settings(settings))
+    return engine
 
 
 def get_session_factory(engine):
     factory = sessionmaker()
     factory.configure(bind=engine)
+    # keep the ledger aggregates in sync with every flush of a session
+    register_ledger_events(factory)
     return factory
 
 
@@ -60,21 +73,28 @@ def includeme(config):
     settings = config.get_settings()
     settings['tm.manager_hook'] = 'pyramid_tm.explicit_manager'
 
+    # skip pyramid_tm for routes served by read_only=True views
+    config.include('heath.models.readonly')
+
     # use pyramid_tm to hook the transaction lifecycle to the request
     config.include('pyramid_tm')
 
     # use pyramid_retry to retry a request when transient exceptions occur
     config.include('pyramid_retry')
 
-    config.registry["engine"] = get_engine(settings)
+    # retry and count requests that fail because the database is locked
+    config.include('heath.models.sqlite')
+
+    engine = config.registry["engine"] = get_engine(settings)
 
-    session_factory = get_session_factory(config.registry["engine"])
+    session_factory = get_session_factory(engine)
     config.registry['dbsession_factory'] = session_factory
 
-    # make request.dbsession available for use in Pyramid
-    config.add_request_method(
+    def dbsession(request):
+        if is_read_only(request):
+            return get_read_only_session(engine, session_factory, request)
         # r.tm is the transaction manager used by pyramid_tm
-        lambda r: get_tm_session(session_factory, r.tm),
-        'dbsession',
-        reify=True
-    )
+        return get_tm_session(session_factory, request.tm)
+
+    # make request.dbsession available for use in Pyramid
+    config.add_request_method(dbsession, 'dbsession', reify=True)
@@ -13,6 +13,7 @@ from sqlalchemy import (
 from sqlalchemy.orm import relationship
 
 from heath.models.meta import Base
+from heath.models.types import Cents
 
 
 class Account(Base):
@@ -21,6 +22,11 @@ class Account(Base):
 
     Transactions are associated with accounts to represent the actual splitting
     of financial transactions more accurately.
+
+    The `balance`, `transaction_count` and `last_activity` columns are
+    denormalized from the associated transactions, so they can be shown
+    without loading the transactions. They are maintained together with the
+    other ledger aggregates (see `heath.models.ledger`).
     """
 
     __tablename__ = "accounts"
@@ -29,4 +35,21 @@ class Account(Base):
 
     transactions = relationship("Transaction", back_populates="account")
 
+    balance = Column(
+        Cents,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+    transaction_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+    last_activity = Column(DateTime, nullable=True)
+
     created = Column(DateTime, nullable=True, default=datetime.now)
+    # Incremented with the denormalized columns, so cached renderings of the
+    # row can be keyed by it (see `heath.fragments`).
+    version = Column(Integer, nullable=False, default=1, server_default="1")
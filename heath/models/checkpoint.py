@@ -0,0 +1,331 @@
+# -*- coding: utf-8 -*-
+
+"""
+Define balance checkpoints to answer balance-as-of queries quickly.
+
+A checkpoint holds the balance of an account before the start of a month,
+that is the sum of all transactions of the account created earlier. There
+is a checkpoint at the start of every month following a month with
+transactions. Checkpoints with an `account_id` of `None` hold the balance
+of the whole ledger.
+
+The balance at any time is the balance of the nearest checkpoint at or
+before that time plus the transactions since then, which are at most those
+of one month. See `balance_before`.
+
+Changes to transactions are applied to all later checkpoints of the account
+and the ledger, so back-dated and edited transactions keep them correct.
+See `update_checkpoints`, called with the other ledger aggregates.
+"""
+
+from bisect import bisect_left
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import (
+    Column,
+    DateTime,
+    Index,
+    Integer,
+    bindparam,
+    delete,
+    insert,
+    null,
+    select,
+    tuple_,
+    type_coerce,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import func
+
+from heath.models.meta import Base
+from heath.models.rollup import MONTH, bucket_expression
+from heath.models.transaction import Transaction
+from heath.models.types import Cents
+
+
+# Lower bound of the creation times when there is no checkpoint.
+EARLIEST = datetime(1, 1, 1)
+# Upper bound of the checkpoints changed by the latest changed month.
+LATEST = datetime(9999, 12, 31)
+
+# (account id or `None` for the ledger, checkpoint time)
+CheckpointKey = Tuple[Optional[int], datetime]
+
+
+class BalanceCheckpoint(Base):
+    """Balance of an account, or the ledger, before the time `at`."""
+
+    __tablename__ = "balance_checkpoints"
+    __table_args__ = (
+        # The nearest checkpoint of an account at or before a time.
+        Index("ix_balance_checkpoints_account_id_at", "account_id", "at"),
+    )
+    id = Column(Integer, primary_key=True)
+    account_id = Column(Integer, nullable=True)
+    at = Column(DateTime, nullable=False)
+    balance = Column(Cents, nullable=False, default=0)
+
+
+def next_checkpoint(created: datetime) -> datetime:
+    """Return the start of the month after `created`."""
+    if created.month == 12:
+        return datetime(created.year + 1, 1, 1)
+    return datetime(created.year, created.month + 1, 1)
+
+
+def balance_before(
+    account_id: Optional[int],
+    when: datetime,
+    through_id: Optional[int] = None,
+):
+    """
+    Return a scalar SQL expression of a balance before `when`.
+
+    The balance is of the account, or of the whole ledger if `account_id` is
+    `None`. It is read from the nearest checkpoint and the transactions
+    created since, which are found with a range of the index on
+    `(account_id, created)` or `(created, id)`.
+
+    With `through_id` the balance includes the transactions created at
+    `when` up to this id, which is the running balance through the
+    transaction `(when, through_id)`. Transactions without creation time
+    are not included.
+    """
+    checkpoint = select(BalanceCheckpoint.at).where(
+        BalanceCheckpoint.account_id == account_id,
+        BalanceCheckpoint.at <= when,
+    ).order_by(
+        BalanceCheckpoint.at.desc(),
+    ).limit(1)
+    start = checkpoint.scalar_subquery()
+    balance = checkpoint.with_only_columns(
+        BalanceCheckpoint.balance,
+    ).scalar_subquery()
+
+    criteria = [Transaction.created >= func.coalesce(start, EARLIEST)]
+    if account_id is not None:
+        criteria.append(Transaction.account_id == account_id)
+    if through_id is None:
+        criteria.append(Transaction.created < when)
+    else:
+        criteria.append(tuple_(Transaction.created, Transaction.id) <= tuple_(
+            when,
+            through_id,
+            types=(Transaction.created.type, Transaction.id.type),
+        ))
+    since = select(func.sum(Transaction.amount)).where(
+        *criteria
+    ).scalar_subquery()
+    return type_coerce(
+        func.coalesce(balance, 0) + func.coalesce(since, 0),
+        Cents,
+    )
+
+
+def balance_as_of(
+    connection: Connection,
+    account_id: Optional[int],
+    when: datetime,
+) -> Decimal:
+    """Return the balance of an account, or the ledger, before `when`."""
+    return connection.execute(
+        select(balance_before(account_id, when)),
+    ).scalar()
+
+
+def update_checkpoints(connection: Connection, changes: Iterable):
+    """
+    Apply ledger changes to the checkpoints after them.
+
+    The changes are added to every later checkpoint of the account and the
+    ledger. A checkpoint gets the sum of the changes before it, which only
+    changes at the months of the changes, so all checkpoints between two
+    such months get the same amount with one executemany UPDATE of these
+    ranges. Added transactions get the checkpoint after their month if it
+    does not exist yet. It is computed after all changes were applied, so
+    it is not changed twice.
+    """
+    deltas: Dict[Optional[int], Dict[datetime, Decimal]] = defaultdict(
+        lambda: defaultdict(Decimal))
+    added: Set[CheckpointKey] = set()
+    for change in changes:
+        if change.created is None:
+            continue
+        at = next_checkpoint(change.created)
+        for series in {None, change.account_id}:
+            deltas[series][at] += change.amount
+            if change.count > 0:
+                added.add((series, at))
+
+    ranges = []
+    for series, months in deltas.items():
+        starts = sorted(months)
+        amount = Decimal(0)
+        for start, end in zip(starts, starts[1:] + [LATEST]):
+            amount += months[start]
+            if amount:
+                ranges.append({
+                    "series": series,
+                    "start": start,
+                    "end": end,
+                    "amount": amount,
+                })
+    if ranges:
+        connection.execute(
+            update(BalanceCheckpoint).where(
+                BalanceCheckpoint.account_id.is_(
+                    bindparam("series", type_=Integer)),
+                BalanceCheckpoint.at >= bindparam("start", type_=DateTime),
+                BalanceCheckpoint.at < bindparam("end", type_=DateTime),
+            ).values(
+                balance=(
+                    BalanceCheckpoint.balance
+                    + bindparam("amount", type_=Cents)),
+            ),
+            ranges,
+        )
+    if added:
+        insert_missing_checkpoints(connection, added)
+
+
+def insert_missing_checkpoints(
+    connection: Connection,
+    keys: Iterable[CheckpointKey],
+):
+    """
+    Insert the checkpoints of the keys that do not exist yet.
+
+    The ledger and the accounts are inserted with one executemany INSERT
+    each, earliest first, so every balance is read from the checkpoint
+    inserted before it.
+    """
+    at = bindparam("at", type_=DateTime)
+    for ledger in (True, False):
+        series = None if ledger else bindparam("series", type_=Integer)
+        rows = [
+            {"series": account_id, "at": when}
+            for account_id, when in sorted(keys, key=lambda key: key[1])
+            if (account_id is None) == ledger
+        ]
+        if not rows:
+            continue
+        exists = select(BalanceCheckpoint.id).where(
+            BalanceCheckpoint.account_id == series,
+            BalanceCheckpoint.at == at,
+        ).exists()
+        connection.execute(
+            insert(BalanceCheckpoint).from_select(
+                ["account_id", "at", "balance"],
+                select(
+                    null() if ledger else series,
+                    at,
+                    balance_before(series, at),
+                ).where(~exists),
+            ),
+            rows,
+        )
+
+
+def compute_monthly_totals(
+    connection: Connection,
+) -> Dict[Optional[int], List[Tuple[datetime, Decimal]]]:
+    """Sum up the transactions per account and the ledger per month."""
+    month = bucket_expression(MONTH, Transaction.created)
+    totals: Dict[Optional[int], Dict] = defaultdict(
+        lambda: defaultdict(Decimal))
+    for account_id, start, amount in connection.execute(
+        select(
+            Transaction.account_id,
+            month,
+            func.sum(Transaction.amount),
+        ).where(
+            Transaction.created.is_not(None),
+        ).group_by(
+            Transaction.account_id,
+            month,
+        )
+    ):
+        start = datetime(start.year, start.month, 1)
+        totals[None][start] += amount
+        if account_id is not None:
+            totals[account_id][start] += amount
+    return dict(
+        (series, sorted(months.items()))
+        for series, months in totals.items()
+    )
+
+
+def compute_checkpoints(
+    connection: Connection,
+) -> Dict[CheckpointKey, Decimal]:
+    """Compute the checkpoints after every month with transactions."""
+    checkpoints = {}
+    for series, months in compute_monthly_totals(connection).items():
+        balances = accumulate(amount for _, amount in months)
+        for (start, _), balance in zip(months, balances):
+            checkpoints[series, next_checkpoint(start)] = balance
+    return checkpoints
+
+
+def rebuild_checkpoints(connection: Connection):
+    """Replace the checkpoints with values computed from scratch."""
+    checkpoints = compute_checkpoints(connection)
+    connection.execute(delete(BalanceCheckpoint))
+    if checkpoints:
+        connection.execute(insert(BalanceCheckpoint), [
+            {"account_id": series, "at": at, "balance": balance}
+            for (series, at), balance in checkpoints.items()
+        ])
+
+
+def check_checkpoints(connection: Connection) -> List[str]:
+    """
+    Compare the stored checkpoints with freshly computed values.
+
+    Checkpoints left behind after the transactions of a month were deleted
+    are not required, but have to hold the right balance too.
+
+    Returns:
+        list: Descriptions of the inconsistencies found. Empty if the
+            checkpoints are consistent.
+
+    """
+    monthly_totals = compute_monthly_totals(connection)
+    required = compute_checkpoints(connection)
+    stored = dict(
+        ((row.account_id, row.at), row.balance)
+        for row in connection.execute(select(
+            BalanceCheckpoint.account_id,
+            BalanceCheckpoint.at,
+            BalanceCheckpoint.balance,
+        ))
+    )
+
+    def expected(series, at):
+        months = monthly_totals.get(series, [])
+        count = bisect_left([start for start, _ in months], at)
+        return sum((amount for _, amount in months[:count]), Decimal(0))
+
+    problems = []
+    for series, at in sorted(set(required) - set(stored), key=str):
+        problems.append("Checkpoint of account {} at {} is missing.".format(
+            series,
+            at,
+        ))
+    for (series, at), balance in sorted(stored.items(), key=str):
+        if balance != expected(series, at):
+            problems.append(
+                "Checkpoint of account {} at {} is {:.2f} but should be "
+                "{:.2f}.".format(
+                    series,
+                    at,
+                    balance,
+                    expected(series, at),
+                )
+            )
+    return problems
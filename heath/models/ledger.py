@@ -0,0 +1,453 @@
+# -*- coding: utf-8 -*-
+
+"""
+Define the ledger summary and keep it in sync with the transactions.
+
+Aggregates over the transactions table are not computed on read. Instead
+every change to a transaction is turned into a list of `LedgerChange` tuples
+which are applied to the aggregate tables in the same database transaction.
+
+Changes made through the ORM are picked up automatically by the session
+hook registered with `register_ledger_events`. Code that writes to the
+transactions table with Core statements has to call `apply_changes` itself.
+"""
+
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Integer,
+    event,
+    inspect,
+    select,
+    update,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql import func
+
+from heath.models.account import Account
+from heath.models.checkpoint import (
+    check_checkpoints,
+    rebuild_checkpoints,
+    update_checkpoints,
+)
+from heath.models.meta import Base
+from heath.models.rollup import check_rollups, rebuild_rollups, update_rollups
+from heath.models.transaction import Transaction
+from heath.models.types import Cents, to_amount
+
+
+SUMMARY_ID = 1
+
+ZERO = Decimal("0.00")
+
+# Transaction attributes that feed into the aggregates, in the order of the
+# `LedgerChange` fields.
+TRACKED_ATTRIBUTES = ("account_id", "amount", "created")
+
+
+class LedgerSummary(Base):
+    """
+    Single row table holding the running total of all transactions.
+
+    The row is maintained incrementally. See `apply_changes`. It also holds
+    the data version, which is incremented by every write of the ledger in
+    the same database transaction, so all processes see the same version.
+    See `heath.httpcache`.
+    """
+
+    __tablename__ = "ledger_summary"
+    id = Column(Integer, primary_key=True)
+    total = Column(Cents, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+    data_version = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0",
+    )
+
+
+@event.listens_for(LedgerSummary.__table__, "after_create")
+def insert_summary_row(target, connection, **kw):
+    """Start a freshly created ledger with an empty summary row."""
+    connection.execute(target.insert().values(
+        id=SUMMARY_ID,
+        total=0,
+        transaction_count=0,
+    ))
+
+
+class LedgerChange(NamedTuple):
+    """
+    Effect of adding (`count` 1) or removing (`count` -1) a transaction.
+
+    The `amount` is already signed according to `count`, so aggregates can
+    simply add it up. A change can also stand for several transactions of
+    the same account, day and sign, with their `count` and summed `amount`
+    and the latest of their `created` times.
+    """
+
+    account_id: Optional[int]
+    amount: Decimal
+    created: Optional[datetime]
+    count: int
+
+
+def added(account_id, amount, created) -> LedgerChange:
+    """Return the change for a transaction that was added to the ledger."""
+    return LedgerChange(account_id, to_amount(amount or 0), created, 1)
+
+
+def removed(account_id, amount, created) -> LedgerChange:
+    """Return the change for a transaction that was removed from the ledger."""
+    return LedgerChange(account_id, -to_amount(amount or 0), created, -1)
+
+
+def _committed_value(state, key):
+    """Return the value of an attribute as it is stored in the database."""
+    history = state.attrs[key].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return None
+
+
+def collect_changes(session: Session) -> List[LedgerChange]:
+    """Collect the ledger changes of the transactions in a flushing session."""
+    changes = []
+    for instance in session.new:
+        if isinstance(instance, Transaction):
+            changes.append(added(
+                instance.account_id,
+                instance.amount,
+                instance.created,
+            ))
+    for instance in session.dirty:
+        if not isinstance(instance, Transaction):
+            continue
+        state = inspect(instance)
+        if not any(
+            state.attrs[key].history.has_changes()
+            for key in TRACKED_ATTRIBUTES
+        ):
+            continue
+        changes.append(removed(*(
+            _committed_value(state, key) for key in TRACKED_ATTRIBUTES
+        )))
+        changes.append(added(
+            instance.account_id,
+            instance.amount,
+            instance.created,
+        ))
+    for instance in session.deleted:
+        if isinstance(instance, Transaction):
+            state = inspect(instance)
+            changes.append(removed(*(
+                _committed_value(state, key) for key in TRACKED_ATTRIBUTES
+            )))
+    return changes
+
+
+def apply_changes(connection: Connection, changes: Iterable[LedgerChange]):
+    """Apply ledger changes to the aggregate tables."""
+    changes = list(changes)
+    if not changes:
+        return
+    update_summary(connection, changes)
+    update_accounts(connection, changes)
+    update_rollups(connection, changes)
+    update_checkpoints(connection, changes)
+
+
+def update_summary(connection: Connection, changes: List[LedgerChange]):
+    """
+    Add the changes to the running total in the ledger summary.
+
+    The data version is incremented with the same statement.
+    """
+    total = sum(change.amount for change in changes)
+    count = sum(change.count for change in changes)
+    result = connection.execute(
+        update(LedgerSummary).where(
+            LedgerSummary.id == SUMMARY_ID,
+        ).values(
+            total=LedgerSummary.total + total,
+            transaction_count=LedgerSummary.transaction_count + count,
+            data_version=LedgerSummary.data_version + 1,
+        )
+    )
+    if result.rowcount == 0:
+        # The summary row does not exist yet. The transactions table already
+        # contains the changes, so the row is created from scratch.
+        rebuild_summary(connection)
+
+
+def update_accounts(connection: Connection, changes: List[LedgerChange]):
+    """
+    Add the changes to the balances and counts of the affected accounts.
+
+    A transaction that was moved to another account shows up as a removal
+    from the old and an addition to the new account. Additions can only move
+    the last activity forward. If transactions were removed from an account,
+    its last activity is looked up again, because removing the latest
+    transaction of an account moves it back in time.
+    """
+    deltas: Dict[int, Tuple[Decimal, int]] = defaultdict(
+        lambda: (Decimal(0), 0))
+    latest: Dict[int, datetime] = {}
+    had_removals = set()
+    for change in changes:
+        if change.account_id is None:
+            continue
+        amount, count = deltas[change.account_id]
+        deltas[change.account_id] = (
+            amount + change.amount,
+            count + change.count,
+        )
+        if change.count < 0:
+            had_removals.add(change.account_id)
+        elif change.created is not None and (
+                change.account_id not in latest
+                or change.created > latest[change.account_id]):
+            latest[change.account_id] = change.created
+    for account_id, (amount, count) in deltas.items():
+        if account_id in had_removals:
+            last_activity = last_activity_of(Account.id)
+        elif account_id in latest:
+            last_activity = func.max(
+                func.coalesce(Account.last_activity, latest[account_id]),
+                latest[account_id],
+            )
+        else:
+            last_activity = Account.last_activity
+        connection.execute(
+            update(Account).where(
+                Account.id == account_id,
+            ).values(
+                balance=Account.balance + amount,
+                transaction_count=Account.transaction_count + count,
+                last_activity=last_activity,
+                version=Account.version + 1,
+            )
+        )
+
+
+def last_activity_of(account_id):
+    """Return a subquery for the time of the latest transaction of account."""
+    return select(
+        func.max(Transaction.created),
+    ).where(
+        Transaction.account_id == account_id,
+    ).scalar_subquery()
+
+
+def compute_summary(connection: Connection):
+    """Compute total and count from the transactions table (full scan)."""
+    total, count = connection.execute(
+        select(func.sum(Transaction.amount), func.count(Transaction.id)),
+    ).one()
+    return total or ZERO, count
+
+
+def rebuild_summary(connection: Connection):
+    """
+    Replace the ledger summary with values computed from scratch.
+
+    The data version is kept and incremented, so ETags of earlier versions
+    do not match again.
+    """
+    total, count = compute_summary(connection)
+    version = connection.execute(
+        LedgerSummary.__table__.delete().returning(
+            LedgerSummary.data_version,
+        ),
+    ).scalar()
+    connection.execute(
+        LedgerSummary.__table__.insert().values(
+            id=SUMMARY_ID,
+            total=total,
+            transaction_count=count,
+            data_version=(version or 0) + 1,
+        )
+    )
+
+
+def rebuild_accounts(connection: Connection):
+    """Recompute balance, count and last activity of all accounts."""
+    connection.execute(
+        update(Account).values(
+            balance=func.coalesce(select(
+                func.sum(Transaction.amount),
+            ).where(
+                Transaction.account_id == Account.id,
+            ).scalar_subquery(), ZERO),
+            transaction_count=select(
+                func.count(Transaction.id),
+            ).where(
+                Transaction.account_id == Account.id,
+            ).scalar_subquery(),
+            last_activity=last_activity_of(Account.id),
+            version=Account.version + 1,
+        )
+    )
+
+
+def rebuild(connection: Connection, workers: int = 1):
+    """
+    Rebuild all ledger aggregates from the transactions.
+
+    The rollups are computed by `workers` threads. See `rebuild_rollups`.
+    """
+    rebuild_summary(connection)
+    rebuild_accounts(connection)
+    rebuild_rollups(connection, workers)
+    rebuild_checkpoints(connection)
+
+
+def check_summary(connection: Connection) -> List[str]:
+    """
+    Compare the stored ledger summary with freshly computed values.
+
+    Returns:
+        list: Descriptions of the inconsistencies found. Empty if the
+            summary is consistent.
+
+    """
+    stored = connection.execute(
+        select(LedgerSummary.total, LedgerSummary.transaction_count).where(
+            LedgerSummary.id == SUMMARY_ID,
+        )
+    ).one_or_none()
+    total, count = compute_summary(connection)
+    if stored is None:
+        return ["Ledger summary row is missing."]
+    problems = []
+    if stored.total != total:
+        problems.append("Ledger total is {:.2f} but should be {:.2f}.".format(
+            stored.total,
+            total,
+        ))
+    if stored.transaction_count != count:
+        problems.append("Ledger count is {} but should be {}.".format(
+            stored.transaction_count,
+            count,
+        ))
+    return problems
+
+
+def check_accounts(connection: Connection) -> List[str]:
+    """
+    Compare the stored account aggregates with freshly computed values.
+
+    Returns:
+        list: Descriptions of the inconsistencies found. Empty if all
+            accounts are consistent.
+
+    """
+    computed = select(
+        Transaction.account_id,
+        func.sum(Transaction.amount).label("balance"),
+        func.count(Transaction.id).label("transaction_count"),
+        func.max(Transaction.created).label("last_activity"),
+    ).group_by(
+        Transaction.account_id,
+    ).subquery()
+    rows = connection.execute(
+        select(
+            Account.id,
+            Account.balance,
+            Account.transaction_count,
+            Account.last_activity,
+            func.coalesce(computed.c.balance, ZERO),
+            func.coalesce(computed.c.transaction_count, 0),
+            computed.c.last_activity,
+        ).outerjoin(
+            computed,
+            computed.c.account_id == Account.id,
+        )
+    )
+    problems = []
+    for (account_id, balance, count, last_activity,
+         expected_balance, expected_count, expected_last_activity) in rows:
+        if (balance != expected_balance
+                or count != expected_count
+                or last_activity != expected_last_activity):
+            problems.append(
+                "Account {} has balance {:.2f}, {} transactions and last "
+                "activity {} but should have {:.2f}, {} and {}.".format(
+                    account_id,
+                    balance,
+                    count,
+                    last_activity,
+                    expected_balance,
+                    expected_count,
+                    expected_last_activity,
+                )
+            )
+    return problems
+
+
+def check(connection: Connection) -> List[str]:
+    """Check all ledger aggregates. Return the inconsistencies found."""
+    return (
+        check_summary(connection)
+        + check_accounts(connection)
+        + check_rollups(connection)
+        + check_checkpoints(connection)
+    )
+
+
+def get_budget(session: Session) -> Decimal:
+    """Return the total of all transactions without scanning them."""
+    total = session.execute(
+        select(LedgerSummary.total).where(LedgerSummary.id == SUMMARY_ID),
+    ).scalar()
+    return total or ZERO
+
+
+def get_data_version(session: Session) -> int:
+    """Return the data version of the ledger with a primary key lookup."""
+    version = session.execute(
+        select(LedgerSummary.data_version).where(
+            LedgerSummary.id == SUMMARY_ID,
+        ),
+    ).scalar()
+    return version or 0
+
+
+def bump_data_version(connection: Connection):
+    """Increment the data version for writes that change no aggregate."""
+    result = connection.execute(
+        update(LedgerSummary).where(
+            LedgerSummary.id == SUMMARY_ID,
+        ).values(
+            data_version=LedgerSummary.data_version + 1,
+        )
+    )
+    if result.rowcount == 0:
+        rebuild_summary(connection)
+
+
+def after_flush(session: Session, flush_context):
+    """
+    Apply the changes of the flushed transactions to the aggregates.
+
+    Flushes that change no aggregate, like new accounts or edited
+    descriptions, still increment the data version.
+    """
+    changes = collect_changes(session)
+    if changes:
+        apply_changes(session.connection(), changes)
+    elif session.new or session.dirty or session.deleted:
+        bump_data_version(session.connection())
+
+
+def register_ledger_events(session_factory: sessionmaker):
+    """Keep the aggregates in sync for sessions created by the factory."""
+    event.listen(session_factory, "after_flush", after_flush)
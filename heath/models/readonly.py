@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+
+"""
+Serve read-only views without the transaction machinery.
+
+Views declare themselves read-only with ``@view_config(..., read_only=True)``.
+If every view of a route and request method is read-only, ``pyramid_tm`` is
+not activated for such requests. ``request.dbsession`` is then a plain
+session without autoflush, bound to a connection that SQLite refuses to
+write with (``PRAGMA query_only``). The session is only created when a view
+uses it, so views that do not touch the database skip it entirely.
+
+Without a transaction around the request SQLite only holds its read lock
+while a statement runs.
+"""
+
+from typing import Optional, Set, Tuple
+
+from pyramid.interfaces import IRoutesMapper
+from pyramid.request import Request
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+
+READ_ONLY = "heath.read_only"
+
+# (route name, request method) pairs. A method of `None` stands for views
+# that accept any method.
+ViewKey = Tuple[str, Optional[str]]
+
+
+class ReadOnlyViews(object):
+    """Routes and request methods served by read-only views only."""
+
+    def __init__(self):
+        self.read_only: Set[ViewKey] = set()
+        self.writable: Set[ViewKey] = set()
+
+    def add(self, route_name: str, methods, read_only: bool):
+        if isinstance(methods, str):
+            methods = (methods,)
+        if methods and "GET" in methods:
+            # Pyramid serves HEAD requests with GET views.
+            methods = tuple(methods) + ("HEAD",)
+        keys = self.read_only if read_only else self.writable
+        keys.update((route_name, method) for method in (methods or (None,)))
+
+    def __contains__(self, key: ViewKey) -> bool:
+        route_name, method = key
+        if (route_name, method) in self.writable or (
+                route_name, None) in self.writable:
+            return False
+        return (route_name, method) in self.read_only or (
+            route_name, None) in self.read_only
+
+
+def get_read_only_views(registry) -> ReadOnlyViews:
+    return registry["read_only_views"]
+
+
+def read_only_view(view, info):
+    """Record whether the views of a route are read-only."""
+    route_name = info.options.get("route_name")
+    if route_name is not None and not info.exception_only:
+        get_read_only_views(info.registry).add(
+            route_name,
+            info.options.get("request_method"),
+            bool(info.options.get("read_only")),
+        )
+    return view
+
+
+read_only_view.options = ("read_only",)
+
+
+def is_read_only(request: Request) -> bool:
+    """Return if the request is served without a transaction."""
+    return request.environ.get(READ_ONLY, False)
+
+
+def activate_tm(request: Request) -> bool:
+    """
+    Activate ``pyramid_tm`` unless the request goes to read-only views.
+
+    Used as the ``tm.activate_hook``. Tweens run before the route of the
+    request is matched, so the route is looked up here.
+    """
+    match = request.registry.getUtility(IRoutesMapper)(request)
+    route = match["route"]
+    if route is not None and (route.name, request.method) in (
+            get_read_only_views(request.registry)):
+        request.environ[READ_ONLY] = True
+        return False
+    return True
+
+
+def get_read_only_session(
+    engine: Engine,
+    session_factory: sessionmaker,
+    request: Request,
+) -> Session:
+    """
+    Return a session for a read-only request.
+
+    The session is closed and its connection returned to the pool when the
+    request is finished, writable again.
+    """
+    connection = engine.connect()
+    if connection.dialect.name == "sqlite":
+        # Set on the driver connection, so it is not counted as a query.
+        connection.connection.driver_connection.execute(
+            "PRAGMA query_only = ON")
+    dbsession = session_factory(bind=connection, autoflush=False)
+
+    def close(request):
+        try:
+            dbsession.close()
+        finally:
+            # Reset even if closing failed, as later requests write with the
+            # pooled connection.
+            try:
+                if connection.dialect.name == "sqlite":
+                    connection.connection.driver_connection.execute(
+                        "PRAGMA query_only = OFF")
+            except Exception:
+                # Discard the connection instead of pooling it read-only.
+                connection.invalidate()
+                raise
+            finally:
+                connection.close()
+
+    request.add_finished_callback(close)
+    return dbsession
+
+
+def includeme(config):
+    """
+    Serve read-only views without ``pyramid_tm``.
+
+    Activate this setup using ``config.include('heath.models.readonly')``
+    before ``pyramid_tm`` is included.
+
+    """
+    config.registry["read_only_views"] = ReadOnlyViews()
+    config.get_settings()["tm.activate_hook"] = activate_tm
+    config.add_view_deriver(read_only_view)
@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+
+"""
+Define the spending rollups: income and expenses per account and period.
+
+For every account and every week and month with transactions there is one
+row with the sum of the incoming (positive) and the outgoing (negative)
+amounts and the number of transactions. Weeks start on Monday. Reports read
+these rows only, so their cost depends on the number of accounts and
+periods, not on the number of transactions.
+
+The rows are maintained incrementally from the ledger changes (see
+`heath.models.ledger.apply_changes`) and can be rebuilt from scratch with
+`rebuild_rollups`, spread over several worker threads.
+"""
+
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column,
+    Date,
+    Index,
+    Integer,
+    Text,
+    bindparam,
+    case,
+    delete,
+    insert,
+    literal_column,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.sql import func
+
+from heath.models.account import Account
+from heath.models.meta import Base
+from heath.models.transaction import Transaction
+from heath.models.types import Cents
+
+
+WEEK = "week"
+MONTH = "month"
+PERIODS = (WEEK, MONTH)
+
+# (period, account id, first day of the period)
+RollupKey = Tuple[str, Optional[int], date]
+# (income, expenses, transaction count)
+RollupValues = Tuple[Decimal, Decimal, int]
+
+
+class SpendingRollup(Base):
+    """
+    Income and expenses of an account in a week or month.
+
+    Transactions without an account are rolled up with an `account_id` of
+    `None`. Transactions without a creation time are not rolled up.
+    """
+
+    __tablename__ = "spending_rollups"
+    __table_args__ = (
+        # Reports list the periods newest first, optionally of one account.
+        Index(
+            "ix_spending_rollups_period_bucket_account_id",
+            "period",
+            "bucket",
+            "account_id",
+        ),
+    )
+    id = Column(Integer, primary_key=True)
+    period = Column(Text, nullable=False)
+    account_id = Column(Integer, nullable=True)
+    bucket = Column(Date, nullable=False)
+    income = Column(Cents, nullable=False, default=0)
+    expenses = Column(Cents, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+
+# Stands in for the missing account in the unique key of the rollups, because
+# a unique index treats every NULL as distinct.
+NO_ACCOUNT = 0
+
+# The columns of the unique key, which is the conflict target of the upsert.
+ROLLUP_KEY = (
+    SpendingRollup.period,
+    # Written out, to match the indexed expression.
+    func.ifnull(SpendingRollup.account_id, literal_column(str(NO_ACCOUNT))),
+    SpendingRollup.bucket,
+)
+Index("ux_spending_rollups_period_account_id_bucket", *ROLLUP_KEY,
+      unique=True)
+
+
+def bucket_of(period: str, created: datetime) -> date:
+    """Return the first day of the week or month containing `created`."""
+    day = created.date()
+    if period == WEEK:
+        return day - timedelta(days=day.weekday())
+    if period == MONTH:
+        return day.replace(day=1)
+    raise ValueError("Unknown period: {}".format(period))
+
+
+def bucket_expression(period: str, created):
+    """Return the SQLite expression computing `bucket_of` in the database."""
+    if period == WEEK:
+        # The next Sunday, unless it is one already, and back to Monday.
+        return func.date(created, "weekday 0", "-6 days", type_=Date)
+    if period == MONTH:
+        return func.date(created, "start of month", type_=Date)
+    raise ValueError("Unknown period: {}".format(period))
+
+
+def update_rollups(connection: Connection, changes: Iterable):
+    """
+    Add ledger changes to the rollups of their weeks and months.
+
+    Whether a change counts as income or expense depends on the sign of the
+    transaction, not of the change: removing an expense reduces the
+    expenses. The changes are summed up per row first and added with one
+    upsert of all rows, which creates the rows of new periods. Rows are
+    deleted once their last transaction is gone.
+    """
+    deltas: Dict[RollupKey, List] = defaultdict(
+        lambda: [Decimal(0), Decimal(0), 0])
+    for change in changes:
+        if change.created is None:
+            continue
+        is_income = change.amount * change.count > 0
+        for period in PERIODS:
+            delta = deltas[
+                period,
+                change.account_id,
+                bucket_of(period, change.created),
+            ]
+            delta[0 if is_income else 1] += change.amount
+            delta[2] += change.count
+    if not deltas:
+        return
+
+    upsert = sqlite_insert(SpendingRollup)
+    connection.execute(
+        upsert.on_conflict_do_update(
+            index_elements=ROLLUP_KEY,
+            set_={
+                "income": SpendingRollup.income + upsert.excluded.income,
+                "expenses": (
+                    SpendingRollup.expenses + upsert.excluded.expenses),
+                "transaction_count": (
+                    SpendingRollup.transaction_count
+                    + upsert.excluded.transaction_count),
+            },
+        ),
+        [
+            {
+                "period": period,
+                "account_id": account_id,
+                "bucket": bucket,
+                "income": income,
+                "expenses": expenses,
+                "transaction_count": count,
+            }
+            for (period, account_id, bucket), (income, expenses, count) in (
+                deltas.items())
+        ],
+    )
+
+    # Only rows that lost transactions can have become empty.
+    emptied = [
+        {"period": period, "account_key": account_id, "bucket": bucket}
+        for (period, account_id, bucket), (_, _, count) in deltas.items()
+        if count < 0
+    ]
+    if emptied:
+        period_key, account_key, bucket_key = ROLLUP_KEY
+        connection.execute(
+            delete(SpendingRollup).where(
+                SpendingRollup.transaction_count == 0,
+                period_key == bindparam("period"),
+                account_key == func.ifnull(
+                    bindparam("account_key", type_=Integer),
+                    literal_column(str(NO_ACCOUNT)),
+                ),
+                bucket_key == bindparam("bucket", type_=Date),
+            ),
+            emptied,
+        )
+
+
+def compute_rollups(
+    connection: Connection,
+    account_id: Optional[int],
+) -> Dict[RollupKey, RollupValues]:
+    """Compute the rollups of one account from the transactions table."""
+    rollups = {}
+    for period in PERIODS:
+        bucket = bucket_expression(period, Transaction.created)
+        rows = connection.execute(
+            select(
+                bucket.label("bucket"),
+                func.coalesce(func.sum(case(
+                    (Transaction.amount > 0, Transaction.amount),
+                    else_=0,
+                )), 0).label("income"),
+                func.coalesce(func.sum(case(
+                    (Transaction.amount <= 0, Transaction.amount),
+                    else_=0,
+                )), 0).label("expenses"),
+                func.count(Transaction.id).label("transaction_count"),
+            ).where(
+                Transaction.account_id == account_id,
+                Transaction.created.is_not(None),
+            ).group_by(
+                bucket,
+            )
+        )
+        for row in rows:
+            rollups[period, account_id, row.bucket] = (
+                row.income,
+                row.expenses,
+                row.transaction_count,
+            )
+    return rollups
+
+
+def compute_all_rollups(
+    connection: Connection,
+    workers: int = 1,
+) -> Dict[RollupKey, RollupValues]:
+    """
+    Compute the rollups of all accounts from the transactions table.
+
+    The accounts are split among `workers` threads, each reading with its
+    own connection of the engine. The workers only see committed
+    transactions. SQLite computes the aggregates without holding the GIL,
+    so the threads run in parallel. In-memory databases can not be shared
+    between connections and are always computed on `connection`.
+    """
+    account_ids = connection.execute(select(Account.id)).scalars().all()
+    partitions = [None] + list(account_ids)
+    rollups = {}
+    in_memory = connection.engine.url.database in (None, "", ":memory:")
+    if workers <= 1 or in_memory:
+        for account_id in partitions:
+            rollups.update(compute_rollups(connection, account_id))
+        return rollups
+
+    def compute(account_id):
+        with connection.engine.connect() as worker_connection:
+            return compute_rollups(worker_connection, account_id)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for partition in executor.map(compute, partitions):
+            rollups.update(partition)
+    return rollups
+
+
+def rebuild_rollups(connection: Connection, workers: int = 1):
+    """Replace the rollups with values computed from scratch."""
+    rollups = compute_all_rollups(connection, workers)
+    connection.execute(delete(SpendingRollup))
+    if rollups:
+        connection.execute(insert(SpendingRollup), [
+            {
+                "period": period,
+                "account_id": account_id,
+                "bucket": bucket,
+                "income": income,
+                "expenses": expenses,
+                "transaction_count": count,
+            }
+            for (period, account_id, bucket), (income, expenses, count) in (
+                rollups.items())
+        ])
+
+
+def check_rollups(connection: Connection) -> List[str]:
+    """
+    Compare the stored rollups with freshly computed values.
+
+    Returns:
+        list: Descriptions of the inconsistencies found. Empty if the
+            rollups are consistent.
+
+    """
+    stored = dict(
+        (
+            (row.period, row.account_id, row.bucket),
+            (row.income, row.expenses, row.transaction_count),
+        )
+        for row in connection.execute(select(
+            SpendingRollup.period,
+            SpendingRollup.account_id,
+            SpendingRollup.bucket,
+            SpendingRollup.income,
+            SpendingRollup.expenses,
+            SpendingRollup.transaction_count,
+        ))
+    )
+    computed = compute_all_rollups(connection)
+    problems = []
+    for key in sorted(set(stored) | set(computed), key=str):
+        if stored.get(key) != computed.get(key):
+            period, account_id, bucket = key
+            problems.append(
+                "Rollup of account {} for the {} of {} is {} but should be "
+                "{}.".format(
+                    account_id,
+                    period,
+                    bucket,
+                    stored.get(key),
+                    computed.get(key),
+                )
+            )
+    return problems
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+
+"""
+Search transaction descriptions with SQLite's FTS5 full-text index.
+
+The index is the external content table `transactions_fts`. It stores no
+copy of the descriptions, only the index, with extra indexes for prefixes
+of two and three characters. Triggers on `transactions` keep it in sync.
+It is created with the `transactions` table (see the DDL events below) and
+by the Alembic revision adding it to existing databases.
+
+If SQLite is compiled without FTS5 the index is not created and searches
+fall back to ``LIKE`` conditions, which scan the table.
+
+Batch migrations that recreate the `transactions` table drop its
+triggers. Run `create_search_index` again after such a migration.
+"""
+
+import re
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+
+from sqlalchemy import column, event, func, literal_column, select, table
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import Select
+
+from heath.models.transaction import Transaction
+
+
+FTS_TABLE = "transactions_fts"
+
+# Key of the cached result of `has_search_index` in `Connection.info`.
+HAS_INDEX = "heath.search.has_index"
+
+CREATE_INSERT_TRIGGER = (
+    "CREATE TRIGGER transactions_fts_insert AFTER INSERT ON transactions "
+    "BEGIN INSERT INTO transactions_fts (rowid, description) "
+    "VALUES (new.id, new.description); END"
+)
+
+DROP_INSERT_TRIGGER = "DROP TRIGGER IF EXISTS transactions_fts_insert"
+
+CREATE_STATEMENTS = (
+    "CREATE VIRTUAL TABLE transactions_fts USING fts5("
+    "description, content='transactions', content_rowid='id', "
+    "prefix='2 3', tokenize='unicode61 remove_diacritics 2')",
+    CREATE_INSERT_TRIGGER,
+    "CREATE TRIGGER transactions_fts_delete AFTER DELETE ON transactions "
+    "BEGIN INSERT INTO transactions_fts (transactions_fts, rowid, "
+    "description) VALUES ('delete', old.id, old.description); END",
+    "CREATE TRIGGER transactions_fts_update "
+    "AFTER UPDATE OF description ON transactions "
+    "BEGIN INSERT INTO transactions_fts (transactions_fts, rowid, "
+    "description) VALUES ('delete', old.id, old.description); "
+    "INSERT INTO transactions_fts (rowid, description) "
+    "VALUES (new.id, new.description); END",
+    # Index the rows that are already there.
+    "INSERT INTO transactions_fts (transactions_fts) VALUES ('rebuild')",
+)
+
+# Index the rows inserted while the insert trigger was dropped.
+INDEX_NEW_ROWS = (
+    "INSERT INTO transactions_fts (rowid, description) "
+    "SELECT id, description FROM transactions WHERE id > ?"
+)
+
+DROP_STATEMENTS = (
+    DROP_INSERT_TRIGGER,
+    "DROP TRIGGER IF EXISTS transactions_fts_delete",
+    "DROP TRIGGER IF EXISTS transactions_fts_update",
+    "DROP TABLE IF EXISTS transactions_fts",
+)
+
+transactions_fts = table(
+    FTS_TABLE,
+    column("rowid"),
+    column("rank"),
+)
+
+WORD = re.compile(r"\w+")
+
+# Number of the newest hits ranked by relevance. See `search_statement`.
+# Older hits follow them unranked, see `older_hits_statement`.
+SEARCH_WINDOW = 1000
+
+
+def fts5_available(connection: Connection) -> bool:
+    """Return if SQLite on this connection supports FTS5."""
+    if connection.dialect.name != "sqlite":
+        return False
+    try:
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE temp.heath_fts5_probe USING fts5(probe)")
+    except OperationalError:
+        return False
+    connection.exec_driver_sql("DROP TABLE temp.heath_fts5_probe")
+    return True
+
+
+def create_search_index(connection: Connection) -> bool:
+    """
+    Create and fill the full-text index, if FTS5 is available.
+
+    Returns:
+        bool: True if the index was created.
+
+    """
+    if not fts5_available(connection):
+        return False
+    for statement in DROP_STATEMENTS + CREATE_STATEMENTS:
+        connection.exec_driver_sql(statement)
+    connection.info.pop(HAS_INDEX, None)
+    return True
+
+
+def drop_search_index(connection: Connection):
+    """Drop the full-text index and its triggers."""
+    if connection.dialect.name != "sqlite":
+        return
+    for statement in DROP_STATEMENTS:
+        connection.exec_driver_sql(statement)
+    connection.info.pop(HAS_INDEX, None)
+
+
+@contextmanager
+def deferred_search_index(connection: Connection) -> Iterator[None]:
+    """
+    Index the transactions inserted in the block at its end.
+
+    For bulk inserts, which are several times faster without the insert
+    trigger. The trigger is dropped, and when the block is left it is
+    created again and the rows added since are indexed with one statement.
+    Work of the block that is not committed when it raises is rolled back
+    first. Committed rows are indexed either way.
+
+    Rows added in the block must not be updated or deleted by others
+    before they are indexed.
+    """
+    if not has_search_index(connection):
+        yield
+        return
+    last_id = connection.scalar(
+        select(func.coalesce(func.max(Transaction.id), 0)))
+    connection.exec_driver_sql(DROP_INSERT_TRIGGER)
+    connection.commit()
+    try:
+        yield
+    except BaseException:
+        connection.rollback()
+        raise
+    finally:
+        connection.exec_driver_sql(CREATE_INSERT_TRIGGER)
+        connection.exec_driver_sql(INDEX_NEW_ROWS, (last_id,))
+        connection.commit()
+
+
+@event.listens_for(Transaction.__table__, "after_create")
+def create_search_index_with_table(target, connection, **kw):
+    """Create the full-text index with the transactions table."""
+    create_search_index(connection)
+
+
+@event.listens_for(Transaction.__table__, "before_drop")
+def drop_search_index_with_table(target, connection, **kw):
+    """Drop the full-text index before the transactions table."""
+    drop_search_index(connection)
+
+
+def has_search_index(connection: Connection) -> bool:
+    """
+    Return if the database has the full-text index.
+
+    The answer is cached with the pooled database connection, so the
+    schema is only looked up once per connection.
+    """
+    if HAS_INDEX not in connection.info:
+        connection.info[HAS_INDEX] = (
+            connection.dialect.name == "sqlite"
+            and connection.exec_driver_sql(
+                "SELECT 1 FROM sqlite_master "
+                "WHERE type = 'table' AND name = ?",
+                (FTS_TABLE,),
+            ).scalar() is not None
+        )
+    return connection.info[HAS_INDEX]
+
+
+def search_terms(text: str) -> List[str]:
+    """Split a search into its words, ignoring all other characters."""
+    return WORD.findall(text)
+
+
+def match_expression(terms: List[str]) -> Optional[str]:
+    """
+    Return an FTS5 query matching descriptions with all terms.
+
+    The last term also matches as a prefix, so searches can be run while
+    the last word is typed. Prefixes longer than the prefix indexes merge
+    the entries of all matching words, which is why only the last term is
+    one. Terms are quoted, so operators in the input are searched for as
+    words.
+    """
+    if not terms:
+        return None
+    quoted = ['"{}"'.format(term) for term in terms]
+    quoted[-1] += "*"
+    return " ".join(quoted)
+
+
+def search_statement(connection: Connection, terms: List[str],
+                     *columns) -> Select:
+    """
+    Return a statement selecting `columns` of the transactions matching.
+
+    With the full-text index the descriptions have to contain every term,
+    see `match_expression`. The newest `SEARCH_WINDOW` hits are read from
+    the index in order of their ids, which stops early, and ordered by
+    relevance (BM25). Scoring all hits of common words would take seconds
+    on large ledgers. The older hits are selected by
+    `older_hits_statement`.
+
+    Without the index the descriptions have to contain every term, ignoring
+    the case of ASCII letters, and the newest transactions come first.
+    """
+    if has_search_index(connection):
+        hits = select(
+            transactions_fts.c.rowid.label("id"),
+            func.bm25(literal_column(FTS_TABLE)).label("score"),
+        ).where(
+            literal_column(FTS_TABLE).op("MATCH")(match_expression(terms)),
+        ).order_by(
+            transactions_fts.c.rowid.desc(),
+        ).limit(
+            SEARCH_WINDOW,
+        ).subquery("hits")
+        return select(*columns).join_from(
+            hits,
+            Transaction,
+            Transaction.id == hits.c.id,
+        ).order_by(
+            hits.c.score,
+            Transaction.id.desc(),
+        )
+    return select(*columns).where(
+        *(
+            Transaction.description.contains(term, autoescape=True)
+            for term in terms
+        )
+    ).order_by(
+        Transaction.id.desc(),
+    )
+
+
+def older_hits_statement(terms: List[str], *columns) -> Select:
+    """
+    Return a statement selecting `columns` of the hits past the window.
+
+    These are the hits of the full-text index older than the newest
+    `SEARCH_WINDOW`, newest first. They are read from the index in order of
+    their ids, so pages of them stop early like the window.
+    """
+    match = literal_column(FTS_TABLE).op("MATCH")(match_expression(terms))
+    oldest_ranked = select(
+        transactions_fts.c.rowid,
+    ).where(
+        match,
+    ).order_by(
+        transactions_fts.c.rowid.desc(),
+    ).limit(1).offset(
+        SEARCH_WINDOW - 1,
+    ).scalar_subquery()
+    return select(*columns).join_from(
+        transactions_fts,
+        Transaction,
+        Transaction.id == transactions_fts.c.rowid,
+    ).where(
+        match,
+        transactions_fts.c.rowid < oldest_ranked,
+    ).order_by(
+        transactions_fts.c.rowid.desc(),
+    )
+
+
+def search_rows(connection: Connection, terms: List[str], columns,
+                offset: int, limit: int) -> List[Row]:
+    """
+    Return up to `limit` hits from the position `offset` on.
+
+    With the full-text index the hits ranked by `search_statement` are
+    followed by the older hits of `older_hits_statement`, so paging reaches
+    every hit. The older hits are only read once the ranked ones are used
+    up.
+    """
+    statement = search_statement(connection, terms, *columns)
+    if not has_search_index(connection):
+        return connection.execute(
+            statement.limit(limit).offset(offset)).all()
+    rows: List[Row] = []
+    if offset < SEARCH_WINDOW:
+        rows = connection.execute(
+            statement.limit(limit).offset(offset)).all()
+        if len(rows) == limit or offset + len(rows) < SEARCH_WINDOW:
+            return rows
+    older = older_hits_statement(terms, *columns).limit(
+        limit - len(rows),
+    ).offset(
+        max(offset - SEARCH_WINDOW, 0),
+    )
+    return rows + connection.execute(older).all()
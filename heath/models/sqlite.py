@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+
+"""
+Tune SQLite connections and make lock contention visible.
+
+Connections are configured with the ``PRAGMA`` statements given as
+``heath.sqlite.*`` settings, for example::
+
+    heath.sqlite.journal_mode = wal
+    heath.sqlite.busy_timeout = 5000
+
+Requests that fail because the database is locked are marked as retryable
+for ``pyramid_retry`` and counted, so the effect of the settings can be
+observed.
+"""
+
+import logging
+import threading
+from typing import Dict
+
+from pyramid.request import Request
+from pyramid_retry import IBeforeRetry, is_last_attempt, mark_error_retryable
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.expression import ColumnElement, UnaryExpression
+
+
+log = logging.getLogger(__name__)
+
+SETTINGS_PREFIX = "heath.sqlite."
+
+# Supported pragmas with their allowed keyword values. `int` stands for any
+# integer value. Values are validated because they end up in SQL.
+PRAGMAS = {
+    "journal_mode": {"delete", "truncate", "persist", "memory", "wal", "off"},
+    "synchronous": {"off", "normal", "full", "extra", "0", "1", "2", "3"},
+    "busy_timeout": int,
+    "mmap_size": int,
+    "cache_size": int,
+    "temp_store": {"default", "file", "memory", "0", "1", "2"},
+}
+
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+
+def pragmas_from_settings(settings: Dict) -> Dict[str, str]:
+    """
+    Collect and validate the ``heath.sqlite.*`` pragma settings.
+
+    Raises:
+        ValueError: If a pragma is unknown or its value is not allowed.
+
+    """
+    pragmas = {}
+    for key, value in settings.items():
+        if not key.startswith(SETTINGS_PREFIX):
+            continue
+        name = key[len(SETTINGS_PREFIX):]
+        allowed = PRAGMAS.get(name)
+        value = str(value).strip().lower()
+        if allowed is None:
+            raise ValueError("Unknown SQLite pragma: {}".format(key))
+        if allowed is int:
+            value = str(int(value))
+        elif value not in allowed:
+            raise ValueError("Invalid value for {}: {}".format(key, value))
+        pragmas[name] = value
+    return pragmas
+
+
+def apply_pragmas(engine: Engine, pragmas: Dict[str, str]):
+    """Execute the pragmas on every new connection of the engine's pool."""
+    if not pragmas or engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute("PRAGMA {} = {}".format(name, value))
+        finally:
+            cursor.close()
+
+
+def unindexed(column: ColumnElement) -> ColumnElement:
+    """
+    Return the column wrapped in SQLite's unary ``+`` operator.
+
+    Conditions on the result can not be satisfied with an index, which
+    steers the query planner to the index of another condition or of the
+    ORDER BY clause. The value is unchanged.
+    """
+    return UnaryExpression(
+        column,
+        operator=operators.custom_op("+"),
+        type_=column.type,
+    )
+
+
+def is_lock_error(error: BaseException) -> bool:
+    """Return if the error was caused by a busy or locked SQLite database."""
+    if not isinstance(error, OperationalError):
+        return False
+    code = getattr(error.orig, "sqlite_errorcode", None)
+    if code is not None:
+        return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+    return "locked" in str(error.orig)
+
+
+class LockContentionStats(object):
+    """Thread safe counters of requests affected by lock contention."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.retries = 0
+        self.failures = 0
+
+    def count_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def count_failure(self):
+        with self._lock:
+            self.failures += 1
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {"retries": self.retries, "failures": self.failures}
+
+
+def get_lock_stats(registry) -> LockContentionStats:
+    return registry["sqlite_lock_stats"]
+
+
+def lock_retry_tween_factory(handler, registry):
+    """
+    Mark lock errors as retryable for ``pyramid_retry``.
+
+    The tween has to wrap ``pyramid_tm``, because the error usually happens
+    when the transaction is committed.
+    """
+    stats = get_lock_stats(registry)
+
+    def lock_retry_tween(request: Request):
+        try:
+            return handler(request)
+        except OperationalError as error:
+            if is_lock_error(error):
+                if is_last_attempt(request):
+                    stats.count_failure()
+                    log.warning(
+                        "Request failed after SQLite lock contention "
+                        "(%(retries)s retries, %(failures)s failures so far)",
+                        stats.as_dict(),
+                    )
+                else:
+                    mark_error_retryable(error)
+            raise
+
+    return lock_retry_tween
+
+
+def count_lock_retry(event):
+    """Count retries caused by lock contention."""
+    if is_lock_error(event.exception):
+        stats = get_lock_stats(event.request.registry)
+        stats.count_retry()
+        log.info(
+            "Retrying request after SQLite lock contention "
+            "(%(retries)s retries, %(failures)s failures so far)",
+            stats.as_dict(),
+        )
+
+
+def includeme(config):
+    """
+    Count and retry lock contention.
+
+    Activate this setup using ``config.include('heath.models.sqlite')``.
+
+    """
+    config.registry["sqlite_lock_stats"] = LockContentionStats()
+    config.add_subscriber(count_lock_retry, IBeforeRetry)
+    config.add_tween(
+        "heath.models.sqlite.lock_retry_tween_factory",
+        over="pyramid_tm.tm_tween_factory",
+    )
@@ -3,18 +3,21 @@
 """Define Transaction model."""
 
 from datetime import datetime
+from decimal import Decimal
 
 from sqlalchemy import (
     Column,
     ForeignKey,
     Integer,
-    Float,
     Text,
     DateTime,
+    Index,
+    text,
 )
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import column_property, relationship, validates
 
 from heath.models.meta import Base
+from heath.models.types import Cents, to_amount
 
 
 class Transaction(Base):
@@ -22,19 +25,65 @@ class Transaction(Base):
     Transaction class to represent financial transactions.
 
     Transactions can have a positive or negative amount (e.g. income vs.
-    expenses).
+    expenses). Amounts are stored as integer cents and exposed as `Decimal`.
+
+    The columns that feed into the ledger aggregates (see
+    `heath.models.ledger`) load their previous value when they are changed,
+    so the aggregates can be corrected by the difference.
 
     """
 
     __tablename__ = "transactions"
+    __table_args__ = (
+        # Newest first listing and keyset pagination on (created, id).
+        Index("ix_transactions_created_id", "created", "id"),
+        # Transactions of one account, optionally in a date range.
+        Index("ix_transactions_account_id_created", "account_id", "created"),
+        # Listing sorted by amount or in an amount range, of all transactions
+        # or of one account.
+        Index("ix_transactions_amount_id", "amount", "id"),
+        Index("ix_transactions_account_id_amount", "account_id", "amount"),
+    )
     id = Column(Integer, primary_key=True, index=True)
     description = Column(Text, nullable=False)
-    amount = Column(
-        Float(precision=2, decimal_return_scale=2),
-        nullable=False,
+    amount = column_property(
+        Column(Cents, nullable=False),
+        active_history=True,
     )
 
-    account_id = Column(Integer, ForeignKey("accounts.id"))
+    account_id = column_property(
+        Column(Integer, ForeignKey("accounts.id")),
+        active_history=True,
+    )
     account = relationship("Account", back_populates="transactions")
 
-    created = Column(DateTime, nullable=True, default=datetime.now)
+    created = column_property(
+        Column(DateTime, nullable=True, default=datetime.now),
+        active_history=True,
+    )
+    # Incremented by every update, so cached renderings of the row can be
+    # keyed by it (see `heath.fragments`). The increment is computed by the
+    # database, so concurrent updates both count.
+    version = Column(
+        Integer,
+        nullable=False,
+        default=1,
+        server_default="1",
+        onupdate=text("version + 1"),
+    )
+
+    @validates("amount")
+    def validate_amount(self, key, value) -> Decimal:
+        """Keep the amount a `Decimal` in cents, whatever was assigned."""
+        return to_amount(value)
+
+
+def parse_amount(value) -> Decimal:
+    """
+    Parse the amount of a transaction from user input.
+
+    Raises:
+        ValueError: If the value is not a finite number or too large.
+
+    """
+    return to_amount(value)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+"""Define custom column types."""
+
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from sqlalchemy import BigInteger
+from sqlalchemy.types import TypeDecorator
+
+
+CENT = Decimal("0.01")
+
+# Largest value of a signed 64 bit integer, as used for ids and cents.
+MAX_INTEGER = 2 ** 63 - 1
+
+# Largest amount that fits into a signed 64 bit integer of cents.
+MAX_AMOUNT = Decimal(MAX_INTEGER).scaleb(-2).quantize(CENT)
+
+
+def to_id(value) -> int:
+    """
+    Convert a value to an integer that can be compared with ids.
+
+    Raises:
+        ValueError: If the value is not an integer or does not fit into a
+            signed 64 bit integer, which is the largest the database takes.
+
+    """
+    number = int(value)
+    if abs(number) > MAX_INTEGER:
+        raise ValueError("Id out of range: {!r}".format(value))
+    return number
+
+
+def to_amount(value) -> Decimal:
+    """
+    Convert a value to a `Decimal` amount rounded to cents.
+
+    Floats are converted via their shortest string representation, so
+    `0.1` becomes `Decimal("0.10")` rather than its binary expansion.
+
+    Raises:
+        ValueError: If the value is not a finite number or too large.
+
+    """
+    if isinstance(value, float):
+        value = repr(value)
+    try:
+        amount = Decimal(value.strip() if isinstance(value, str) else value)
+    except (InvalidOperation, TypeError) as error:
+        raise ValueError("Not a number: {!r}".format(value)) from error
+    if not amount.is_finite():
+        raise ValueError("Not a finite number: {!r}".format(value))
+    # Checked before rounding, which fails for very large numbers. Amounts
+    # up to the maximum are rounded to at most the maximum.
+    if abs(amount) > MAX_AMOUNT:
+        raise ValueError("Amount too large: {!r}".format(value))
+    return amount.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class Cents(TypeDecorator):
+    """
+    Monetary amount stored as a 64 bit integer of cents.
+
+    Values are exposed as `Decimal` with two decimal places. Sums and
+    differences computed by the database are exact, because they are done on
+    integers.
+    """
+
+    impl = BigInteger
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return int(to_amount(value).scaleb(2))
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return Decimal(int(value)).scaleb(-2)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+
+"""Define helpers for keyset (cursor) pagination."""
+
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+from typing import Optional, Tuple, Union
+
+from heath.models.types import to_amount, to_id
+
+SortValue = Optional[Union[datetime, Decimal]]
+
+# Tags of the sort value types in a token.
+DATETIME = "d"
+DECIMAL = "n"
+NULL = "0"
+
+
+def encode_cursor(value: SortValue, row_id: int) -> str:
+    """
+    Encode the sort key of a row into an opaque cursor token.
+
+    The sort key is the value of the sort column, a `datetime`, a
+    `Decimal` or `None`, and the id of the row. The token is URL safe and
+    can be passed back as the ``after`` or ``before`` query parameter to
+    continue paging from the given row.
+
+    """
+    if isinstance(value, datetime):
+        payload = [DATETIME, value.isoformat(), row_id]
+    elif isinstance(value, Decimal):
+        payload = [DECIMAL, str(value), row_id]
+    elif value is None:
+        payload = [NULL, None, row_id]
+    else:
+        raise TypeError("Can not encode {!r} in a cursor".format(value))
+    token = base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8"))
+    return token.decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[SortValue, int]:
+    """
+    Decode a cursor token created by :func:`encode_cursor`.
+
+    Raises:
+        ValueError: If the token is malformed or its values are out of the
+            range of the columns.
+
+    """
+    padded = token + "=" * (-len(token) % 4)
+    try:
+        payload = base64.urlsafe_b64decode(padded.encode("ascii"))
+        payload = json.loads(payload.decode("utf-8"))
+        if len(payload) == 2:
+            # Tokens of date sorted pages before other sort orders existed.
+            payload = [DATETIME] + payload
+        kind, value, row_id = payload
+        if kind == DATETIME:
+            return datetime.fromisoformat(value), to_id(row_id)
+        if kind == NULL and value is None:
+            return None, to_id(row_id)
+        if kind == DECIMAL:
+            return to_amount(value), to_id(row_id)
+        raise ValueError(kind)
+    except (binascii.Error, UnicodeError, TypeError, ValueError,
+            ArithmeticError) as error:
+        raise ValueError("Invalid cursor: {}".format(token)) from error
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+"""
+Guard views against N+1 queries and declare per-view query budgets.
+
+With ``heath.query_guard`` set to ``warn`` or ``raise`` the SQL statements
+issued while a view runs, including the rendering of its template, are
+recorded. A view violates the guard if
+
+- it issues more statements than its ``query_budget``, declared with
+  ``@view_config(..., query_budget=3)``, or
+- it lazy loads the same relationship more often than
+  ``heath.query_guard.max_lazy_loads`` (default 1), which is the signature
+  of a loop over rows touching a lazy relationship.
+
+Violations are logged with ``warn`` and raise `QueryBudgetExceeded` with
+``raise``. The guard is meant for development and tests. It is off by
+default and nothing is recorded then.
+
+Tests can record the statements of any code with `recording`.
+"""
+
+import logging
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import ORMExecuteState
+
+
+log = logging.getLogger(__name__)
+
+MODES = ("off", "warn", "raise")
+DEFAULT_MAX_LAZY_LOADS = 1
+
+
+class QueryBudgetExceeded(Exception):
+    """Raised by views that violate the query guard in ``raise`` mode."""
+
+
+class QueryLog(object):
+    """Statements and lazy loads recorded while the log is active."""
+
+    def __init__(self):
+        self.statements: List[str] = []
+        self.lazy_loads: Counter = Counter()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    def repeated_lazy_loads(self, limit: int = DEFAULT_MAX_LAZY_LOADS,
+                            ) -> Dict[str, int]:
+        """Return the relationships lazy loaded more than `limit` times."""
+        return dict(
+            (relationship, count)
+            for relationship, count in self.lazy_loads.items()
+            if count > limit
+        )
+
+    def problems(self, budget: Optional[int] = None,
+                 max_lazy_loads: int = DEFAULT_MAX_LAZY_LOADS) -> List[str]:
+        """Describe how the recorded statements violate the limits."""
+        problems = []
+        if budget is not None and self.count > budget:
+            problems.append("{} statements issued, the budget is {}".format(
+                self.count,
+                budget,
+            ))
+        for relationship, count in sorted(
+                self.repeated_lazy_loads(max_lazy_loads).items()):
+            problems.append(
+                "{} lazy loaded {} times, load it eagerly".format(
+                    relationship,
+                    count,
+                ))
+        return problems
+
+
+_logs: ContextVar[Tuple[QueryLog, ...]] = ContextVar(
+    "heath_query_logs",
+    default=(),
+)
+
+
+@contextmanager
+def recording() -> Iterator[QueryLog]:
+    """
+    Record the statements issued within the block.
+
+    Only engines and session factories set up with `install` are recorded.
+    Recordings can be nested.
+    """
+    query_log = QueryLog()
+    token = _logs.set(_logs.get() + (query_log,))
+    try:
+        yield query_log
+    finally:
+        _logs.reset(token)
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    for query_log in _logs.get():
+        query_log.statements.append(statement)
+
+
+def do_orm_execute(orm_execute_state: ORMExecuteState):
+    logs = _logs.get()
+    if (logs and orm_execute_state.is_select
+            and orm_execute_state.lazy_loaded_from is not None):
+        relationship = str(orm_execute_state.loader_strategy_path[-1])
+        for query_log in logs:
+            query_log.lazy_loads[relationship] += 1
+
+
+def install(engine, session_factory):
+    """Record the statements of the engine and sessions of the factory."""
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(session_factory, "do_orm_execute", do_orm_execute)
+
+
+def get_mode(settings) -> str:
+    mode = str(settings.get("heath.query_guard", "off")).strip().lower()
+    if mode not in MODES:
+        raise ValueError("heath.query_guard has to be one of {}".format(
+            ", ".join(MODES)))
+    return mode
+
+
+def guarded_view(view, info):
+    """Check the statements of a view against the query guard."""
+    settings = info.registry.settings
+    mode = get_mode(settings)
+    if mode == "off":
+        return view
+    budget = info.options.get("query_budget")
+    max_lazy_loads = int(settings.get(
+        "heath.query_guard.max_lazy_loads",
+        DEFAULT_MAX_LAZY_LOADS,
+    ))
+
+    def wrapper(context, request):
+        with recording() as query_log:
+            response = view(context, request)
+        problems = query_log.problems(budget, max_lazy_loads)
+        if problems:
+            route = getattr(request, "matched_route", None)
+            message = "Query guard of {} violated: {}".format(
+                route.name if route else request.path,
+                "; ".join(problems),
+            )
+            if mode == "raise":
+                raise QueryBudgetExceeded(message)
+            log.warning(message)
+        return response
+
+    return wrapper
+
+
+guarded_view.options = ("query_budget",)
+
+
+def includeme(config):
+    """
+    Set up the query guard.
+
+    Activate this setup using ``config.include('heath.queryguard')`` after
+    including ``heath.models``. The view deriver is always added, so views
+    can declare their ``query_budget`` regardless of the mode.
+
+    """
+    config.add_view_deriver(guarded_view)
+    if get_mode(config.get_settings()) != "off":
+        install(
+            config.registry["engine"],
+            config.registry["dbsession_factory"],
+        )
@@ -2,16 +2,54 @@
 
 """Define routes of the application."""
 
+from pyramid.path import AssetResolver
+from pyramid.static import ManifestCacheBuster
+
+
+STATIC_MAX_AGE = 3600
+# Written by `build_heath_static`, see `heath.scripts.build_static`.
+STATIC_MANIFEST = 'heath:static/build/manifest.json'
+HASHED_STATIC_MAX_AGE = 365 * 24 * 3600
+# Precompressed siblings of static files served if the client accepts them.
+STATIC_ENCODINGS = ('br', 'gzip')
+
+
+def static_views(config):
+    """
+    Serve the static files.
+
+    If the static files are built, the URLs of static files point to their
+    copies with the hash of the content in the name. The URL changes with
+    the content, so the files are cached for a year. Static files have to
+    be referred to with `request.static_url` then.
+
+    """
+    built = AssetResolver().resolve(STATIC_MANIFEST).exists()
+    config.add_static_view(
+        'static',
+        'static',
+        cache_max_age=HASHED_STATIC_MAX_AGE if built else STATIC_MAX_AGE,
+        content_encodings=STATIC_ENCODINGS,
+    )
+    if built:
+        config.add_cache_buster(
+            'static',
+            ManifestCacheBuster(STATIC_MANIFEST),
+        )
+
 
 def account_routes(config):
     """Define only account related routes."""
     config.add_route('accounts.create', '/create')
+    config.add_route('accounts.balance', '/{account_id}/balance')
 
 
 def transaction_routes(config):
     """Define only transaction related routes."""
     config.add_route('transaction.create', '/create')
     config.add_route('transaction.list', '/')
+    config.add_route('transaction.export', '/export.{format:csv|ndjson}')
+    config.add_route('transaction.search', '/search')
     config.add_route('transaction.detail', '/{transaction_id}')
     config.add_route('transaction.update', '/{transaction_id}/update')
     config.add_route('transaction.delete', '/{transaction_id}/delete')
@@ -19,9 +57,11 @@ def transaction_routes(config):
 
 def includeme(config):
     """Pull route configuration together."""
-    config.add_static_view('static', 'static', cache_max_age=3600)
+    config.include(static_views)
     config.add_route('landing', '/')
     config.add_route('home', '/home')
+    config.add_route('status', '/status')
+    config.add_route('reports', '/reports/')
 
     config.include(account_routes, route_prefix="/accounts/")
     config.include(transaction_routes, route_prefix="/transactions/")
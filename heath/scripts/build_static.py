@@ -0,0 +1,103 @@
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import sys
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                          'static')
+# Directory of the built files and the manifest, inside the static files.
+BUILD_DIR = 'build'
+MANIFEST = 'manifest.json'
+
+COMPRESSIBLE_EXTENSIONS = ('.css', '.html', '.js', '.json', '.svg', '.txt')
+
+HASH_LENGTH = 12
+
+
+def hashed_name(path, content):
+    """Return the path with the hash of the content before the extension."""
+    root, extension = posixpath.splitext(path)
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return '{}.{}{}'.format(root, digest, extension)
+
+
+def write_compressed(path, content):
+    """
+    Write the ``.gz`` and ``.br`` siblings of the file at `path`.
+
+    A sibling is only written if it is smaller than the file. The ``.br``
+    sibling needs the optional ``brotli`` package.
+
+    """
+    variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:  # pragma: no cover
+        variants.append(('.br', brotli.compress(content, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            with open(path + suffix, 'wb') as f:
+                f.write(compressed)
+
+
+def build(static_dir):
+    """
+    Write the static files with hashed names and their compressed siblings.
+
+    The files go to the ``build`` directory of `static_dir`, which is
+    replaced. Its ``manifest.json`` maps the path of each static file to
+    the built one, both relative to `static_dir`. Return the manifest.
+
+    """
+    build_dir = os.path.join(static_dir, BUILD_DIR)
+    shutil.rmtree(build_dir, ignore_errors=True)
+    os.makedirs(build_dir)
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if root == static_dir and BUILD_DIR in dirs:
+            dirs.remove(BUILD_DIR)
+        for filename in sorted(files):
+            source = os.path.join(root, filename)
+            path = os.path.relpath(source, static_dir).replace(os.sep, '/')
+            with open(source, 'rb') as f:
+                content = f.read()
+            built = posixpath.join(BUILD_DIR, hashed_name(path, content))
+            target = os.path.join(static_dir, *built.split('/'))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            with open(target, 'wb') as f:
+                f.write(content)
+            if path.endswith(COMPRESSIBLE_EXTENSIONS):
+                write_compressed(target, content)
+            manifest[path] = built
+    with open(os.path.join(build_dir, MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Write the static files with hashed names and '
+                    'precompressed siblings, so they can be cached for a '
+                    'year and are not compressed on every request.',
+    )
+    parser.add_argument(
+        '--directory',
+        default=STATIC_DIR,
+        help='Directory of the static files (default: heath/static).',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    manifest = build(args.directory)
+    print('Built {} static files.'.format(len(manifest)))
+    return 0
@@ -0,0 +1,363 @@
+"""
+Generate a synthetic ledger for load and capacity testing.
+
+Accounts get a skewed share of the activity. Transactions are drawn from
+spending and income categories, each with a log-normal amount distribution
+and a set of typical descriptions, and are spread over a period of time in
+chronological order. The same seed always produces the same ledger.
+
+Batches are generated with NumPy if it is installed (the ``generate``
+extra). Without NumPy a pure Python generator draws from the same
+distributions, only slower and with different random numbers. Batches are
+written with Core bulk inserts and the ledger aggregates are updated once
+per batch, so memory use does not depend on the number of transactions.
+"""
+
+import argparse
+import itertools
+import math
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import Dict, List, NamedTuple, Sequence, Tuple
+
+from pyramid.paster import get_appsettings, setup_logging
+from sqlalchemy import BigInteger, bindparam
+
+from .. import models
+from ..models import ledger
+from ..models.account import Account
+from ..models.search import deferred_search_index
+from ..models.transaction import Transaction
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+
+class Category(NamedTuple):
+    """Kind of transaction with the distribution of its amounts."""
+
+    weight: float
+    descriptions: Tuple[str, ...]
+    median: float
+    sigma: float
+    sign: int
+
+
+CATEGORIES = (
+    Category(0.25, ("Whole Foods Market", "Trader Joe's", "Safeway", "Aldi",
+                    "Costco", "Farmers Market"), 42, 0.6, -1),
+    Category(0.18, ("Starbucks", "Chipotle", "Pizza Palace", "Sushi Bar",
+                    "Thai Kitchen", "Corner Bakery"), 18, 0.7, -1),
+    Category(0.10, ("Shell", "Chevron", "Uber", "Lyft", "City Transit"),
+             30, 0.5, -1),
+    Category(0.14, ("Amazon", "Target", "Walmart", "Best Buy", "IKEA",
+                    "Home Depot"), 55, 1.0, -1),
+    Category(0.05, ("Electric Company", "Water Utility", "Internet Provider",
+                    "Mobile Phone"), 80, 0.35, -1),
+    Category(0.08, ("Netflix", "Spotify", "Cinema", "Concert Tickets",
+                    "Bookstore"), 15, 0.8, -1),
+    Category(0.04, ("Pharmacy", "Dentist", "Doctor's Office", "Gym"),
+             60, 0.8, -1),
+    Category(0.03, ("Rent", "Mortgage Payment", "Home Insurance"),
+             1400, 0.25, -1),
+    Category(0.06, ("Payroll Deposit", "Freelance Payment", "Interest",
+                    "Tax Refund"), 1200, 0.6, 1),
+    Category(0.03, ("Refund", "Cashback", "Transfer In"), 35, 0.9, 1),
+    Category(0.04, ("ATM Withdrawal", "Transfer Out"), 100, 0.6, -1),
+)
+
+ACCOUNT_KINDS = ("Checking", "Savings", "Credit Card", "Cash", "Brokerage")
+
+DESCRIPTIONS = tuple(itertools.chain.from_iterable(
+    category.descriptions for category in CATEGORIES))
+
+
+class Batch(NamedTuple):
+    """Columns of a batch of generated transactions."""
+
+    descriptions: List[str]
+    cents: List[int]
+    account_ids: List[int]
+    created: List[datetime]
+
+
+def account_names(count: int) -> List[str]:
+    return [
+        "{} {}".format(ACCOUNT_KINDS[number % len(ACCOUNT_KINDS)], number + 1)
+        for number in range(count)
+    ]
+
+
+def account_weights(count: int, seed: int) -> List[float]:
+    """Return the share of the activity of each account. Some dominate."""
+    generator = random.Random("{}-accounts".format(seed))
+    weights = [generator.lognormvariate(0, 1) for _ in range(count)]
+    total = sum(weights)
+    return [weight / total for weight in weights]
+
+
+def python_batch(seed, number, size, start, end, account_ids, weights):
+    """Generate a batch with the `random` module."""
+    generator = random.Random("{}-{}".format(seed, number))
+    categories = generator.choices(
+        CATEGORIES,
+        weights=[category.weight for category in CATEGORIES],
+        k=size,
+    )
+    span = (end - start).total_seconds()
+    offsets = sorted(generator.random() * span for _ in range(size))
+    return Batch(
+        descriptions=[
+            generator.choice(category.descriptions)
+            for category in categories
+        ],
+        cents=[
+            category.sign * max(1, round(100 * generator.lognormvariate(
+                math.log(category.median),
+                category.sigma,
+            )))
+            for category in categories
+        ],
+        account_ids=generator.choices(account_ids, weights=weights, k=size),
+        created=[start + timedelta(seconds=offset) for offset in offsets],
+    )
+
+
+def numpy_batch(seed, number, size, start, end, account_ids, weights):
+    """Generate a batch with vectorized NumPy draws."""
+    generator = numpy.random.default_rng([seed, number])
+    categories = generator.choice(
+        len(CATEGORIES),
+        size=size,
+        p=[category.weight for category in CATEGORIES],
+    )
+    medians = numpy.array([category.median for category in CATEGORIES])
+    sigmas = numpy.array([category.sigma for category in CATEGORIES])
+    signs = numpy.array([category.sign for category in CATEGORIES])
+    counts = numpy.array([len(category.descriptions)
+                          for category in CATEGORIES])
+    firsts = numpy.cumsum(counts) - counts
+
+    cents = numpy.maximum(1, numpy.rint(100 * generator.lognormal(
+        numpy.log(medians[categories]),
+        sigmas[categories],
+    ))).astype(numpy.int64) * signs[categories]
+    descriptions = firsts[categories] + generator.integers(
+        0, counts[categories])
+    accounts = generator.choice(
+        numpy.asarray(account_ids),
+        size=size,
+        p=numpy.asarray(weights) / numpy.sum(weights),
+    )
+    span = int((end - start).total_seconds() * 1000000)
+    offsets = numpy.sort(generator.integers(0, max(span, 1), size))
+    return Batch(
+        descriptions=[DESCRIPTIONS[index] for index in descriptions.tolist()],
+        cents=cents.tolist(),
+        account_ids=accounts.tolist(),
+        created=[
+            start + timedelta(microseconds=offset)
+            for offset in offsets.tolist()
+        ],
+    )
+
+
+def batch_changes(batch: Batch) -> List[ledger.LedgerChange]:
+    """
+    Sum up the ledger changes of a batch per account, day and sign.
+
+    That is as coarse as the changes can get while still telling the
+    spending rollups which week and month, and whether income or expenses,
+    they belong to.
+    """
+    totals: Dict[Tuple, List] = defaultdict(lambda: [0, 0, None])
+    for account_id, cents, created in zip(
+            batch.account_ids, batch.cents, batch.created):
+        total = totals[account_id, created.date(), cents > 0]
+        total[0] += cents
+        total[1] += 1
+        if total[2] is None or created > total[2]:
+            total[2] = created
+    return [
+        ledger.LedgerChange(account_id, Decimal(cents).scaleb(-2), latest,
+                            count)
+        for (account_id, _, _), (cents, count, latest) in totals.items()
+    ]
+
+
+# Amounts are generated as cents already, so they skip the conversion of
+# the `Cents` column type.
+INSERT_TRANSACTION = Transaction.__table__.insert().values(
+    description=bindparam("b_description"),
+    amount=bindparam("b_cents", type_=BigInteger),
+    account_id=bindparam("b_account_id"),
+    created=bindparam("b_created"),
+)
+
+
+def insert_batch(connection, batch: Batch) -> int:
+    """Insert a batch of transactions and update the ledger aggregates."""
+    connection.execute(INSERT_TRANSACTION, [
+        {
+            "b_description": description,
+            "b_cents": cents,
+            "b_account_id": account_id,
+            "b_created": created,
+        }
+        for description, cents, account_id, created in zip(*batch)
+    ])
+    ledger.apply_changes(connection, batch_changes(batch))
+    return len(batch.cents)
+
+
+def create_accounts(connection, names: Sequence[str]) -> List[int]:
+    """Insert the accounts and return their ids."""
+    now = datetime.now()
+    return [
+        connection.execute(
+            Account.__table__.insert().values(name=name, created=now),
+        ).inserted_primary_key[0]
+        for name in names
+    ]
+
+
+def generate(engine, accounts, transactions, seed=0, start=None, days=3650,
+             batch_size=10000, commit_every=10, use_numpy=None,
+             report=print) -> int:
+    """
+    Generate accounts and transactions and insert them in batches.
+
+    Each batch covers the next slice of the period, so transactions are
+    inserted in chronological order.
+
+    Returns:
+        int: The number of transactions inserted.
+
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    make_batch = numpy_batch if use_numpy else python_batch
+    start = start or datetime(2015, 1, 1)
+    batches = math.ceil(transactions / batch_size)
+    step = timedelta(days=days) / max(batches, 1)
+
+    inserted = 0
+    started = time.perf_counter()
+    with engine.connect() as connection, deferred_search_index(connection):
+        account_ids = create_accounts(connection, account_names(accounts))
+        weights = account_weights(accounts, seed)
+        for number in range(batches):
+            size = min(batch_size, transactions - inserted)
+            inserted += insert_batch(connection, make_batch(
+                seed,
+                number,
+                size,
+                start + step * number,
+                start + step * (number + 1),
+                account_ids,
+                weights,
+            ))
+            if (number + 1) % commit_every == 0:
+                connection.commit()
+                report(progress(inserted, started))
+        connection.commit()
+    report(progress(inserted, started))
+    return inserted
+
+
+def progress(inserted, started) -> str:
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed else 0.0
+    return 'Generated {} transactions in {:.1f}s ({:.0f} rows/sec)'.format(
+        inserted,
+        elapsed,
+        rate,
+    )
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Generate a synthetic ledger for load testing.',
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., development.ini',
+    )
+    parser.add_argument(
+        '--accounts',
+        type=int,
+        default=20,
+        help='Number of accounts to create (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--transactions',
+        type=int,
+        default=100000,
+        help='Number of transactions to create (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--seed',
+        type=int,
+        default=0,
+        help='Seed of the random numbers (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--start',
+        type=datetime.fromisoformat,
+        default=datetime(2015, 1, 1),
+        help='Date of the first transaction (default: 2015-01-01).',
+    )
+    parser.add_argument(
+        '--days',
+        type=int,
+        default=3650,
+        help='Number of days to spread the transactions over '
+             '(default: %(default)s).',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=10000,
+        help='Number of rows per insert statement (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--commit-every',
+        type=int,
+        default=10,
+        help='Number of batches per commit (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--no-numpy',
+        action='store_true',
+        help='Use the pure Python generator even if NumPy is installed.',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    settings = get_appsettings(args.config_uri)
+    engine = models.get_engine(settings)
+    if numpy is None and not args.no_numpy:
+        print('NumPy is not installed, using the slower pure Python '
+              'generator. Install it with: pip install -e ".[generate]"',
+              file=sys.stderr)
+    generate(
+        engine,
+        accounts=args.accounts,
+        transactions=args.transactions,
+        seed=args.seed,
+        start=args.start,
+        days=args.days,
+        batch_size=args.batch_size,
+        commit_every=args.commit_every,
+        use_numpy=False if args.no_numpy else None,
+    )
+    return 0
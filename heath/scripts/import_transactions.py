@@ -0,0 +1,378 @@
+"""
+Bulk import transactions from CSV, OFX or QIF files.
+
+The files are streamed through a chain of generators (parse, validate,
+batch), so memory use does not depend on the size of the file. Rows are
+written with Core bulk inserts and the ledger aggregates are updated once
+per batch.
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional
+
+from pyramid.paster import get_appsettings, setup_logging
+from sqlalchemy import select
+
+from .. import models
+from ..models import ledger
+from ..models.account import Account
+from ..models.search import deferred_search_index
+from ..models.transaction import Transaction, parse_amount
+
+
+FORMATS = ('csv', 'ofx', 'qif')
+
+CSV_DATE_FORMATS = ('%Y-%m-%d', '%Y-%m-%d %H:%M:%S', '%m/%d/%Y', '%d.%m.%Y')
+QIF_DATE_FORMATS = ('%m/%d/%Y', "%m/%d'%y", '%m/%d/%y', '%d.%m.%Y')
+
+
+class Record(NamedTuple):
+    """Raw transaction data as read from a file."""
+
+    line: int
+    description: str
+    amount: str
+    date: str
+    account: Optional[str]
+
+
+class Row(NamedTuple):
+    """Validated transaction data ready to be inserted."""
+
+    description: str
+    amount: Decimal
+    created: datetime
+    account: Optional[str]
+
+
+class InvalidRecord(ValueError):
+    """Raised for records that can not be imported."""
+
+
+def parse_date(value: str, formats: Iterable[str]) -> datetime:
+    """Parse a date with the first matching format."""
+    value = value.strip()
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    for date_format in formats:
+        try:
+            return datetime.strptime(value, date_format)
+        except ValueError:
+            continue
+    raise InvalidRecord('Unknown date format: {!r}'.format(value))
+
+
+# Readers
+
+def read_csv(stream) -> Iterator[Record]:
+    """
+    Read records from a CSV file with a header row.
+
+    The columns `description`, `amount` and `date` are required, `account` is
+    optional.
+    """
+    reader = csv.DictReader(stream)
+    for row in reader:
+        yield Record(
+            line=reader.line_num,
+            description=row.get('description') or '',
+            amount=row.get('amount'),
+            date=row.get('date') or '',
+            account=row.get('account') or None,
+        )
+
+
+OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def ofx_tokens(stream, chunk_size=64 * 1024):
+    """Yield `(closing, tag, value)` tokens of an SGML or XML OFX file."""
+    buffer = ''
+    for chunk in iter(lambda: stream.read(chunk_size), ''):
+        buffer += chunk
+        # Only tokenize up to the last tag start. The rest may be incomplete.
+        end = buffer.rfind('<')
+        if end == -1:
+            continue
+        for match in OFX_TAG.finditer(buffer, 0, end):
+            closing, tag, value = match.groups()
+            yield bool(closing), tag.upper(), value.strip()
+        buffer = buffer[end:]
+    for match in OFX_TAG.finditer(buffer):
+        closing, tag, value = match.groups()
+        yield bool(closing), tag.upper(), value.strip()
+
+
+def read_ofx(stream) -> Iterator[Record]:
+    """Read the statement transactions (`STMTTRN`) of an OFX file."""
+    current: Optional[Dict[str, str]] = None
+    number = 0
+    for closing, tag, value in ofx_tokens(stream):
+        if tag == 'STMTTRN':
+            if not closing:
+                current = {}
+            elif current is not None:
+                number += 1
+                yield Record(
+                    line=number,
+                    description=current.get('NAME') or current.get('MEMO', ''),
+                    amount=current.get('TRNAMT'),
+                    # OFX dates look like 20200131120000[-5:EST]
+                    date=current.get('DTPOSTED', '')[:14],
+                    account=None,
+                )
+                current = None
+        elif current is not None and not closing:
+            current[tag] = value
+
+
+def read_qif(stream) -> Iterator[Record]:
+    """Read the records of a QIF file. Records are terminated by `^`."""
+    current: Dict[str, str] = {}
+    for number, line in enumerate(stream, start=1):
+        line = line.rstrip('\r\n')
+        if not line or line.startswith('!'):
+            continue
+        code, value = line[0], line[1:]
+        if code == '^':
+            if current:
+                yield Record(
+                    line=number,
+                    description=current.get('P') or current.get('M', ''),
+                    amount=(current.get('T') or current.get('U', '')).replace(
+                        ',', ''),
+                    date=current.get('D', ''),
+                    account=None,
+                )
+            current = {}
+        else:
+            current[code] = value
+
+
+READERS = {
+    'csv': read_csv,
+    'ofx': read_ofx,
+    'qif': read_qif,
+}
+
+
+# Pipeline
+
+def validate(record: Record, date_formats: Iterable[str]) -> Row:
+    """
+    Validate a record the same way the transaction form is validated.
+
+    Raises:
+        InvalidRecord: If the record can not be imported.
+
+    """
+    try:
+        amount = parse_amount(record.amount)
+    except (ValueError, TypeError):
+        raise InvalidRecord('Amount has to be a number.')
+    return Row(
+        description=record.description,
+        amount=amount,
+        created=parse_date(record.date, date_formats),
+        account=record.account,
+    )
+
+
+def validated_rows(records, date_formats, errors) -> Iterator[Row]:
+    """Yield the valid rows. Append messages for invalid ones to errors."""
+    for record in records:
+        try:
+            yield validate(record, date_formats)
+        except InvalidRecord as error:
+            errors.append('Record {}: {}'.format(record.line, error))
+
+
+def batched(iterable, size) -> Iterator[List]:
+    """Yield lists of up to `size` items."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class AccountResolver(object):
+    """Map account names to ids, creating missing accounts."""
+
+    def __init__(self, connection, default: Optional[str] = None):
+        self.connection = connection
+        self.default = default
+        self.ids: Dict[str, int] = dict(
+            (name, account_id)
+            for account_id, name in connection.execute(
+                select(Account.id, Account.name),
+            )
+        )
+
+    def __call__(self, name: Optional[str]) -> Optional[int]:
+        name = name or self.default
+        if name is None:
+            return None
+        if name not in self.ids:
+            result = self.connection.execute(
+                Account.__table__.insert().values(
+                    name=name,
+                    created=datetime.now(),
+                ),
+            )
+            self.ids[name] = result.inserted_primary_key[0]
+        return self.ids[name]
+
+
+def insert_batch(connection, batch: List[Row], resolve_account) -> int:
+    """Insert a batch of rows and update the ledger aggregates."""
+    values = [
+        {
+            'description': row.description,
+            'amount': row.amount,
+            'created': row.created,
+            'account_id': resolve_account(row.account),
+        }
+        for row in batch
+    ]
+    connection.execute(Transaction.__table__.insert(), values)
+    ledger.apply_changes(connection, (
+        ledger.added(value['account_id'], value['amount'], value['created'])
+        for value in values
+    ))
+    return len(values)
+
+
+def import_rows(engine, rows, batch_size, commit_every, account=None,
+                report=print):
+    """
+    Insert the rows in batches and commit every `commit_every` batches.
+
+    Returns:
+        int: The number of rows inserted.
+
+    """
+    inserted = 0
+    started = time.perf_counter()
+    with engine.connect() as connection, deferred_search_index(connection):
+        resolve_account = AccountResolver(connection, default=account)
+        for number, batch in enumerate(batched(rows, batch_size), start=1):
+            inserted += insert_batch(connection, batch, resolve_account)
+            if number % commit_every == 0:
+                connection.commit()
+                report(progress(inserted, started))
+        connection.commit()
+    report(progress(inserted, started))
+    return inserted
+
+
+def progress(inserted, started) -> str:
+    elapsed = time.perf_counter() - started
+    rate = inserted / elapsed if elapsed else 0.0
+    return 'Imported {} rows in {:.1f}s ({:.0f} rows/sec)'.format(
+        inserted,
+        elapsed,
+        rate,
+    )
+
+
+def detect_format(path: str) -> str:
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension not in FORMATS:
+        raise SystemExit(
+            'Can not detect the format of {}. Use --format.'.format(path))
+    return extension
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Import transactions from CSV, OFX or QIF files.',
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., development.ini',
+    )
+    parser.add_argument(
+        'files',
+        nargs='+',
+        help='Files to import. Use - to read from standard input.',
+    )
+    parser.add_argument(
+        '--format',
+        choices=FORMATS,
+        help='Format of the files. Detected from the extension by default.',
+    )
+    parser.add_argument(
+        '--account',
+        help='Account name for transactions that do not name an account. '
+             'The account is created if it does not exist.',
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=10000,
+        help='Number of rows per insert statement (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--commit-every',
+        type=int,
+        default=10,
+        help='Number of batches per commit (default: %(default)s).',
+    )
+    parser.add_argument(
+        '--date-format',
+        action='append',
+        help='Additional strptime format for dates. Can be repeated.',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def open_input(path):
+    if path == '-':
+        return io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig')
+    return open(path, encoding='utf-8-sig', newline='')
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    settings = get_appsettings(args.config_uri)
+    engine = models.get_engine(settings)
+
+    errors: List[str] = []
+    for path in args.files:
+        file_format = args.format or detect_format(path)
+        date_formats = tuple(args.date_format or ()) + (
+            QIF_DATE_FORMATS if file_format == 'qif' else CSV_DATE_FORMATS)
+        with open_input(path) as stream:
+            rows = validated_rows(
+                READERS[file_format](stream),
+                date_formats,
+                errors,
+            )
+            import_rows(
+                engine,
+                rows,
+                batch_size=args.batch_size,
+                commit_every=args.commit_every,
+                account=args.account,
+            )
+    for error in errors:
+        print(error, file=sys.stderr)
+    if errors:
+        print('Skipped {} invalid records.'.format(len(errors)),
+              file=sys.stderr)
+        return 1
+    return 0
@@ -4,16 +4,24 @@ import sys
 from pyramid.paster import bootstrap, setup_logging
 from sqlalchemy.exc import OperationalError
 
-from .. import models
+from ..models.account import Account
+
+
+DEFAULT_ACCOUNTS = ('Checking', 'Savings', 'Cash')
 
 
 def setup_models(dbsession):
     """
     Add or update models / fixtures in the database.
 
+    The default accounts are only added to a database without accounts.
+    Use `generate_heath_data` to fill a database with synthetic data.
+
     """
-    model = models.mymodel.MyModel(name='one', value=1)
-    dbsession.add(model)
+    if dbsession.query(Account.id).first() is not None:
+        return
+    for name in DEFAULT_ACCOUNTS:
+        dbsession.add(Account(name=name))
 
 
 def parse_args(argv):
@@ -0,0 +1,57 @@
+import argparse
+import os
+import sys
+
+from pyramid.paster import bootstrap, setup_logging
+from zope.sqlalchemy import mark_changed
+
+from ..models import ledger
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description='Rebuild or check the incrementally maintained ledger '
+                    'aggregates.',
+    )
+    parser.add_argument(
+        'config_uri',
+        help='Configuration file, e.g., development.ini',
+    )
+    parser.add_argument(
+        '--check',
+        action='store_true',
+        help='Only compare the aggregates with the transactions, '
+             'do not change anything.',
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count() or 1,
+        help='Number of threads computing the spending rollups in '
+             'parallel (default: number of CPUs).',
+    )
+    return parser.parse_args(argv[1:])
+
+
+def main(argv=sys.argv):
+    args = parse_args(argv)
+    setup_logging(args.config_uri)
+    env = bootstrap(args.config_uri)
+
+    with env['request'].tm:
+        dbsession = env['request'].dbsession
+        connection = dbsession.connection()
+        if args.check:
+            problems = ledger.check(connection)
+            for problem in problems:
+                print(problem)
+            if problems:
+                return 1
+            print('Ledger aggregates are consistent.')
+        else:
+            ledger.rebuild(connection, workers=args.workers)
+            # Core statements are invisible to the session, so the data
+            # manager has to be told that there is something to commit.
+            mark_changed(dbsession)
+            print('Ledger aggregates rebuilt.')
+    return 0
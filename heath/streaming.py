@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+
+"""
+Render Jinja2 templates as a stream.
+
+The ``pyramid_jinja2`` renderer builds the whole page before the response
+is sent. `render_stream` returns a response whose ``app_iter`` renders the
+template with Jinja2's ``generate()`` while the response is sent, so pages
+that loop over an iterator of rows go out as the rows are read and do not
+have to fit into memory.
+
+The template is rendered after the view returned and ``pyramid_tm`` closed
+the request's session. Rows have to be read on a connection of their own,
+see `heath.export.stream_partitions`.
+"""
+
+from typing import Dict, Iterator
+
+from jinja2 import Template
+from pyramid.request import Request
+from pyramid.response import Response
+from pyramid_jinja2 import IJinja2Environment
+
+
+# Rendered text is sent in chunks of at least this many characters.
+STREAM_CHUNK_SIZE = 16384
+
+
+def encoded_chunks(
+    template: Template,
+    value: Dict,
+    chunk_size: int = STREAM_CHUNK_SIZE,
+) -> Iterator[bytes]:
+    """Render the template in UTF-8 encoded chunks of about `chunk_size`."""
+    buffer = []
+    size = 0
+    for text in template.generate(value):
+        buffer.append(text)
+        size += len(text)
+        if size >= chunk_size:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def render_stream(
+    renderer_name: str,
+    value: Dict,
+    request: Request,
+) -> Response:
+    """
+    Return a response streaming the rendered template `renderer_name`.
+
+    The template gets the `value` and the ``request``, like templates of the
+    ``pyramid_jinja2`` renderer.
+    """
+    environment = request.registry.queryUtility(
+        IJinja2Environment,
+        name=".jinja2",
+    )
+    template = environment.get_template(renderer_name)
+    system = {
+        "request": request,
+        "context": getattr(request, "context", None),
+        "renderer_name": renderer_name,
+    }
+    return Response(
+        app_iter=encoded_chunks(template, dict(system, **value)),
+        content_type="text/html",
+        charset="utf-8",
+    )
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+
+"""
+Measure where the time of a request goes.
+
+With ``heath.timing = true`` every request records
+
+- ``total``: the whole request, including the commit of the transaction,
+- ``view``: the view callables,
+- ``template``: rendering the values returned by the views,
+- ``sql``: the number and duration of the SQL statements.
+
+The numbers are sent in a ``Server-Timing`` header, which browser developer
+tools show next to the request, and logged as one structured record per
+request to the ``heath.timing`` logger.
+
+When the setting is off nothing is registered, so there is no overhead.
+"""
+
+import json
+import logging
+from contextvars import ContextVar
+from time import perf_counter
+from typing import Dict, Optional
+
+from pyramid.request import Request
+from pyramid.settings import asbool
+from pyramid.tweens import INGRESS
+from sqlalchemy import event
+
+
+log = logging.getLogger(__name__)
+
+SQL_START = "heath.timing.sql_start"
+
+
+class RequestTimings(object):
+    """Timings of a single request in seconds."""
+
+    __slots__ = (
+        "started",
+        "total",
+        "view",
+        "template",
+        "sql_count",
+        "sql_duration",
+    )
+
+    def __init__(self):
+        self.started = perf_counter()
+        self.total = 0.0
+        self.view = 0.0
+        self.template = 0.0
+        self.sql_count = 0
+        self.sql_duration = 0.0
+
+    def server_timing(self) -> str:
+        """Return the value of a ``Server-Timing`` header."""
+        return (
+            "total;dur={:.2f}, view;dur={:.2f}, template;dur={:.2f}, "
+            'sql;dur={:.2f};desc="{} statements"'
+        ).format(
+            self.total * 1000,
+            self.view * 1000,
+            self.template * 1000,
+            self.sql_duration * 1000,
+            self.sql_count,
+        )
+
+    def as_dict(self) -> Dict:
+        return {
+            "total_ms": round(self.total * 1000, 3),
+            "view_ms": round(self.view * 1000, 3),
+            "template_ms": round(self.template * 1000, 3),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_duration * 1000, 3),
+        }
+
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "heath_request_timings",
+    default=None,
+)
+
+
+def get_timings() -> Optional[RequestTimings]:
+    """Return the timings of the current request, if they are recorded."""
+    return _current.get()
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context,
+                          executemany):
+    if _current.get() is not None:
+        conn.info[SQL_START] = perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context,
+                         executemany):
+    timings = _current.get()
+    started = conn.info.pop(SQL_START, None)
+    if timings is not None and started is not None:
+        timings.sql_count += 1
+        timings.sql_duration += perf_counter() - started
+
+
+def timed_view(view, info):
+    """Add the time spent in the view callable to the request timings."""
+    def wrapper(context, request):
+        timings = _current.get()
+        if timings is None:
+            return view(context, request)
+        started = perf_counter()
+        try:
+            return view(context, request)
+        finally:
+            timings.view += perf_counter() - started
+    return wrapper
+
+
+def timed_rendering(view, info):
+    """
+    Add the time spent rendering to the request timings.
+
+    The deriver wraps the renderer and the view callable, so the time of
+    the view is subtracted.
+    """
+    def wrapper(context, request):
+        timings = _current.get()
+        if timings is None:
+            return view(context, request)
+        view_before = timings.view
+        started = perf_counter()
+        try:
+            return view(context, request)
+        finally:
+            elapsed = perf_counter() - started
+            timings.template += elapsed - (timings.view - view_before)
+    return wrapper
+
+
+def timing_tween_factory(handler, registry):
+    """Record the timings of each request, report and log them."""
+
+    def timing_tween(request: Request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        response = None
+        try:
+            response = handler(request)
+        finally:
+            _current.reset(token)
+            timings.total = perf_counter() - timings.started
+            if response is not None:
+                response.headers["Server-Timing"] = timings.server_timing()
+            if log.isEnabledFor(logging.INFO):
+                record = dict(
+                    timings.as_dict(),
+                    method=request.method,
+                    path=request.path,
+                    route=(
+                        request.matched_route.name
+                        if request.matched_route else None
+                    ),
+                    status=response.status_code if response else None,
+                )
+                log.info(
+                    json.dumps(record, sort_keys=True),
+                    extra={"timing": record},
+                )
+        return response
+
+    return timing_tween
+
+
+def includeme(config):
+    """
+    Record request timings if ``heath.timing`` is enabled.
+
+    Activate this setup using ``config.include('heath.timing')`` after
+    including ``heath.models``.
+
+    """
+    if not asbool(config.get_settings().get("heath.timing", False)):
+        return
+
+    engine = config.registry["engine"]
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+
+    config.add_view_deriver(timed_rendering)
+    config.add_view_deriver(
+        timed_view,
+        under="rendered_view",
+        over="mapped_view",
+    )
+    config.add_tween("heath.timing.timing_tween_factory", under=INGRESS)
@@ -2,15 +2,19 @@
 
 """Define views regarding accounts."""
 
+from datetime import date, datetime, time, timedelta
 from typing import Dict, List, Optional, Union
 
 from pyramid.httpexceptions import HTTPFound, HTTPNotFound, HTTPBadRequest
 from pyramid.request import Request
 from pyramid.view import view_config
+from sqlalchemy import select
 from sqlalchemy.sql import func
 from sqlalchemy.orm import Session
 
 from heath.models.account import Account
+from heath.models.checkpoint import balance_before
+from heath.models.types import to_id
 
 
 class AccountViews(object):
@@ -64,6 +68,8 @@ class AccountViews(object):
         route_name="accounts.create",
         renderer="heath:templates/accounts/create.jinja2",
         request_method="GET",
+        query_budget=0,
+        read_only=True,
     )
     def create_get(self) -> Dict:
         return self.to_dict()
@@ -72,6 +78,7 @@ class AccountViews(object):
         route_name="accounts.create",
         renderer="heath:templates/accounts/create.jinja2",
         request_method="POST",
+        query_budget=1,
     )
     def create_post(self) -> Union[Dict, HTTPFound]:
         if self.validate_post_data():
@@ -79,4 +86,50 @@ class AccountViews(object):
             return HTTPFound(self.request.route_url("home"))
         return self.to_dict()
 
+    @view_config(
+        route_name="accounts.balance",
+        renderer="json",
+        request_method="GET",
+        query_budget=1,
+        read_only=True,
+    )
+    def balance(self) -> Dict:
+        """
+        Return the balance of the account at the end of a day.
 
+        The day is given as ISO date in the `as_of` query parameter and
+        defaults to today. The balance is read from the nearest balance
+        checkpoint and the transactions since (see `balance_before`), so the
+        cost does not depend on the number of earlier transactions.
+
+        Raises:
+            HTTPNotFound: If the account does not exist.
+            HTTPBadRequest: If the date is invalid or the last date, whose
+                end can not be represented.
+        """
+        try:
+            account_id = to_id(self.request.matchdict["account_id"])
+        except ValueError:
+            raise HTTPNotFound()
+        try:
+            as_of = date.fromisoformat(
+                self.request.GET.get("as_of") or date.today().isoformat())
+            end = datetime.combine(as_of + timedelta(days=1), time())
+        except (ValueError, OverflowError):
+            raise HTTPBadRequest()
+        balance = self.dbsession.execute(
+            select(
+                balance_before(account_id, end),
+            ).select_from(
+                Account,
+            ).where(
+                Account.id == account_id,
+            )
+        ).one_or_none()
+        if balance is None:
+            raise HTTPNotFound()
+        return {
+            "account_id": account_id,
+            "as_of": as_of.isoformat(),
+            "balance": "{:.2f}".format(balance[0]),
+        }
@@ -3,11 +3,26 @@
 """Define home view."""
 
 from pyramid.view import view_config
+from sqlalchemy import select
 
 from heath.models.account import Account
 
 
-@view_config(route_name='home', renderer='../templates/home.jinja2')
+@view_config(
+    route_name='home',
+    renderer='heath:templates/home.jinja2',
+    query_budget=1,
+    read_only=True,
+    etag=True,
+)
 def home(request):
-    accounts = request.dbsession.query(Account).all()
+    # Balances are stored on the accounts, so this is the only query. Only
+    # the shown columns are selected, as rows rather than entities.
+    accounts = request.dbsession.execute(select(
+        Account.id,
+        Account.name,
+        Account.balance,
+        Account.transaction_count,
+        Account.version,
+    )).all()
     return {"accounts": accounts}
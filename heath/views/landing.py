@@ -5,6 +5,11 @@
 from pyramid.view import view_config
 
 
-@view_config(route_name='landing', renderer='../templates/landing.jinja2')
+@view_config(
+    route_name='landing',
+    renderer='heath:templates/landing.jinja2',
+    query_budget=0,
+    read_only=True,
+)
 def landing(request):
     return {}
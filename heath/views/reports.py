@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""Define the spending report views."""
+
+from datetime import date
+from decimal import Decimal
+from itertools import groupby
+from typing import List, NamedTuple
+
+from pyramid.httpexceptions import HTTPBadRequest
+from pyramid.view import view_config
+from sqlalchemy import select
+from sqlalchemy.engine import Row
+
+from heath.models.account import Account
+from heath.models.rollup import MONTH, PERIODS, SpendingRollup
+from heath.models.types import to_id
+
+
+class ReportBucket(NamedTuple):
+    """Totals of a week or month and the rollups of its accounts."""
+
+    bucket: date
+    income: Decimal
+    expenses: Decimal
+    transaction_count: int
+    accounts: List[Row]
+
+    @property
+    def net(self) -> Decimal:
+        return self.income + self.expenses
+
+
+@view_config(
+    route_name='reports',
+    renderer='heath:templates/reports.jinja2',
+    query_budget=1,
+    read_only=True,
+    etag=True,
+)
+def reports(request):
+    """
+    Show income and expenses per week or month, newest first.
+
+    Only the spending rollups are read, so the cost of the report does not
+    depend on the number of transactions. The `period` query parameter is
+    `week` or `month` (default) and `account` limits the report to one
+    account.
+    """
+    period = request.GET.get("period") or MONTH
+    if period not in PERIODS:
+        raise HTTPBadRequest()
+    criteria = [SpendingRollup.period == period]
+    account = request.GET.get("account")
+    if account:
+        try:
+            criteria.append(SpendingRollup.account_id == to_id(account))
+        except ValueError:
+            raise HTTPBadRequest()
+
+    rows = request.dbsession.execute(
+        select(
+            SpendingRollup.bucket,
+            SpendingRollup.account_id,
+            Account.name,
+            SpendingRollup.income,
+            SpendingRollup.expenses,
+            SpendingRollup.transaction_count,
+        ).outerjoin(
+            Account,
+            SpendingRollup.account_id == Account.id,
+        ).where(
+            *criteria
+        ).order_by(
+            SpendingRollup.bucket.desc(),
+            SpendingRollup.account_id.desc(),
+        )
+    ).all()
+
+    buckets = []
+    for bucket, accounts in groupby(rows, key=lambda row: row.bucket):
+        accounts = sorted(accounts, key=lambda row: row.name or "")
+        buckets.append(ReportBucket(
+            bucket=bucket,
+            income=sum((row.income for row in accounts), Decimal(0)),
+            expenses=sum((row.expenses for row in accounts), Decimal(0)),
+            transaction_count=sum(row.transaction_count for row in accounts),
+            accounts=accounts,
+        ))
+    return {
+        "period": period,
+        "periods": PERIODS,
+        "filter_params": {"account": account} if account else {},
+        "buckets": buckets,
+    }
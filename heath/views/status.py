@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+
+"""Define status view."""
+
+from pyramid.view import view_config
+
+from heath.models.sqlite import PRAGMAS, get_lock_stats
+
+
+@view_config(
+    route_name='status',
+    renderer='json',
+    query_budget=len(PRAGMAS),
+    read_only=True,
+)
+def status(request):
+    """Show the effective SQLite pragmas and lock contention counters."""
+    connection = request.dbsession.connection()
+    pragmas = {}
+    if connection.dialect.name == "sqlite":
+        for name in PRAGMAS:
+            pragmas[name] = connection.exec_driver_sql(
+                "PRAGMA {}".format(name),
+            ).scalar()
+    return {
+        "sqlite": {
+            "pragmas": pragmas,
+            "lock_contention": get_lock_stats(request.registry).as_dict(),
+        },
+    }
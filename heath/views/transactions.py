@@ -2,15 +2,73 @@
 
 """Define views regarding transactions."""
 
-from typing import Dict, List, Optional, Union
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from pyramid.httpexceptions import HTTPFound, HTTPNotFound, HTTPBadRequest
 from pyramid.request import Request
+from pyramid.response import Response
+from pyramid.settings import asbool
 from pyramid.view import view_config
+from sqlalchemy import Column, delete, select, tuple_
+from sqlalchemy.engine import Row
 from sqlalchemy.sql import func
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Bundle, Session
+from zope.sqlalchemy import mark_changed
 
-from heath.models.transaction import Transaction
+from heath.export import csv_chunks, ndjson_chunks, stream_partitions
+from heath.fragments import fragments_changed
+from heath.models.account import Account
+from heath.models.checkpoint import balance_before
+from heath.models.search import search_rows, search_terms
+from heath.models.ledger import (
+    SUMMARY_ID,
+    LedgerSummary,
+    apply_changes,
+    removed,
+)
+from heath.models.sqlite import unindexed
+from heath.models.transaction import Transaction, parse_amount
+from heath.models.types import MAX_INTEGER, to_id
+from heath.pagination import decode_cursor, encode_cursor
+from heath.streaming import render_stream
+
+
+DEFAULT_PAGE_SIZE = 50
+
+# Rows read at a time for the unpaginated list. See `stream_transactions`.
+STREAM_BATCH_SIZE = 200
+
+# Columns shown in lists and exports. Selecting only these returns plain rows
+# instead of entities, which skips the identity map and change tracking.
+LIST_COLUMNS = (
+    Transaction.id,
+    Transaction.created,
+    Transaction.description,
+    Transaction.amount,
+)
+
+# Columns of the rows rendered in lists. The version keys the cached
+# renderings of the rows, see `heath.fragments`.
+ROW_COLUMNS = LIST_COLUMNS + (Transaction.version,)
+
+# Query parameters filtering lists and exports. See `get_filters`.
+FILTER_PARAMS = ("account", "start", "end", "min_amount", "max_amount")
+
+# Columns the list can be sorted by, with the type of their values.
+SORT_TYPES = {
+    "created": datetime,
+    "amount": Decimal,
+}
+DEFAULT_SORT = "-created"
+
+EXPORT_COLUMNS = ("id", "created", "description", "amount", "account")
+EXPORT_FORMATS = {
+    "csv": ("text/csv", csv_chunks),
+    "ndjson": ("application/x-ndjson", ndjson_chunks),
+}
 
 
 class TransactionView(object):
@@ -24,12 +82,25 @@ class TransactionView(object):
             "transaction_id",
             "",
         )
-        self.transactions: Optional[List[Transaction]] = None
-        self.budget: float
+        self.transactions: Optional[Iterable[Row]] = None
+        self.page_size: int = int(self.request.registry.settings.get(
+            "heath.page_size",
+            DEFAULT_PAGE_SIZE,
+        ))
+        self.next_cursor: Optional[str] = None
+        self.previous_cursor: Optional[str] = None
+        self.filter_params: Dict[str, str] = {}
+        self.running_balances: Optional[Dict[int, Decimal]] = None
+        self.search: str = ""
+        self.page: int = 1
+        self.has_next_page: bool = False
+        self.budget: Decimal
         self.transaction: Optional[Transaction] = None
         self.description: str
-        self.amount: Optional[float] = None
+        self.amount: Optional[Decimal] = None
         self.errors: List[str] = []
+        # Whether rendered rows add their fragments to the cache.
+        self.cache_new_fragments: bool = True
 
     def get_transactions(self):
         """
@@ -40,58 +111,460 @@ class TransactionView(object):
         object.
 
         If no transaction id is retrieved from the request, set the
-        `transactions` (notice the plural) attribute to a list containing all
-        transactions.
+        `transactions` (notice the plural) attribute to a list containing one
+        page of transaction rows. See `get_transaction_page`.
+
+        The single transaction is looked up with `Session.get`, which uses
+        the identity map and a cached statement.
 
         Raises:
             HTTPNotFound: If a transaction id was requested but could not be
                 found in the database HTTPNotFound is raised.
         """
         if self.transaction_id:
-            self.transaction: Transaction = self.dbsession.query(
+            self.transaction: Transaction = self.dbsession.get(
                 Transaction,
-            ).filter_by(
-                id=self.transaction_id,
-            ).first()
+                self.get_transaction_id(),
+            )
             if not self.transaction:
                 raise HTTPNotFound()
         else:
-            self.transactions: List[Transaction] = self.dbsession.query(
-                Transaction,
-            ).order_by(
-                Transaction.created.desc(),
+            self.get_transaction_page()
+
+    def get_transaction_id(self) -> int:
+        """
+        Return the requested transaction id as an integer.
+
+        Raises:
+            HTTPNotFound: If the id is not an integer or out of range.
+        """
+        try:
+            return to_id(self.transaction_id)
+        except ValueError:
+            raise HTTPNotFound()
+
+    def get_transaction_page(self):
+        """
+        Get one page of filtered transactions in the requested order.
+
+        Only the `ROW_COLUMNS` are selected. The page is a list of read-only
+        rows, not `Transaction` objects. The budget over all filtered
+        transactions is selected with the page, in the same statement. See
+        `get_filters`, `get_sort` and `get_budget_expression`.
+
+        Pages are addressed with opaque cursor tokens in the `after` and
+        `before` query parameters rather than with offsets. Each page is
+        fetched with a range condition on `(sort column, id)`, so the cost of
+        a page does not depend on how deep into the list it is.
+
+        Transactions without a creation time come before all others in
+        ascending and after all others in descending order. They are not
+        matched by the range condition, so a page reaching them from the
+        dated transactions, or the dated ones from them, is completed by a
+        second statement on the other group. See `get_page_rows`.
+
+        Sets the `next_cursor` and `previous_cursor` attributes to the tokens
+        of the neighbouring pages, or `None` if there is no such page, and
+        the `running_balances`. See `get_running_balances`.
+
+        Raises:
+            HTTPBadRequest: If a parameter or cursor token is invalid.
+        """
+        column, descending = self.get_sort()
+        criteria = self.get_filters(column)
+        budget = self.get_budget_expression(self.get_filters())
+        after = self.request.GET.get("after")
+        before = self.request.GET.get("before")
+        token = before or after
+        try:
+            cursor = decode_cursor(token) if token else None
+        except ValueError:
+            raise HTTPBadRequest()
+        if cursor and not isinstance(
+            cursor[0],
+            (SORT_TYPES[column.key], type(None)),
+        ):
+            # The cursor belongs to a differently sorted list.
+            raise HTTPBadRequest()
+        if cursor and cursor[0] is None and not column.nullable:
+            raise HTTPBadRequest()
+
+        # Pages before the cursor are read in reverse and flipped back.
+        forward = not before
+        ascending = forward != descending
+        # Fetch one extra row to find out if there is another page.
+        result = self.get_page_rows(
+            column,
+            criteria,
+            budget,
+            cursor,
+            ascending,
+            self.page_size + 1,
+        )
+        if result:
+            self.budget = result[0].budget
+        else:
+            self.budget = self.dbsession.execute(select(budget)).scalar()
+        rows = [row.transaction for row in result]
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if before:
+            rows.reverse()
+            has_previous, has_next = has_more, True
+        else:
+            has_previous, has_next = bool(after), has_more
+
+        self.transactions: List[Row] = rows
+        self.running_balances = self.get_running_balances(column, rows)
+        key = column.key
+        if rows and has_previous:
+            self.previous_cursor = encode_cursor(
+                getattr(rows[0], key),
+                rows[0].id,
+            )
+        if rows and has_next:
+            self.next_cursor = encode_cursor(
+                getattr(rows[-1], key),
+                rows[-1].id,
+            )
+
+    def get_page_rows(
+        self,
+        column: Column,
+        criteria: List,
+        budget,
+        cursor: Optional[Tuple],
+        ascending: bool,
+        limit: int,
+    ) -> List[Row]:
+        """
+        Read up to `limit` rows following the `cursor` in the given order.
+
+        The rows have the columns of the page in a `transaction` bundle and
+        the `budget`. SQLite sorts `NULL` before all other values. A cursor
+        on a row with a `NULL` sort value continues with the other rows
+        without one, and then, in ascending order, with all rows with one.
+        A cursor on a row with a value continues with the rows with a
+        greater or smaller value, and then, in descending order, with all
+        rows without one. Each group is read as one index range.
+        """
+        order = (
+            (column.asc(), Transaction.id.asc()) if ascending
+            else (column.desc(), Transaction.id.desc())
+        )
+        query = select(
+            Bundle("transaction", *ROW_COLUMNS),
+            budget.label("budget"),
+        ).where(
+            *criteria
+        ).order_by(
+            *order
+        )
+        if not cursor:
+            return self.dbsession.execute(query.limit(limit)).all()
+
+        value, row_id = cursor
+        if value is None:
+            group = (
+                column.is_(None),
+                Transaction.id > row_id if ascending
+                else Transaction.id < row_id,
+            )
+            following = column.is_not(None) if ascending else None
+        else:
+            # A row value comparison, which SQLite reads as one index range.
+            key = tuple_(column, Transaction.id)
+            value = tuple_(*cursor, types=(column.type, Transaction.id.type))
+            group = (key > value if ascending else key < value,)
+            following = (
+                column.is_(None) if column.nullable and not ascending
+                else None
+            )
+        rows = self.dbsession.execute(query.where(*group).limit(limit)).all()
+        if following is not None and len(rows) < limit:
+            rows += self.dbsession.execute(
+                query.where(following).limit(limit - len(rows)),
             ).all()
+        return rows
+
+    def stream_transactions(self) -> Response:
+        """
+        Stream all filtered transactions in the requested order.
 
-    def get_budget(self):
-        retrieved_budget = self.dbsession.query(
-            func.sum(Transaction.amount),
+        The list is rendered while it is sent, from rows read in batches of
+        `STREAM_BATCH_SIZE` on a connection of their own. The start of the
+        page goes out before all rows are read, and memory use does not
+        depend on the number of transactions. See `render_stream`.
+
+        The budget is read before the response is returned. The running
+        balances are left out. Rows are rendered from cached fragments, but
+        new fragments are not cached, so the fragments of rows shown often
+        are not evicted.
+
+        Raises:
+            HTTPBadRequest: If a parameter is invalid.
+        """
+        column, descending = self.get_sort()
+        order = (
+            (column.desc(), Transaction.id.desc()) if descending
+            else (column.asc(), Transaction.id.asc())
+        )
+        statement = select(
+            *ROW_COLUMNS,
+        ).where(
+            *self.get_filters(column)
+        ).order_by(
+            *order
+        )
+        self.budget = self.dbsession.execute(
+            select(self.get_budget_expression(self.get_filters())),
         ).scalar()
-        self.budget = retrieved_budget or 0.0
+        self.transactions = chain.from_iterable(stream_partitions(
+            self.request.registry["engine"],
+            statement,
+            STREAM_BATCH_SIZE,
+        ))
+        self.cache_new_fragments = False
+        return render_stream(
+            "heath:templates/transactions/list.jinja2",
+            self.to_dict(),
+            self.request,
+        )
+
+    def search_transactions(self):
+        """
+        Get one page of the transactions matching the `q` query parameter.
+
+        The descriptions have to contain all words of the search. See
+        `search_rows`. Hits are ordered by relevance, which needs all of
+        them to be scored, so pages are addressed by their number in the
+        `page` query parameter instead of cursors.
+
+        Raises:
+            HTTPBadRequest: If the page number is not a positive integer or
+                so large that its offset does not fit into an integer of
+                the database.
+        """
+        self.search = self.request.GET.get("q", "")
+        try:
+            self.page = int(self.request.GET.get("page", 1))
+        except ValueError:
+            raise HTTPBadRequest()
+        if not 1 <= self.page <= MAX_INTEGER // self.page_size:
+            raise HTTPBadRequest()
+        terms = search_terms(self.search)
+        if not terms:
+            self.transactions = []
+            return
+        rows = search_rows(
+            self.dbsession.connection(),
+            terms,
+            ROW_COLUMNS,
+            offset=(self.page - 1) * self.page_size,
+            # One more row tells if there is a next page.
+            limit=self.page_size + 1,
+        )
+        self.has_next_page = len(rows) > self.page_size
+        self.transactions = rows[:self.page_size]
+
+    def get_running_balances(
+        self,
+        sort_column: Column,
+        rows: List[Row],
+    ) -> Optional[Dict[int, Decimal]]:
+        """
+        Return the balance after each transaction of the page, by id.
+
+        The balance is of the filtered account, or of all transactions. The
+        balance through the oldest transaction of the page is read from the
+        nearest balance checkpoint (see `balance_before`) and the amounts of
+        the newer transactions on the page are added to it. So the cost does
+        not depend on how many transactions precede the page.
+
+        Returns `None` unless the list is sorted by creation time and not
+        filtered by amount, where the rows of a page are not consecutive.
+        """
+        params = self.request.GET
+        if (sort_column.key != "created"
+                or params.get("min_amount") or params.get("max_amount")):
+            return None
+        dated = sorted(
+            (row for row in rows if row.created is not None),
+            key=lambda row: (row.created, row.id),
+        )
+        if not dated:
+            return {}
+        oldest = dated[0]
+        account = params.get("account")
+        balance = self.dbsession.execute(select(balance_before(
+            to_id(account) if account else None,
+            oldest.created,
+            oldest.id,
+        ))).scalar()
+        balances = {oldest.id: balance}
+        for row in dated[1:]:
+            balance += row.amount
+            balances[row.id] = balance
+        return balances
+
+    def get_filters(self, sort_column: Optional[Column] = None) -> List:
+        """
+        Get filter criteria for transactions from the query parameters.
+
+        Supported parameters are `account` (an account id), `start` and
+        `end` (ISO dates, both inclusive) and `min_amount` and `max_amount`
+        (both inclusive). The parameters that were used are collected in
+        `filter_params`, so links can keep them.
+
+        Given a `sort_column`, range conditions on other columns are kept
+        away from the indexes. SQLite then reads the index of the sort order
+        and stops once a page is full, instead of collecting every match of
+        the range and sorting them.
+
+        Raises:
+            HTTPBadRequest: If a parameter has an invalid value.
+        """
+        criteria = []
+        params = self.request.GET
+        created, amount = (
+            column if sort_column is None or column is sort_column
+            else unindexed(column)
+            for column in (Transaction.created, Transaction.amount)
+        )
+        try:
+            if params.get("account"):
+                criteria.append(
+                    Transaction.account_id == to_id(params["account"]))
+            if params.get("start"):
+                start = date.fromisoformat(params["start"])
+                criteria.append(
+                    created >= datetime.combine(start, time()))
+            if params.get("end"):
+                end = date.fromisoformat(params["end"])
+                # Nothing is later than the last date, which has no next day.
+                if end < date.max:
+                    criteria.append(created < datetime.combine(
+                        end + timedelta(days=1), time()))
+            if params.get("min_amount"):
+                criteria.append(
+                    amount >= parse_amount(params["min_amount"]))
+            if params.get("max_amount"):
+                criteria.append(
+                    amount <= parse_amount(params["max_amount"]))
+        except ValueError:
+            raise HTTPBadRequest()
+        self.filter_params = dict(
+            (name, params[name])
+            for name in FILTER_PARAMS + ("sort",)
+            if params.get(name)
+        )
+        return criteria
+
+    def get_sort(self) -> Tuple[Column, bool]:
+        """
+        Get the sort column and direction from the `sort` query parameter.
+
+        The parameter is the name of a column in `SORT_TYPES`, prefixed with
+        `-` for descending order. Only these columns are allowed, because
+        every one of them is backed by an index on its own and after
+        `account_id`.
+
+        Raises:
+            HTTPBadRequest: If the sort order is not allowed.
+        """
+        sort = self.request.GET.get("sort") or DEFAULT_SORT
+        descending = sort.startswith("-")
+        name = sort.lstrip("-")
+        if name not in SORT_TYPES:
+            raise HTTPBadRequest()
+        return getattr(Transaction, name), descending
+
+    def get_budget_expression(self, criteria: List):
+        """
+        Return a scalar subquery of the budget over the filtered set.
+
+        Without filters it reads the maintained ledger total and with only an
+        account filter the maintained account balance. Other filters sum up
+        the transactions matching the `criteria` of `get_filters`.
+        """
+        params = self.request.GET
+        if not criteria:
+            return select(LedgerSummary.total).where(
+                LedgerSummary.id == SUMMARY_ID,
+            ).scalar_subquery()
+        if len(criteria) == 1 and params.get("account"):
+            return func.coalesce(
+                select(Account.balance).where(
+                    Account.id == to_id(params["account"]),
+                ).scalar_subquery(),
+                0,
+            )
+        return select(
+            func.coalesce(func.sum(Transaction.amount), 0),
+        ).where(
+            *criteria
+        ).scalar_subquery()
 
     def validate_post_data(self) -> bool:
         """Validate data. Return True or False. Set error message."""
         self.description = self.request.POST.get("description", "")
         try:
-            self.amount = float(self.request.POST.get("amount", ""))
+            self.amount = parse_amount(self.request.POST.get("amount", ""))
         except (ValueError, TypeError):
             self.errors.append("Amount has to be a number.")
             return False
         return True
 
     def save_transaction(self):
-        """Save transaction with the current data."""
+        """
+        Save transaction with the current data.
+
+        The cached renderings of the transaction and its account are removed
+        once the change is committed.
+        """
         if self.transaction is None:
             self.transaction = Transaction()
+        else:
+            fragments_changed(self.request, "transaction", self.transaction.id)
+        if self.transaction.account_id is not None:
+            fragments_changed(
+                self.request, "account", self.transaction.account_id)
         self.transaction.description = self.description
         self.transaction.amount = self.amount
         self.dbsession.add(self.transaction)
 
     def confirmed_deletion(self) -> bool:
-        """Delete if confirmed. Return info if deletion happened."""
-        if "delete.confirm" in self.request.POST:
-            self.dbsession.delete(self.transaction)
-            return True
-        return False
+        """
+        Delete if confirmed. Return info if deletion happened.
+
+        The transaction is not loaded. A single `DELETE` statement removes it
+        and returns the values needed to update the ledger aggregates, which
+        the flush hook can not see for statements like this.
+
+        Raises:
+            HTTPNotFound: If the confirmed transaction does not exist.
+        """
+        if "delete.confirm" not in self.request.POST:
+            return False
+        deleted = self.dbsession.execute(
+            delete(Transaction).where(
+                Transaction.id == self.get_transaction_id(),
+            ).returning(
+                Transaction.account_id,
+                Transaction.amount,
+                Transaction.created,
+            ),
+        ).one_or_none()
+        if deleted is None:
+            raise HTTPNotFound()
+        apply_changes(self.dbsession.connection(), [removed(*deleted)])
+        mark_changed(self.dbsession)
+        fragments_changed(
+            self.request, "transaction", self.get_transaction_id())
+        if deleted.account_id is not None:
+            fragments_changed(self.request, "account", deleted.account_id)
+        return True
 
     def to_dict(self) -> Dict:
         return self.__dict__
@@ -102,6 +575,8 @@ class TransactionView(object):
         route_name="transaction.create",
         renderer="heath:templates/transactions/create.jinja2",
         request_method="GET",
+        query_budget=0,
+        read_only=True,
     )
     def create_get(self) -> Dict:
         return self.to_dict()
@@ -110,6 +585,7 @@ class TransactionView(object):
         route_name="transaction.create",
         renderer="heath:templates/transactions/create.jinja2",
         request_method="POST",
+        query_budget=2,
     )
     def create_post(self) -> Union[Dict, HTTPFound]:
         if self.validate_post_data():
@@ -121,16 +597,80 @@ class TransactionView(object):
         route_name="transaction.list",
         renderer="heath:templates/transactions/list.jinja2",
         request_method="GET",
+        # The page, the transactions without a creation time following it
+        # and the running balances.
+        query_budget=3,
+        read_only=True,
+        etag=True,
     )
-    def list(self) -> Dict:
+    def list(self) -> Union[Dict, Response]:
+        """List one page of transactions, or all of them with `all=true`."""
+        if asbool(self.request.GET.get("all")):
+            return self.stream_transactions()
         self.get_transactions()
-        self.get_budget()
         return self.to_dict()
 
+    @view_config(
+        route_name="transaction.search",
+        renderer="heath:templates/transactions/search.jinja2",
+        request_method="GET",
+        # Looking up the search index, once per database connection, and
+        # the search, continued past the ranked hits on the page where they
+        # end.
+        query_budget=3,
+        read_only=True,
+    )
+    def search_list(self) -> Dict:
+        self.search_transactions()
+        return self.to_dict()
+
+    @view_config(
+        route_name="transaction.export",
+        request_method="GET",
+        query_budget=1,
+        read_only=True,
+    )
+    def export(self) -> Response:
+        """
+        Stream the filtered transactions as CSV or NDJSON.
+
+        The rows are fetched in batches while the response is sent, so memory
+        use does not depend on the number of exported transactions.
+        """
+        export_format = self.request.matchdict["format"]
+        content_type, encode = EXPORT_FORMATS[export_format]
+        statement = select(
+            *LIST_COLUMNS,
+            Account.name,
+        ).outerjoin(
+            Account,
+            Transaction.account_id == Account.id,
+        ).where(
+            *self.get_filters(Transaction.created)
+        ).order_by(
+            Transaction.created.asc(),
+            Transaction.id.asc(),
+        )
+        partitions = stream_partitions(
+            self.request.registry["engine"],
+            statement,
+        )
+        response = Response(
+            app_iter=encode(partitions, EXPORT_COLUMNS),
+            content_type=content_type,
+            charset="utf-8",
+        )
+        response.content_disposition = (
+            'attachment; filename="transactions.{}"'.format(export_format))
+        return response
+
     @view_config(
         route_name="transaction.detail",
         renderer="heath:templates/transactions/detail.jinja2",
         request_method="GET",
+        query_budget=1,
+        read_only=True,
+        etag=True,
     )
     def detail(self) -> Dict:
         self.get_transactions()
@@ -140,6 +680,8 @@ class TransactionView(object):
         route_name="transaction.update",
         renderer="heath:templates/transactions/edit.jinja2",
         request_method="GET",
+        query_budget=1,
+        read_only=True,
     )
     def update_get(self) -> Dict:
         self.get_transactions()
@@ -149,6 +691,7 @@ class TransactionView(object):
         route_name="transaction.update",
         renderer="heath:templates/transactions/edit.jinja2",
         request_method="POST",
+        query_budget=3,
     )
     def update_post(self) -> Union[Dict, HTTPFound]:
         self.get_transactions()
@@ -161,6 +704,8 @@ class TransactionView(object):
         route_name="transaction.delete",
         renderer="heath:templates/transactions/delete.jinja2",
         request_method="GET",
+        query_budget=1,
+        read_only=True,
     )
     def delete_get(self) -> Dict:
         self.get_transactions()
@@ -170,9 +715,12 @@ class TransactionView(object):
         route_name="transaction.delete",
         renderer="heath:templates/transactions/delete.jinja2",
         request_method="POST",
+        # The delete, the summary, the account, the week and month rollups,
+        # which are deleted if they become empty, and the checkpoints of the
+        # account and the ledger.
+        query_budget=9,
     )
     def delete_post(self) -> HTTPFound:
-        self.get_transactions()
         if self.confirmed_deletion():
             return HTTPFound(self.request.route_url("transaction.list"))
         else:
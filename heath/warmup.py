@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+"""
+Prepare new processes for their first requests.
+
+The first request of a page compiles its templates, configures the
+mappers and compiles the SQL of its queries. All of it is cached for the
+life of the process, so the first requests after a deploy or a restart of
+a worker are several times slower than the later ones.
+
+- Compiled templates are kept in the bytecode cache of Jinja2, enabled with
+  the ``jinja2.bytecode_caching`` setting of ``pyramid_jinja2``. New
+  processes load them instead of compiling the templates again, as long as
+  the source did not change. The cache is kept in
+  ``jinja2.bytecode_caching_directory``, which is created if needed, or in
+  a directory of the user in the temporary directory.
+- With ``heath.warmup = true`` the application is warmed up by the
+  ``egg:heath#waitress`` server of the production configuration, before it
+  serves requests: every template is loaded, the mappers are configured and
+  the pages of ``heath.warmup.paths`` are requested once, which compiles
+  their queries and fills the fragment cache. A failed request of a page is
+  logged and does not stop the start. Scripts that load the application,
+  like ``initialize_heath_db``, do not serve and are not warmed up. Other
+  servers can call `warm_up` with the application before serving it.
+"""
+
+import logging
+import os
+from time import perf_counter
+from typing import Iterator
+
+from pyramid.path import AssetResolver
+from pyramid.request import Request
+from pyramid.settings import asbool, aslist
+from pyramid_jinja2 import IJinja2Environment
+from sqlalchemy.orm import configure_mappers
+
+
+log = logging.getLogger(__name__)
+
+TEMPLATES = "heath:templates/"
+DEFAULT_PATHS = ("/home", "/transactions/", "/reports/")
+
+
+def template_names() -> Iterator[str]:
+    """Return the asset specifications of all templates."""
+    root = AssetResolver().resolve(TEMPLATES).abspath()
+    for directory, _, filenames in os.walk(root):
+        for filename in sorted(filenames):
+            if filename.endswith(".jinja2"):
+                path = os.path.relpath(os.path.join(directory, filename), root)
+                yield TEMPLATES + path.replace(os.sep, "/")
+
+
+def compile_templates(registry) -> int:
+    """Load all templates into the environment, return their number."""
+    environment = registry.queryUtility(IJinja2Environment, name=".jinja2")
+    count = 0
+    for name in template_names():
+        environment.get_template(name)
+        count += 1
+    return count
+
+
+def request_pages(app, paths) -> int:
+    """Request the pages, return the number of successful requests."""
+    count = 0
+    for path in paths:
+        try:
+            response = Request.blank(path).get_response(app)
+        except Exception:
+            log.warning("Warm-up request of %s failed", path, exc_info=True)
+            continue
+        if response.status_code == 200:
+            count += 1
+        else:
+            log.warning("Warm-up request of %s answered with %s",
+                        path, response.status)
+    return count
+
+
+def warm_up(app):
+    """Compile the templates and request the pages of the settings."""
+    settings = app.registry.settings
+    started = perf_counter()
+    configure_mappers()
+    templates = compile_templates(app.registry)
+    pages = request_pages(
+        app,
+        aslist(settings.get("heath.warmup.paths", DEFAULT_PATHS)),
+    )
+    log.info(
+        "Warmed up in %.0f ms: %d templates, %d pages",
+        (perf_counter() - started) * 1000,
+        templates,
+        pages,
+    )
+
+
+def serve(app, global_conf, **kw):
+    """
+    Serve the application with waitress, after warming it up if enabled.
+
+    Use it as the server of a configuration file::
+
+        [server:main]
+        use = egg:heath#waitress
+        listen = *:6543
+
+    The options are the ones of ``egg:waitress#main``.
+    """
+    from waitress import serve_paste
+    registry = getattr(app, "registry", None)
+    if registry is not None and asbool(
+            registry.settings.get("heath.warmup", False)):
+        warm_up(app)
+    return serve_paste(app, global_conf, **kw)
+
+
+def includeme(config):
+    """
+    Set up the bytecode cache of templates.
+
+    Activate this setup using ``config.include('heath.warmup')``.
+
+    """
+    settings = config.get_settings()
+    directory = settings.get("jinja2.bytecode_caching_directory")
+    if asbool(settings.get("jinja2.bytecode_caching", False)) and directory:
+        os.makedirs(directory, exist_ok=True)
@@ -8,16 +8,18 @@ with open(os.path.join(here, 'README.txt')) as f:
 with open(os.path.join(here, 'CHANGES.txt')) as f:
     CHANGES = f.read()
 
+# DELETE ... RETURNING and the upserts of the ledger need SQLite 3.35 or
+# newer in the sqlite3 module of Python, which pip can not check.
 requires = [
     'plaster_pastedeploy',
-    'pyramid',
+    'pyramid >= 2.0',
     'pyramid_jinja2',
     'pyramid_debugtoolbar',
     'waitress',
     'alembic',
     'pyramid_retry',
     'pyramid_tm',
-    'SQLAlchemy',
+    'SQLAlchemy >= 2.0',
     'transaction',
     'zope.sqlalchemy',
 ]
@@ -49,14 +51,24 @@ setup(
     zip_safe=False,
     extras_require={
         'testing': tests_require,
+        'generate': ['numpy'],
+        'brotli': ['brotli'],
     },
     install_requires=requires,
     entry_points={
         'paste.app_factory': [
             'main = heath:main',
         ],
+        'paste.server_runner': [
+            'waitress = heath.warmup:serve',
+        ],
         'console_scripts': [
             'initialize_heath_db=heath.scripts.initialize_db:main',
+            'rebuild_heath_ledger=heath.scripts.rebuild_ledger:main',
+            'import_heath_transactions='
+            'heath.scripts.import_transactions:main',
+            'generate_heath_data=heath.scripts.generate_data:main',
+            'build_heath_static=heath.scripts.build_static:main',
         ],
     },
 )
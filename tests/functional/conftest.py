@@ -13,6 +13,7 @@ HTML_PARSER = "html.parser"
 def app():
     config = testing.setUp(settings={
         'sqlalchemy.url': 'sqlite:///:memory:',
+        'heath.query_guard': 'raise',
     })
     settings = config.get_settings()
 
@@ -41,3 +42,17 @@ def testapp(app, initialized_database):
     testapp_instance = TestApp(app)
 
     return testapp_instance
+
+
+@pytest.fixture
+def query_log(testapp):
+    """
+    Record the statements issued during a test.
+
+    Views are already checked against their declared `query_budget` and for
+    repeated lazy loads, because the query guard raises in the tests. Use
+    this fixture to put a limit on a sequence of requests.
+    """
+    from heath.queryguard import recording
+    with recording() as query_log:
+        yield query_log
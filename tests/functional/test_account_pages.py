@@ -2,7 +2,10 @@
 
 """Functional tests for the landing page."""
 
+from datetime import datetime
+
 from bs4 import BeautifulSoup
+import pytest
 import re
 
 from tests.functional.conftest import HTML_PARSER
@@ -72,3 +75,86 @@ class TestAccountAddPage(object):
     # TODO: Cancel link goes to previous page (referrer) if visited from
     #       somewhere and not directly.
 
+
+class TestAccountBalance(object):
+    @pytest.fixture
+    def account_with_history(self, testapp):
+        """Create an account with transactions in January and March."""
+        import transaction
+        from heath.models import get_tm_session
+        from heath.models.account import Account
+        from heath.models.transaction import Transaction
+
+        registry = testapp.app.registry
+        with transaction.manager:
+            dbsession = get_tm_session(
+                registry["dbsession_factory"],
+                transaction.manager,
+            )
+            account = Account(name="Checking")
+            dbsession.add(account)
+            for amount, created in (
+                ("100.00", datetime(2020, 1, 6)),
+                ("-40.00", datetime(2020, 1, 31, 12)),
+                ("-5.50", datetime(2020, 3, 2)),
+            ):
+                dbsession.add(Transaction(
+                    description="Transaction",
+                    amount=amount,
+                    created=created,
+                    account=account,
+                ))
+            dbsession.flush()
+            return account.id
+
+    @pytest.mark.parametrize("as_of, balance", [
+        ("2020-01-05", "0.00"),
+        ("2020-01-06", "100.00"),
+        ("2020-01-31", "60.00"),
+        ("2020-02-15", "60.00"),
+        ("2020-03-02", "54.50"),
+    ])
+    def test_balance_as_of_end_of_day(
+        self,
+        testapp,
+        account_with_history,
+        as_of,
+        balance,
+    ):
+        response = testapp.get(
+            "/accounts/{}/balance".format(account_with_history),
+            {"as_of": as_of},
+            status=200,
+        )
+
+        assert response.json == {
+            "account_id": account_with_history,
+            "as_of": as_of,
+            "balance": balance,
+        }
+
+    def test_current_balance_by_default(self, testapp, account_with_history):
+        response = testapp.get(
+            "/accounts/{}/balance".format(account_with_history),
+            status=200,
+        )
+
+        assert response.json["balance"] == "54.50"
+
+    def test_unknown_account_is_not_found(self, testapp):
+        testapp.get("/accounts/1/balance", status=404)
+        testapp.get("/accounts/one/balance", status=404)
+        testapp.get("/accounts/99999999999999999999999/balance", status=404)
+
+    @pytest.mark.parametrize("as_of", ["yesterday", "9999-12-31"])
+    def test_invalid_date_is_bad_request(
+        self,
+        testapp,
+        account_with_history,
+        as_of,
+    ):
+        testapp.get(
+            "/accounts/{}/balance".format(account_with_history),
+            {"as_of": as_of},
+            status=400,
+        )
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the compression of responses."""
+
+import gzip
+
+import bs4
+from webob import Request
+
+from tests.functional.conftest import HTML_PARSER
+from tests.functional.test_transaction_pages import example_transactions  # noqa: F401,E501
+
+
+def get(testapp, path, **headers):
+    """Return the response as sent, WebTest would decode the body."""
+    return Request.blank(path, headers=headers).get_response(testapp.app)
+
+
+class TestCompression(object):
+    def test_page_is_compressed(self, testapp, example_transactions):
+        response = get(testapp, "/transactions/", **{
+            "Accept-Encoding": "br;q=0.5, gzip",
+        })
+
+        assert response.status_code == 200
+        assert response.content_encoding == "gzip"
+        assert response.vary == ("Accept-Encoding",)
+        assert response.content_length == len(response.body)
+        text = gzip.decompress(response.body).decode("utf-8")
+        soup = bs4.BeautifulSoup(text, HTML_PARSER)
+        assert len(soup.find("table", id="transactions").tbody("tr")) == 2
+
+    def test_not_compressed_without_accept_encoding(self, testapp):
+        response = get(testapp, "/transactions/")
+
+        assert response.content_encoding is None
+        assert response.vary == ("Accept-Encoding",)
+        assert b"<html" in response.body
+
+    def test_not_compressed_if_not_accepted(self, testapp):
+        response = get(testapp, "/transactions/", **{
+            "Accept-Encoding": "gzip;q=0, identity",
+        })
+
+        assert response.content_encoding is None
+
+    def test_small_response_is_not_compressed(self, testapp):
+        response = get(testapp, "/status", **{"Accept-Encoding": "gzip"})
+
+        assert response.content_length < 1024
+        assert response.content_encoding is None
+        assert response.vary is None
+
+    def test_streamed_page_is_compressed(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = get(testapp, "/transactions/?all=true", **{
+            "Accept-Encoding": "gzip",
+        })
+
+        assert response.content_encoding == "gzip"
+        assert response.content_length is None
+        chunks = list(response.app_iter)
+        response.app_iter.close()
+        text = gzip.decompress(b"".join(chunks)).decode("utf-8")
+        assert "Second transaction" in text
+
+    def test_compressed_page_is_not_modified(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = get(testapp, "/transactions/", **{
+            "Accept-Encoding": "gzip",
+        })
+        assert response.headers["ETag"].startswith('W/"')
+
+        not_modified = get(testapp, "/transactions/", **{
+            "Accept-Encoding": "gzip",
+            "If-None-Match": response.headers["ETag"],
+        })
+
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == response.headers["ETag"]
+
+    def test_uncompressed_page_keeps_strong_etag(self, testapp):
+        response = get(testapp, "/transactions/")
+
+        not_modified = get(testapp, "/transactions/", **{
+            "Accept-Encoding": "gzip",
+            "If-None-Match": response.headers["ETag"],
+        })
+
+        assert not response.headers["ETag"].startswith("W/")
+        assert not_modified.status_code == 304
+        assert not_modified.headers["ETag"] == response.headers["ETag"]
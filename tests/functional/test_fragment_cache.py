@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the cached renderings of rows."""
+
+import bs4
+import pytest
+
+from tests.functional.conftest import HTML_PARSER
+
+
+@pytest.fixture
+def account_transaction(testapp):
+    """Create an account with one transaction."""
+    import transaction
+    from heath.models import get_tm_session
+    from heath.models.account import Account
+    from heath.models.transaction import Transaction
+
+    with transaction.manager:
+        dbsession = get_tm_session(
+            testapp.app.registry["dbsession_factory"],
+            transaction.manager,
+        )
+        dbsession.add(Transaction(
+            description="Rent",
+            amount=-500,
+            account=Account(name="Checking"),
+        ))
+
+
+def fragment_cache(testapp):
+    return testapp.app.registry["fragment_cache"]
+
+
+class TestFragmentCache(object):
+    def test_rows_are_cached(self, testapp, account_transaction):
+        testapp.get("/home", status=200)
+        testapp.get("/transactions/", status=200)
+
+        assert len(fragment_cache(testapp)) == 2
+
+    def test_update_renders_changed_rows(self, testapp, account_transaction):
+        testapp.get("/home", status=200)
+        testapp.get("/transactions/", status=200)
+
+        testapp.post(
+            "/transactions/1/update",
+            {"description": "Groceries", "amount": "-20.00"},
+            status=302,
+        )
+
+        assert len(fragment_cache(testapp)) == 0
+        response = testapp.get("/transactions/", status=200)
+        soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+        cells = soup.find("table", id="transactions").tbody.tr("td")
+        assert [cell.text for cell in cells[:2]] == ["Groceries", "-20.00"]
+        response = testapp.get("/home", status=200)
+        soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+        assert soup.find("span", class_="balance").text == "-20.00"
+
+    def test_delete_removes_rows(self, testapp, account_transaction):
+        testapp.get("/home", status=200)
+        testapp.get("/transactions/", status=200)
+
+        testapp.post(
+            "/transactions/1/delete",
+            {"delete.confirm": "delete.confirm"},
+            status=302,
+        )
+
+        assert len(fragment_cache(testapp)) == 0
+        response = testapp.get("/home", status=200)
+        soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+        assert soup.find("span", class_="balance").text == "0.00"
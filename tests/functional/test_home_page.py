@@ -54,3 +54,36 @@ class TestHomePage(object):
         account_name_element = soup.find(text=EXAMPLE_ACCOUNT_NAME)
         assert account_name_element is not None
 
+    def test_account_balance_is_shown_on_home(
+        self,
+        testapp,
+        example_account,
+    ):
+        from heath.models.account import Account
+        from heath.models.transaction import Transaction
+        from heath.models import get_tm_session
+        import transaction
+
+        registry = testapp.app.registry
+        with transaction.manager:
+            dbsession = get_tm_session(
+                registry["dbsession_factory"],
+                transaction.manager,
+            )
+            account = dbsession.query(Account).one()
+            dbsession.add(Transaction(
+                description="Salary",
+                amount=1234.5,
+                account=account,
+            ))
+
+        response = testapp.get("/home", status=200)
+
+        soup = BeautifulSoup(response.text, HTML_PARSER)
+        balance_element = soup.find(class_="balance")
+        assert balance_element.text == "1234.50"
+
+    def test_no_server_timing_by_default(self, testapp):
+        response = testapp.get("/home", status=200)
+
+        assert "Server-Timing" not in response.headers
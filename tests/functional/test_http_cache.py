@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the ETags of pages derived from the data version."""
+
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+from tests.functional.test_transaction_pages import example_transactions  # noqa: F401,E501
+
+
+PATHS = ("/home", "/transactions/", "/transactions/1", "/reports/")
+
+
+class TestConditionalRequests(object):
+    @pytest.mark.parametrize("path", PATHS)
+    def test_unchanged_page_is_not_modified(
+        self,
+        testapp,
+        example_transactions,
+        path,
+    ):
+        response = testapp.get(path, status=200)
+        assert response.etag
+        assert response.headers["Cache-Control"] == "no-cache"
+
+        not_modified = testapp.get(
+            path,
+            headers={"If-None-Match": response.headers["ETag"]},
+            status=304,
+        )
+
+        assert not_modified.etag == response.etag
+        assert not_modified.body == b""
+
+    def test_not_modified_with_version_lookup_only(
+        self,
+        testapp,
+        example_transactions,
+        query_log,
+    ):
+        etag = testapp.get("/transactions/", status=200).headers["ETag"]
+        count = query_log.count
+
+        testapp.get("/transactions/", headers={"If-None-Match": etag},
+                    status=304)
+        testapp.head("/transactions/", headers={"If-None-Match": etag},
+                     status=304)
+
+        assert query_log.count == count + 2
+
+    @pytest.mark.parametrize("write", [
+        ("/transactions/create", {"description": "New", "amount": "1.00"}),
+        ("/transactions/1/update", {"description": "New", "amount": "1.00"}),
+        ("/transactions/1/delete", {"delete.confirm": "delete.confirm"}),
+        ("/accounts/create", {"name": "Savings"}),
+    ])
+    def test_writes_change_etag(self, testapp, example_transactions, write):
+        etag = testapp.get("/home", status=200).headers["ETag"]
+
+        testapp.post(*write, status=302)
+
+        response = testapp.get("/home", headers={"If-None-Match": etag},
+                               status=200)
+        assert response.headers["ETag"] != etag
+
+    def test_writes_of_other_processes_change_etag(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        from heath.scripts.import_transactions import Row, import_rows
+        etag = testapp.get("/home", status=200).headers["ETag"]
+
+        import_rows(
+            testapp.app.registry["engine"],
+            [Row("Imported", Decimal("1.00"), datetime(2020, 1, 1), None)],
+            batch_size=10,
+            commit_every=1,
+            report=lambda message: None,
+        )
+
+        response = testapp.get("/home", headers={"If-None-Match": etag},
+                               status=200)
+        assert response.headers["ETag"] != etag
+
+    def test_invalid_write_keeps_etag(self, testapp, example_transactions):
+        etag = testapp.get("/home", status=200).headers["ETag"]
+
+        testapp.post("/accounts/create", {"name": ""}, status=200)
+
+        testapp.get("/home", headers={"If-None-Match": etag}, status=304)
+
+    def test_errors_have_no_etag(self, testapp):
+        response = testapp.get("/transactions/1", status=404)
+
+        assert "ETag" not in response.headers
+
+    def test_unversioned_page_has_no_etag(self, testapp):
+        response = testapp.get("/transactions/create", status=200)
+
+        assert "ETag" not in response.headers
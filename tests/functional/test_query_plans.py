@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+"""
+Query plan regression tests.
+
+Every statement issued while serving a request is captured and explained
+with SQLite's ``EXPLAIN QUERY PLAN``. A test fails if a statement reads a
+table without using an index or sorts with a temporary B-tree, because the
+cost of those grows with the size of the table.
+"""
+
+import re
+
+import pytest
+from sqlalchemy import event
+
+from tests.functional.test_transaction_pages import example_transactions  # noqa: F401,E501
+
+
+FULL_SCAN = re.compile(r"^SCAN (\w+)$")
+TEMP_SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+@pytest.fixture
+def captured_statements(app, initialized_database):
+    """Capture statements and parameters executed by the app's engine."""
+    engine = app.registry["engine"]
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(
+                ("SELECT", "UPDATE", "DELETE", "WITH")):
+            statements.append((
+                statement,
+                parameters[0] if executemany else parameters,
+            ))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    yield statements
+    event.remove(engine, "before_cursor_execute", capture)
+
+
+def query_plans(engine, statements):
+    """Return the plan details of each statement."""
+    plans = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            rows = connection.exec_driver_sql(
+                "EXPLAIN QUERY PLAN " + statement,
+                parameters,
+            ).fetchall()
+            plans.append((statement, [row[-1] for row in rows]))
+    return plans
+
+
+def assert_indexed(app, statements, allowed_tables=(), allow_sort=False):
+    """Fail if any statement scans a table or sorts without an index."""
+    assert statements, "No statements were captured."
+    problems = []
+    for statement, details in query_plans(app.registry["engine"], statements):
+        for detail in details:
+            match = FULL_SCAN.match(detail)
+            if match and match.group(1) not in allowed_tables:
+                problems.append((detail, statement))
+            if detail.startswith(TEMP_SORT) and not allow_sort:
+                problems.append((detail, statement))
+    assert problems == []
+
+
+@pytest.fixture
+def account_with_transactions(testapp):
+    """Create an account with transactions, more than fit on a page."""
+    import transaction
+    from heath.models import get_tm_session
+    from heath.models.account import Account
+    from heath.models.transaction import Transaction
+
+    registry = testapp.app.registry
+    registry.settings["heath.page_size"] = 2
+    with transaction.manager:
+        dbsession = get_tm_session(
+            registry["dbsession_factory"],
+            transaction.manager,
+        )
+        account = Account(name="Checking")
+        dbsession.add(account)
+        for number in range(5):
+            dbsession.add(Transaction(
+                description="Transaction {}".format(number),
+                amount=number,
+                account=account,
+            ))
+
+
+class TestTransactionQueryPlans(object):
+    """Query plans of the transaction views."""
+
+    def test_list_first_page(
+        self,
+        testapp,
+        account_with_transactions,
+        captured_statements,
+    ):
+        testapp.get("/transactions/", status=200)
+
+        assert_indexed(testapp.app, captured_statements)
+
+    @pytest.mark.parametrize("params", [
+        {"sort": "created"},
+        {"sort": "-amount"},
+        {"sort": "amount"},
+        {"account": "1"},
+        {"account": "1", "sort": "-amount"},
+        {"start": "2000-01-01", "end": "2100-01-01"},
+        {"account": "1", "start": "2000-01-01", "end": "2100-01-01"},
+        {"min_amount": "1", "max_amount": "3"},
+        {"min_amount": "1", "sort": "-amount"},
+        {"account": "1", "min_amount": "1", "sort": "amount"},
+        {"start": "2000-01-01", "sort": "-amount"},
+        {"max_amount": "3", "sort": "-created"},
+    ])
+    def test_list_filtered_and_sorted(
+        self,
+        testapp,
+        account_with_transactions,
+        captured_statements,
+        params,
+    ):
+        response = testapp.get("/transactions/", params, status=200)
+        response.click(linkid=None, href="after=")
+
+        assert_indexed(testapp.app, captured_statements)
+
+    def test_list_following_and_preceding_pages(
+        self,
+        testapp,
+        account_with_transactions,
+        captured_statements,
+    ):
+        response = testapp.get("/transactions/", status=200)
+        response = response.click(linkid=None, href="after=")
+        response.click(linkid=None, href="before=")
+
+        assert_indexed(testapp.app, captured_statements)
+
+    def test_detail_update_and_delete(
+        self,
+        testapp,
+        account_with_transactions,
+        captured_statements,
+    ):
+        testapp.get("/transactions/1", status=200)
+        testapp.get("/transactions/1/update", status=200)
+        testapp.post(
+            "/transactions/1/update",
+            {"description": "Changed", "amount": "1.23"},
+            status=302,
+        )
+        testapp.get("/transactions/1/delete", status=200)
+        testapp.post(
+            "/transactions/1/delete",
+            {"delete.confirm": "delete.confirm"},
+            status=302,
+        )
+
+        assert_indexed(testapp.app, captured_statements)
+
+    def test_create(self, testapp, captured_statements):
+        testapp.post(
+            "/transactions/create",
+            {"description": "New", "amount": "1.00"},
+            status=302,
+        )
+
+        assert_indexed(testapp.app, captured_statements)
+
+    @pytest.mark.parametrize("params", [
+        {},
+        {"account": "1"},
+        {"start": "2000-01-01", "end": "2100-01-01"},
+        {"account": "1", "start": "2000-01-01"},
+    ])
+    def test_export(
+        self,
+        testapp,
+        account_with_transactions,
+        captured_statements,
+        params,
+    ):
+        testapp.get("/transactions/export.csv", params, status=200)
+
+        assert_indexed(testapp.app, captured_statements)
+
+    @pytest.mark.parametrize("params", [
+        {"q": "transaction"},
+        {"q": "transaction 3", "page": "2"},
+        # Past the ranked hits.
+        {"q": "transaction", "page": "2"},
+    ])
+    def test_search(
+        self,
+        testapp,
+        account_with_transactions,
+        captured_statements,
+        monkeypatch,
+        params,
+    ):
+        from heath.models.search import fts5_available
+        engine = testapp.app.registry["engine"]
+        with engine.connect() as connection:
+            if not fts5_available(connection):
+                pytest.skip("SQLite is compiled without FTS5.")
+        monkeypatch.setattr("heath.models.search.SEARCH_WINDOW", 3)
+        testapp.get("/transactions/search", params, status=200)
+
+        # Only the newest hits, at most `SEARCH_WINDOW`, are sorted by
+        # relevance. The index is looked up in the small schema table.
+        assert_indexed(
+            testapp.app,
+            captured_statements,
+            allowed_tables=("hits", "sqlite_master"),
+            allow_sort=True,
+        )
+        statement, details = query_plans(engine, captured_statements)[-1]
+        assert any(
+            detail.startswith("SCAN transactions_fts VIRTUAL TABLE INDEX")
+            for detail in details
+        )
+
+
+class TestHomeQueryPlans(object):
+    """Query plans of the home view."""
+
+    def test_home(self, testapp, account_with_transactions,
+                  captured_statements):
+        testapp.get("/home", status=200)
+
+        # The home page lists every account by design.
+        assert_indexed(
+            testapp.app,
+            captured_statements,
+            allowed_tables=("accounts",),
+        )
+
+
+class TestReportQueryPlans(object):
+    """Query plans of the spending reports."""
+
+    @pytest.mark.parametrize("params", [
+        {},
+        {"period": "week"},
+        {"period": "week", "account": "1"},
+    ])
+    def test_reports(self, testapp, account_with_transactions,
+                     captured_statements, params):
+        testapp.get("/reports/", params, status=200)
+
+        assert_indexed(testapp.app, captured_statements)
+
+
+class TestAccountQueryPlans(object):
+    """Query plans of the account views."""
+
+    @pytest.mark.parametrize("as_of", ["2000-01-01", "2100-01-01"])
+    def test_balance(self, testapp, account_with_transactions,
+                     captured_statements, as_of):
+        testapp.get("/accounts/1/balance", {"as_of": as_of}, status=200)
+
+        assert_indexed(testapp.app, captured_statements)
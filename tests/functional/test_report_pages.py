@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the spending reports."""
+
+from bs4 import BeautifulSoup
+
+from tests.functional.conftest import HTML_PARSER
+from tests.functional.test_transaction_pages import example_transactions  # noqa: F401,E501
+
+
+class TestReportPage(object):
+    def test_message_if_no_transactions(self, testapp):
+        response = testapp.get("/reports/", status=200)
+
+        soup = BeautifulSoup(response.text, HTML_PARSER)
+        assert soup.find(
+            string="There are no transactions to report yet.") is not None
+
+    def test_monthly_totals(self, testapp, example_transactions):
+        response = testapp.get("/reports/", status=200)
+
+        soup = BeautifulSoup(response.text, HTML_PARSER)
+        total = soup.find("tr", class_="total")
+        cells = [cell.text for cell in total.find_all("th")]
+        assert cells[2:] == ["100.00", "-40.00", "60.00", "2"]
+        account = soup.find("tr", class_="account")
+        assert "No account" in account.text
+
+    def test_weekly_report_links_to_monthly(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = testapp.get("/reports/", {"period": "week"}, status=200)
+
+        soup = BeautifulSoup(response.text, HTML_PARSER)
+        assert soup.find("h1").text == "Spending per week"
+        assert soup.find("a", href="http://localhost/reports/?period=month")
+
+    def test_report_of_other_account_is_empty(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = testapp.get("/reports/", {"account": "1"}, status=200)
+
+        assert "There are no transactions to report yet." in response.text
+
+    def test_invalid_parameters_lead_to_bad_request(self, testapp):
+        testapp.get("/reports/", {"period": "year"}, status=400)
+        testapp.get("/reports/", {"account": "one"}, status=400)
+        testapp.get("/reports/", {"account": "99999999999999999999999"},
+                    status=400)
+
+    def test_report_reads_only_rollups(
+        self,
+        testapp,
+        example_transactions,
+        query_log,
+    ):
+        testapp.get("/reports/", status=200)
+
+        # The data version of the ETag and the rollups.
+        assert query_log.count == 2
+        assert not any(
+            "transactions" in statement
+            for statement in query_log.statements
+        )
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the start of the application."""
+
+import json
+import subprocess
+import sys
+
+
+STARTUP = """
+import json, sys
+from heath import main
+main({}, **{"sqlalchemy.url": "sqlite://"})
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def test_only_the_views_are_scanned():
+    # In a new process, the tests have imported everything in this one.
+    process = subprocess.run(
+        [sys.executable, "-c", STARTUP],
+        check=True,
+        stdout=subprocess.PIPE,
+    )
+    modules = json.loads(process.stdout)
+
+    assert "heath.views.transactions" in modules
+    assert not [
+        module for module in modules
+        if module.startswith(("heath.scripts", "heath.pshell", "numpy"))
+    ]
@@ -0,0 +1,14 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the status page."""
+
+
+class TestStatusPage(object):
+    def test_status_reports_lock_contention(self, testapp):
+        response = testapp.get("/status", status=200)
+
+        assert response.json["sqlite"]["lock_contention"] == {
+            "retries": 0,
+            "failures": 0,
+        }
+        assert "journal_mode" in response.json["sqlite"]["pragmas"]
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the request timings."""
+
+import json
+import logging
+import re
+
+import pytest
+from pyramid import testing
+
+
+SERVER_TIMING = re.compile(
+    r'^total;dur=[\d.]+, view;dur=[\d.]+, template;dur=[\d.]+, '
+    r'sql;dur=[\d.]+;desc="(\d+) statements"$'
+)
+
+
+@pytest.fixture
+def app():
+    config = testing.setUp(settings={
+        'sqlalchemy.url': 'sqlite:///:memory:',
+        'heath.query_guard': 'raise',
+        'heath.timing': 'true',
+    })
+    settings = config.get_settings()
+
+    from heath import main
+    app = main({}, **settings)
+
+    yield app
+
+    testing.tearDown()
+
+
+class TestRequestTimings(object):
+    def test_server_timing_header(self, testapp):
+        response = testapp.get("/transactions/", status=200)
+
+        match = SERVER_TIMING.match(response.headers["Server-Timing"])
+        assert match
+        assert int(match.group(1)) > 0
+
+    def test_timings_are_logged(self, testapp, caplog):
+        with caplog.at_level(logging.INFO, logger="heath.timing"):
+            testapp.get("/home", status=200)
+
+        record = caplog.records[-1].timing
+        assert record["route"] == "home"
+        assert record["status"] == 200
+        assert record["sql_count"] > 0
+        assert record["template_ms"] > 0
+        assert record["total_ms"] >= (
+            record["view_ms"] + record["template_ms"])
+        assert json.loads(caplog.records[-1].getMessage()) == record
+
+    def test_not_found_is_timed(self, testapp):
+        response = testapp.get("/transactions/123", status=404)
+
+        assert "Server-Timing" in response.headers
+
@@ -2,6 +2,9 @@
 
 """Functional tests for the transaction pages."""
 
+from datetime import datetime
+from decimal import Decimal
+
 import bs4
 import pytest
 import re
@@ -57,6 +60,16 @@ class TestTransactionCreateView(object):
         assert soup.find(id="description")["value"] == "A new transaction"
         assert soup.find(id="amount")["value"] == ""
 
+    def test_post_too_large_amount(self, testapp):
+        response = testapp.post(
+            "/transactions/create",
+            {"description": "A new transaction", "amount": "1e400"},
+            status=200,
+        )
+
+        soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+        assert soup.select("#errors")[0].li is not None
+
     def test_submit_create_form(self, testapp):
         """Create a transaction by filling and submitting the form."""
         # Retrieve the form
@@ -124,12 +137,216 @@ class TestTransactionListView(object):
         create_link = soup.find(href=re.compile("/transactions/create"))
         assert create_link is not None
 
+    def test_no_pagination_links_on_single_page(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = testapp.get(
+            "/transactions/",
+            status=200,
+        )
+
+        soup = bs4.BeautifulSoup(response.body, HTML_PARSER)
+        assert soup.find("a", rel="next") is None
+        assert soup.find("a", rel="prev") is None
+
+    def test_invalid_cursor_is_bad_request(self, testapp):
+        testapp.get("/transactions/?after=garbage", status=400)
+
+    @pytest.mark.parametrize("sort, value, row_id", [
+        ("created", datetime(2020, 1, 1), 10 ** 25),
+        ("amount", Decimal("1e30"), 1),
+    ])
+    def test_out_of_range_cursor_is_bad_request(
+        self,
+        testapp,
+        sort,
+        value,
+        row_id,
+    ):
+        from heath.pagination import encode_cursor
+        testapp.get(
+            "/transactions/",
+            {"sort": sort, "after": encode_cursor(value, row_id)},
+            status=400,
+        )
+
+    def test_list_does_not_grow_with_rows(
+        self,
+        testapp,
+        example_transactions,
+        query_log,
+    ):
+        testapp.get("/transactions/", status=200)
+        before = query_log.count
+        for number in range(5):
+            testapp.post(
+                "/transactions/create",
+                {"description": str(number), "amount": "1.00"},
+                status=302,
+            )
+        query_log.statements.clear()
+        testapp.get("/transactions/", status=200)
+
+        assert query_log.count == before
+        assert query_log.lazy_loads == {}
+
+    def test_running_balance_across_pages(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        testapp.app.registry.settings["heath.page_size"] = 1
+        first_page = testapp.get("/transactions/", status=200)
+        second_page = first_page.click(href="after=")
+
+        def balances(response):
+            soup = bs4.BeautifulSoup(response.body, HTML_PARSER)
+            cells = soup.find_all("td", class_="balance")
+            return [cell.text for cell in cells]
+
+        assert balances(first_page) == ["60.00"]
+        assert balances(second_page) == ["100.00"]
+
+    def test_no_running_balance_when_sorted_by_amount(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = testapp.get("/transactions/?sort=amount", status=200)
+
+        soup = bs4.BeautifulSoup(response.body, HTML_PARSER)
+        assert soup.find("td", class_="balance") is None
+
+    def test_all_transactions_on_one_streamed_page(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        testapp.app.registry.settings["heath.page_size"] = 1
+        first_page = testapp.get("/transactions/", status=200)
+
+        response = first_page.click(linkid=None, href="all=true")
+
+        assert response.content_type == "text/html"
+        soup = bs4.BeautifulSoup(response.body, HTML_PARSER)
+        rows = soup.find("table", id="transactions").tbody("tr")
+        assert [row.td.text for row in rows] == [
+            "Second transaction", "First transaction"]
+        assert soup.find("a", rel="next") is None
+        assert "Budget: 60.00" in response.text
+
+    def test_streamed_page_keeps_filters_and_sort(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = testapp.get(
+            "/transactions/",
+            {"all": "true", "sort": "amount", "max_amount": "50"},
+            status=200,
+        )
+
+        soup = bs4.BeautifulSoup(response.body, HTML_PARSER)
+        rows = soup.find("table", id="transactions").tbody("tr")
+        assert [row.td.text for row in rows] == ["Second transaction"]
+        assert "Budget: -40.00" in response.text
+
+    def test_streamed_page_is_rendered_while_sent(
+        self,
+        app,
+        initialized_database,
+    ):
+        from pyramid.request import Request
+        request = Request.blank("/transactions/?all=true")
+
+        response = request.get_response(app)
+
+        assert not isinstance(response.app_iter, (list, tuple))
+        assert b"<table" in next(iter(response.app_iter))
+
+
+class TestTransactionSearchView(object):
+    def test_empty_search_shows_form(self, testapp, example_transactions):
+        response = testapp.get("/transactions/search", status=200)
+
+        soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+        assert soup.find("form", id="search") is not None
+        assert soup.find("table", id="transactions") is None
+
+    def test_search_finds_matching_descriptions(
+        self,
+        testapp,
+        example_transactions,
+    ):
+        response = testapp.get(
+            "/transactions/search", {"q": "sec"}, status=200)
+
+        soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+        rows = soup.find("table", id="transactions").tbody.find_all("tr")
+        assert [row.td.text for row in rows] == ["Second transaction"]
+        assert soup.find("input", attrs={"name": "q"})["value"] == "sec"
+
+    def test_message_if_nothing_matches(self, testapp, example_transactions):
+        response = testapp.get(
+            "/transactions/search", {"q": "rent"}, status=200)
+
+        assert "No transactions match your search." in response.text
+
+    def test_search_pages(self, testapp, example_transactions):
+        testapp.app.registry.settings["heath.page_size"] = 1
+        response = testapp.get(
+            "/transactions/search", {"q": "transaction"}, status=200)
+
+        response = response.click(linkid=None, href="page=2")
+        soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+        assert len(soup.find("table", id="transactions").tbody("tr")) == 1
+        assert soup.find("a", rel="next") is None
+        assert soup.find("a", rel="prev") is not None
+
+    def test_search_pages_past_ranked_hits(
+        self,
+        testapp,
+        example_transactions,
+        monkeypatch,
+    ):
+        monkeypatch.setattr("heath.models.search.SEARCH_WINDOW", 1)
+        testapp.app.registry.settings["heath.page_size"] = 1
+        response = testapp.get(
+            "/transactions/search", {"q": "transaction"}, status=200)
+
+        descriptions = []
+        while True:
+            soup = bs4.BeautifulSoup(response.text, HTML_PARSER)
+            descriptions.extend(
+                row.td.text
+                for row in soup.find("table", id="transactions").tbody("tr")
+            )
+            next_page = soup.find("a", rel="next")
+            if next_page is None:
+                break
+            response = testapp.get(next_page["href"], status=200)
+        assert descriptions == ["Second transaction", "First transaction"]
+
+    def test_invalid_page_is_bad_request(self, testapp):
+        testapp.get("/transactions/search", {"q": "a", "page": "0"},
+                    status=400)
+        testapp.get("/transactions/search", {"q": "a", "page": "one"},
+                    status=400)
+        testapp.get("/transactions/search",
+                    {"q": "a", "page": "99999999999999999999999"},
+                    status=400)
+
 
 class TestTransactionDetailView(object):
     """Test for the transaction detail view."""
     def test_404_when_not_exists(self, testapp):
         testapp.get("/transactions/1", status=404)
 
+    def test_404_when_out_of_range(self, testapp):
+        testapp.get("/transactions/99999999999999999999999", status=404)
+
     def test_get_detail(self, testapp, example_transactions):
         testapp.get("/transactions/1", status=200)
 
@@ -295,3 +512,101 @@ class TestTransactionDeleteView(object):
         assert response.status_code == 302
         # Check that detail is not available anymore
         testapp.get("/transactions/1", status=404)
+
+    def test_delete_is_a_single_statement(
+        self,
+        testapp,
+        example_transactions,
+        query_log,
+    ):
+        testapp.post(
+            "/transactions/1/delete",
+            {"delete.confirm": "delete.confirm"},
+            status=302,
+        )
+
+        touching_transactions = [
+            statement for statement in query_log.statements
+            if "transactions" in statement
+        ]
+        assert len(touching_transactions) == 1
+        assert touching_transactions[0].startswith("DELETE FROM transactions")
+
+
+class TestTransactionExport(object):
+    """Functional tests for the streaming export endpoints."""
+
+    def test_export_csv(self, testapp, example_transactions):
+        response = testapp.get("/transactions/export.csv", status=200)
+
+        assert response.content_type == "text/csv"
+        assert "attachment" in response.headers["Content-Disposition"]
+        lines = response.text.splitlines()
+        assert lines[0] == "id,created,description,amount,account"
+        assert lines[1].startswith("1,")
+        assert lines[1].endswith(",First transaction,100.00,")
+        assert len(lines) == 3
+
+    def test_export_ndjson(self, testapp, example_transactions):
+        import json
+        response = testapp.get("/transactions/export.ndjson", status=200)
+
+        assert response.content_type == "application/x-ndjson"
+        records = [json.loads(line) for line in response.text.splitlines()]
+        assert [record["description"] for record in records] == [
+            "First transaction",
+            "Second transaction",
+        ]
+        assert records[1]["amount"] == "-40.00"
+        assert records[1]["account"] is None
+
+    def test_export_date_filter(self, testapp, example_transactions):
+        response = testapp.get(
+            "/transactions/export.ndjson",
+            {"end": "2000-01-01"},
+            status=200,
+        )
+
+        assert response.text == ""
+
+    def test_export_last_end_date(self, testapp, example_transactions):
+        response = testapp.get(
+            "/transactions/export.ndjson",
+            {"end": "9999-12-31"},
+            status=200,
+        )
+
+        assert len(response.text.splitlines()) == 2
+
+    def test_export_account_filter(self, testapp, example_transactions):
+        response = testapp.get(
+            "/transactions/export.ndjson",
+            {"account": "1"},
+            status=200,
+        )
+
+        assert response.text == ""
+
+    def test_export_invalid_filter(self, testapp):
+        testapp.get(
+            "/transactions/export.csv",
+            {"start": "yesterday"},
+            status=400,
+        )
+
+    @pytest.mark.parametrize("params", [
+        {"min_amount": "1e400"},
+        {"max_amount": "-1e30"},
+    ])
+    def test_too_large_amount_filter(self, testapp, params):
+        testapp.get("/transactions/", params, status=400)
+
+    def test_out_of_range_account_filter(self, testapp):
+        testapp.get(
+            "/transactions/",
+            {"account": "99999999999999999999999"},
+            status=400,
+        )
+
+    def test_unknown_export_format(self, testapp):
+        testapp.get("/transactions/export.xml", status=404)
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""Functional tests for the warm-up of new processes."""
+
+import logging
+import os
+
+import pytest
+from pyramid_jinja2 import IJinja2Environment
+from sqlalchemy import create_engine
+
+
+@pytest.fixture
+def database_url(tmp_path):
+    from heath.models.meta import Base
+    url = "sqlite:///{}".format(tmp_path / "heath.sqlite")
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    return url
+
+
+def create_app(**settings):
+    from heath import main
+    return main({}, **settings)
+
+
+@pytest.fixture
+def served(monkeypatch):
+    """Record the applications passed to waitress instead of serving."""
+    apps = []
+    monkeypatch.setattr(
+        "waitress.serve_paste",
+        lambda app, global_conf, **kw: apps.append(app),
+    )
+    return apps
+
+
+def loaded_templates(app):
+    environment = app.registry.queryUtility(
+        IJinja2Environment,
+        name=".jinja2",
+    )
+    return set(name for _, name in environment.cache)
+
+
+class TestWarmup(object):
+    def test_templates_and_pages_are_loaded(
+        self,
+        database_url,
+        served,
+        caplog,
+    ):
+        from heath.warmup import serve, template_names
+        app = create_app(**{
+            "sqlalchemy.url": database_url,
+            "heath.warmup": "true",
+            "heath.warmup.paths": "/home /transactions/",
+        })
+
+        with caplog.at_level(logging.INFO, logger="heath.warmup"):
+            serve(app, {}, listen="localhost:0")
+
+        assert served == [app]
+        loaded = loaded_templates(app)
+        assert loaded >= set(template_names())
+        assert "heath:templates/transactions/list.jinja2" in loaded
+        assert "{} templates, 2 pages".format(
+            len(list(template_names()))) in caplog.text
+
+    def test_not_warmed_up_when_loaded_by_scripts(self, database_url):
+        # Scripts load the application like this, without a server.
+        app = create_app(**{
+            "sqlalchemy.url": database_url,
+            "heath.warmup": "true",
+        })
+
+        assert loaded_templates(app) == set()
+
+    def test_not_warmed_up_by_default(self, database_url, served):
+        from heath.warmup import serve
+        app = create_app(**{"sqlalchemy.url": database_url})
+
+        serve(app, {})
+
+        assert served == [app]
+        assert loaded_templates(app) == set()
+
+    def test_failed_page_does_not_stop_start(self, caplog):
+        from heath.warmup import warm_up
+        # The tables do not exist.
+        app = create_app(**{
+            "sqlalchemy.url": "sqlite://",
+            "heath.warmup.paths": "/transactions/",
+        })
+
+        with caplog.at_level(logging.INFO, logger="heath.warmup"):
+            warm_up(app)
+
+        assert "Warm-up request of /transactions/ failed" in caplog.text
+        assert "0 pages" in caplog.text
+
+    def test_fragments_match_requests_of_any_host(self, database_url):
+        import transaction
+        from webtest import TestApp
+        from heath.models import get_tm_session
+        from heath.models.transaction import Transaction
+        from heath.warmup import warm_up
+        app = create_app(**{
+            "sqlalchemy.url": database_url,
+            "heath.warmup.paths": "/transactions/",
+        })
+        with transaction.manager:
+            get_tm_session(
+                app.registry["dbsession_factory"],
+                transaction.manager,
+            ).add(Transaction(description="Rent", amount=-500))
+
+        warm_up(app)
+        cache = app.registry["fragment_cache"]
+        assert len(cache) == 1
+
+        testapp = TestApp(app, extra_environ={
+            "HTTP_HOST": "heath.example.com",
+            "wsgi.url_scheme": "https",
+        })
+        response = testapp.get("/transactions/", status=200)
+
+        assert len(cache) == 1
+        assert response.click("Rent").request.path == "/transactions/1"
+
+    def test_compiled_templates_are_cached(self, database_url, tmp_path):
+        from heath.warmup import template_names, warm_up
+        directory = str(tmp_path / "jinja2")
+
+        warm_up(create_app(**{
+            "sqlalchemy.url": database_url,
+            "heath.warmup.paths": "",
+            "jinja2.bytecode_caching": "true",
+            "jinja2.bytecode_caching_directory": directory,
+        }))
+
+        assert len(os.listdir(directory)) == len(list(template_names()))
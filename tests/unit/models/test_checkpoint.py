@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the balance checkpoints."""
+
+import random
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event, insert, select
+
+
+@pytest.fixture
+def accounts(dbsession_for_unittest):
+    from heath.models.account import Account
+    checking = Account(name="Checking")
+    savings = Account(name="Savings")
+    dbsession_for_unittest.add_all([checking, savings])
+    dbsession_for_unittest.flush()
+    return checking, savings
+
+
+def add_transaction(session, account, amount, created):
+    from heath.models.transaction import Transaction
+    transaction = Transaction(
+        description="Transaction",
+        amount=amount,
+        account_id=account.id if account else None,
+        created=created,
+    )
+    session.add(transaction)
+    session.flush()
+    return transaction
+
+
+def checkpoints(session):
+    from heath.models.checkpoint import BalanceCheckpoint
+    return dict(
+        ((row.account_id, row.at), row.balance)
+        for row in session.execute(select(
+            BalanceCheckpoint.account_id,
+            BalanceCheckpoint.at,
+            BalanceCheckpoint.balance,
+        ))
+    )
+
+
+def summed_balance(session, account_id, when):
+    """Return the balance the slow way, summing all earlier transactions."""
+    from heath.models.transaction import Transaction
+    amounts = session.execute(select(Transaction.amount).where(
+        Transaction.created < when,
+        *([Transaction.account_id == account_id] if account_id else []),
+    )).scalars()
+    return sum(amounts, Decimal(0))
+
+
+class TestCheckpointMaintenance(object):
+    """Tests for keeping the checkpoints in sync with the transactions."""
+
+    def test_insert_creates_checkpoint_after_month(
+        self,
+        dbsession_for_unittest,
+        accounts,
+    ):
+        checking, _ = accounts
+        add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 1, 6))
+        add_transaction(
+            dbsession_for_unittest, checking, -40.00, datetime(2020, 1, 20))
+
+        assert checkpoints(dbsession_for_unittest) == {
+            (None, datetime(2020, 2, 1)): 60,
+            (checking.id, datetime(2020, 2, 1)): 60,
+        }
+
+    def test_back_dated_insert_updates_later_checkpoints(
+        self,
+        dbsession_for_unittest,
+        accounts,
+    ):
+        checking, savings = accounts
+        add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 3, 6))
+        add_transaction(
+            dbsession_for_unittest, savings, 5.00, datetime(2020, 4, 1))
+
+        add_transaction(
+            dbsession_for_unittest, checking, -40.00, datetime(2020, 1, 20))
+
+        assert checkpoints(dbsession_for_unittest) == {
+            (None, datetime(2020, 2, 1)): -40,
+            (None, datetime(2020, 4, 1)): 60,
+            (None, datetime(2020, 5, 1)): 65,
+            (checking.id, datetime(2020, 2, 1)): -40,
+            (checking.id, datetime(2020, 4, 1)): 60,
+            (savings.id, datetime(2020, 5, 1)): 5,
+        }
+
+    def test_edit_moves_amount_between_checkpoints(
+        self,
+        dbsession_for_unittest,
+        accounts,
+    ):
+        checking, savings = accounts
+        add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 1, 6))
+        transaction = add_transaction(
+            dbsession_for_unittest, checking, -40.00, datetime(2020, 3, 6))
+
+        transaction.created = datetime(2020, 1, 31, 23, 59)
+        transaction.account_id = savings.id
+        dbsession_for_unittest.flush()
+
+        from heath.models.checkpoint import check_checkpoints
+        assert check_checkpoints(dbsession_for_unittest.connection()) == []
+        stored = checkpoints(dbsession_for_unittest)
+        assert stored[checking.id, datetime(2020, 4, 1)] == 100
+        assert stored[savings.id, datetime(2020, 2, 1)] == -40
+        assert stored[None, datetime(2020, 2, 1)] == 60
+
+    def test_delete_keeps_checkpoints_correct(
+        self,
+        dbsession_for_unittest,
+        accounts,
+    ):
+        checking, _ = accounts
+        first = add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 1, 6))
+        add_transaction(
+            dbsession_for_unittest, checking, -40.00, datetime(2020, 2, 6))
+
+        dbsession_for_unittest.delete(first)
+        dbsession_for_unittest.flush()
+
+        from heath.models.checkpoint import check_checkpoints
+        assert check_checkpoints(dbsession_for_unittest.connection()) == []
+        assert checkpoints(dbsession_for_unittest)[
+            checking.id, datetime(2020, 3, 1)] == -40
+
+    def test_batch_of_random_months(self, dbsession_for_unittest, accounts):
+        from heath.models import ledger
+        from heath.models.checkpoint import (
+            check_checkpoints,
+            update_checkpoints,
+        )
+        from heath.models.transaction import Transaction
+        connection = dbsession_for_unittest.connection()
+        generator = random.Random(3)
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+
+        def import_batch(months):
+            values = [
+                {
+                    "description": "Transaction",
+                    "amount": Decimal(generator.randint(-5000, 5000)) / 100,
+                    "account_id": generator.choice(
+                        [account.id for account in accounts] + [None]),
+                    "created": datetime(2020 + month // 12, month % 12 + 1, 9),
+                }
+                for month in months
+            ]
+            connection.execute(insert(Transaction), values)
+            statements.clear()
+            update_checkpoints(connection, [
+                ledger.added(
+                    value["account_id"], value["amount"], value["created"])
+                for value in values
+            ])
+
+        event.listen(connection, "before_cursor_execute", count)
+        try:
+            import_batch(generator.sample(range(0, 36, 2), 18))
+            assert len(statements) == 3
+            import_batch(generator.sample(range(36), 36))
+            assert len(statements) == 3
+        finally:
+            event.remove(connection, "before_cursor_execute", count)
+        assert check_checkpoints(connection) == []
+
+    def test_check_and_rebuild_checkpoints(
+        self,
+        dbsession_for_unittest,
+        accounts,
+    ):
+        checking, _ = accounts
+        add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 1, 6))
+        from heath.models.checkpoint import (
+            BalanceCheckpoint,
+            check_checkpoints,
+            rebuild_checkpoints,
+        )
+        connection = dbsession_for_unittest.connection()
+        connection.execute(BalanceCheckpoint.__table__.delete().where(
+            BalanceCheckpoint.account_id.is_(None)))
+        connection.execute(
+            BalanceCheckpoint.__table__.update().values(balance=1))
+
+        assert len(check_checkpoints(connection)) == 2
+
+        rebuild_checkpoints(connection)
+        assert check_checkpoints(connection) == []
+
+
+class TestBalanceAsOf(object):
+    """Tests for answering balance queries from the checkpoints."""
+
+    @pytest.mark.parametrize("when", [
+        datetime(2019, 12, 31),
+        datetime(2020, 1, 6),
+        datetime(2020, 1, 6, 0, 0, 1),
+        datetime(2020, 2, 1),
+        datetime(2020, 2, 15),
+        datetime(2020, 6, 1),
+        datetime(2021, 1, 1),
+    ])
+    def test_matches_sum_of_earlier_transactions(
+        self,
+        dbsession_for_unittest,
+        accounts,
+        when,
+    ):
+        checking, savings = accounts
+        for account, amount, created in (
+            (checking, 100.00, datetime(2020, 1, 6)),
+            (savings, 7.00, datetime(2020, 1, 10)),
+            (checking, -40.00, datetime(2020, 2, 1)),
+            (None, 3.00, datetime(2020, 2, 10)),
+            (checking, -5.00, datetime(2020, 2, 20)),
+            (checking, 12.00, datetime(2020, 5, 31)),
+        ):
+            add_transaction(dbsession_for_unittest, account, amount, created)
+
+        from heath.models.checkpoint import balance_as_of
+        connection = dbsession_for_unittest.connection()
+        for account_id in (None, checking.id, savings.id):
+            assert balance_as_of(connection, account_id, when) == (
+                summed_balance(dbsession_for_unittest, account_id, when))
+
+    def test_zero_without_transactions(self, dbsession_for_unittest):
+        from heath.models.checkpoint import balance_as_of
+        connection = dbsession_for_unittest.connection()
+        assert balance_as_of(connection, None, datetime(2020, 1, 1)) == 0
@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the incrementally maintained ledger aggregates."""
+
+import pytest
+
+
+@pytest.fixture
+def example_transactions(dbsession_for_unittest):
+    session = dbsession_for_unittest
+    from heath.models.transaction import Transaction
+    first_transaction = Transaction(
+        description="First transaction",
+        amount=100.00,
+    )
+    second_transaction = Transaction(
+        description="Second transaction",
+        amount=-40.00,
+    )
+    session.add(first_transaction)
+    session.add(second_transaction)
+    session.flush()
+    return (
+        first_transaction,
+        second_transaction,
+    )
+
+
+def summary(session):
+    from heath.models.ledger import LedgerSummary, SUMMARY_ID
+    return session.get(LedgerSummary, SUMMARY_ID)
+
+
+class TestLedgerSummary(object):
+    """Tests for the maintenance of the ledger summary."""
+
+    def test_zero_budget_when_no_transactions(self, dbsession_for_unittest):
+        from heath.models.ledger import get_budget
+        assert get_budget(dbsession_for_unittest) == 0.0
+
+    def test_insert_updates_summary(
+        self,
+        dbsession_for_unittest,
+        example_transactions,
+    ):
+        assert summary(dbsession_for_unittest).total == 60.0
+        assert summary(dbsession_for_unittest).transaction_count == 2
+
+    def test_update_applies_difference(
+        self,
+        dbsession_for_unittest,
+        example_transactions,
+    ):
+        example_transactions[0].amount = 10.00
+        dbsession_for_unittest.flush()
+
+        from heath.models.ledger import get_budget
+        assert get_budget(dbsession_for_unittest) == -30.0
+        assert summary(dbsession_for_unittest).transaction_count == 2
+
+    def test_update_of_expired_transaction(
+        self,
+        dbsession_for_unittest,
+        example_transactions,
+    ):
+        """The previous amount is loaded even if it was not loaded before."""
+        dbsession_for_unittest.expire(example_transactions[0])
+        example_transactions[0].amount = 10.00
+        dbsession_for_unittest.flush()
+
+        from heath.models.ledger import get_budget
+        assert get_budget(dbsession_for_unittest) == -30.0
+
+    def test_delete_removes_amount(
+        self,
+        dbsession_for_unittest,
+        example_transactions,
+    ):
+        dbsession_for_unittest.delete(example_transactions[1])
+        dbsession_for_unittest.flush()
+
+        from heath.models.ledger import get_budget
+        assert get_budget(dbsession_for_unittest) == 100.0
+        assert summary(dbsession_for_unittest).transaction_count == 1
+
+    def test_check_consistent_summary(
+        self,
+        dbsession_for_unittest,
+        example_transactions,
+    ):
+        from heath.models.ledger import check_summary
+        connection = dbsession_for_unittest.connection()
+        assert check_summary(connection) == []
+
+    def test_check_and_rebuild_inconsistent_summary(
+        self,
+        dbsession_for_unittest,
+        example_transactions,
+    ):
+        from heath.models.ledger import (
+            LedgerSummary,
+            check_summary,
+            rebuild_summary,
+        )
+        connection = dbsession_for_unittest.connection()
+        connection.execute(LedgerSummary.__table__.update().values(total=1))
+
+        assert len(check_summary(connection)) == 1
+
+        rebuild_summary(connection)
+        assert check_summary(connection) == []
+
+
+@pytest.fixture
+def example_accounts(dbsession_for_unittest):
+    session = dbsession_for_unittest
+    from heath.models.account import Account
+    checking = Account(name="Checking")
+    savings = Account(name="Savings")
+    session.add(checking)
+    session.add(savings)
+    session.flush()
+    return checking, savings
+
+
+def add_transaction(session, account, amount, created=None):
+    from heath.models.transaction import Transaction
+    transaction = Transaction(
+        description="Transaction",
+        amount=amount,
+        account_id=account.id,
+        created=created,
+    )
+    session.add(transaction)
+    session.flush()
+    return transaction
+
+
+class TestAccountAggregates(object):
+    """Tests for the maintenance of the cached account values."""
+
+    def test_new_account_has_zero_balance(
+        self,
+        dbsession_for_unittest,
+        example_accounts,
+    ):
+        checking, _ = example_accounts
+        dbsession_for_unittest.refresh(checking)
+        assert checking.balance == 0.0
+        assert checking.transaction_count == 0
+        assert checking.last_activity is None
+
+    def test_insert_updates_account(
+        self,
+        dbsession_for_unittest,
+        example_accounts,
+    ):
+        from datetime import datetime
+        checking, _ = example_accounts
+        add_transaction(
+            dbsession_for_unittest,
+            checking,
+            100.00,
+            datetime(2020, 1, 1),
+        )
+        add_transaction(
+            dbsession_for_unittest,
+            checking,
+            -40.00,
+            datetime(2020, 2, 1),
+        )
+
+        dbsession_for_unittest.refresh(checking)
+        assert checking.balance == 60.0
+        assert checking.transaction_count == 2
+        assert checking.last_activity == datetime(2020, 2, 1)
+        assert checking.version == 3
+
+    def test_delete_moves_last_activity_back(
+        self,
+        dbsession_for_unittest,
+        example_accounts,
+    ):
+        from datetime import datetime
+        checking, _ = example_accounts
+        add_transaction(
+            dbsession_for_unittest,
+            checking,
+            100.00,
+            datetime(2020, 1, 1),
+        )
+        latest = add_transaction(
+            dbsession_for_unittest,
+            checking,
+            -40.00,
+            datetime(2020, 2, 1),
+        )
+        dbsession_for_unittest.delete(latest)
+        dbsession_for_unittest.flush()
+
+        dbsession_for_unittest.refresh(checking)
+        assert checking.balance == 100.0
+        assert checking.transaction_count == 1
+        assert checking.last_activity == datetime(2020, 1, 1)
+
+    def test_moving_transaction_between_accounts(
+        self,
+        dbsession_for_unittest,
+        example_accounts,
+    ):
+        checking, savings = example_accounts
+        transaction = add_transaction(dbsession_for_unittest, checking, 25.00)
+
+        transaction.account_id = savings.id
+        transaction.amount = 30.00
+        dbsession_for_unittest.flush()
+
+        dbsession_for_unittest.refresh(checking)
+        dbsession_for_unittest.refresh(savings)
+        assert checking.balance == 0.0
+        assert checking.transaction_count == 0
+        assert checking.last_activity is None
+        assert savings.balance == 30.0
+        assert savings.transaction_count == 1
+        assert savings.last_activity == transaction.created
+
+    def test_check_and_rebuild_accounts(
+        self,
+        dbsession_for_unittest,
+        example_accounts,
+    ):
+        checking, _ = example_accounts
+        add_transaction(dbsession_for_unittest, checking, 25.00)
+        from heath.models.account import Account
+        from heath.models.ledger import check, rebuild
+        connection = dbsession_for_unittest.connection()
+        connection.execute(Account.__table__.update().values(balance=1))
+
+        assert len(check(connection)) == 2
+
+        rebuild(connection)
+        assert check(connection) == []
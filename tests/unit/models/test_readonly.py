@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the read-only request path."""
+
+import pytest
+from pyramid import testing
+from pyramid.request import Request
+from sqlalchemy.exc import OperationalError
+
+
+@pytest.fixture
+def app(tmp_path):
+    config = testing.setUp(settings={
+        'sqlalchemy.url': 'sqlite:///{}'.format(tmp_path / "test.db"),
+    })
+    from heath import main
+    app = main({}, **config.get_settings())
+    from heath.models.meta import Base
+    Base.metadata.create_all(app.registry["engine"])
+    yield app
+    app.registry["engine"].dispose()
+    testing.tearDown()
+
+
+def make_request(app, path, method="GET"):
+    request = Request.blank(path, method=method)
+    request.registry = app.registry
+    return request
+
+
+class TestReadOnlyViews(object):
+    def test_any_writable_view_wins(self):
+        from heath.models.readonly import ReadOnlyViews
+        views = ReadOnlyViews()
+        views.add("list", ("GET", "HEAD"), True)
+        views.add("create", "GET", True)
+        views.add("create", "POST", False)
+        views.add("mixed", None, True)
+        views.add("mixed", "GET", False)
+
+        assert ("list", "GET") in views
+        assert ("list", "POST") not in views
+        assert ("create", "GET") in views
+        assert ("create", "POST") not in views
+        assert ("mixed", "PUT") in views
+        assert ("mixed", "GET") not in views
+
+
+class TestActivateTm(object):
+    @pytest.mark.parametrize("path, method, activated", [
+        ("/", "GET", False),
+        ("/transactions/", "GET", False),
+        ("/transactions/", "HEAD", False),
+        ("/transactions/create", "GET", False),
+        ("/transactions/create", "POST", True),
+        ("/transactions/1/delete", "POST", True),
+        ("/does/not/exist", "GET", True),
+    ])
+    def test_tm_only_for_writing_views(self, app, path, method, activated):
+        from heath.models.readonly import activate_tm, is_read_only
+        request = make_request(app, path, method)
+
+        assert activate_tm(request) is activated
+        assert is_read_only(request) is not activated
+
+
+class TestReadOnlySession(object):
+    def test_writes_are_refused(self, app):
+        from heath.models.readonly import get_read_only_session
+        from heath.models.account import Account
+        request = make_request(app, "/home")
+        dbsession = get_read_only_session(
+            app.registry["engine"],
+            app.registry["dbsession_factory"],
+            request,
+        )
+
+        assert dbsession.query(Account).all() == []
+        dbsession.add(Account(name="Nope"))
+        with pytest.raises(OperationalError, match="readonly"):
+            dbsession.flush()
+
+        request._process_finished_callbacks()
+        with app.registry["engine"].connect() as connection:
+            assert connection.exec_driver_sql(
+                "PRAGMA query_only").scalar() == 0
+
+    def test_connection_is_reset_if_closing_fails(self, app, monkeypatch):
+        from heath.models.readonly import get_read_only_session
+        request = make_request(app, "/home")
+        dbsession = get_read_only_session(
+            app.registry["engine"],
+            app.registry["dbsession_factory"],
+            request,
+        )
+
+        def fail():
+            raise RuntimeError("close failed")
+
+        monkeypatch.setattr(dbsession, "close", fail)
+        with pytest.raises(RuntimeError):
+            request._process_finished_callbacks()
+
+        with app.registry["engine"].connect() as connection:
+            assert connection.exec_driver_sql(
+                "PRAGMA query_only").scalar() == 0
+
+    def test_read_only_request_uses_no_transaction(self, app):
+        from webtest import TestApp
+        testapp = TestApp(app)
+        testapp.post("/accounts/create", {"name": "Checking"}, status=302)
+
+        response = testapp.get("/home", status=200)
+
+        assert "Checking" in response.text
+        assert "tm.active" not in response.request.environ
+        assert response.request.environ["heath.read_only"] is True
@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the incrementally maintained spending rollups."""
+
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event, select
+
+
+@pytest.fixture
+def checking(dbsession_for_unittest):
+    from heath.models.account import Account
+    account = Account(name="Checking")
+    dbsession_for_unittest.add(account)
+    dbsession_for_unittest.flush()
+    return account
+
+
+def add_transaction(session, account, amount, created):
+    from heath.models.transaction import Transaction
+    transaction = Transaction(
+        description="Transaction",
+        amount=amount,
+        account_id=account.id if account else None,
+        created=created,
+    )
+    session.add(transaction)
+    session.flush()
+    return transaction
+
+
+def rollups(session):
+    """Return the stored rollups keyed by period, account and bucket."""
+    from heath.models.rollup import SpendingRollup
+    return dict(
+        (
+            (row.period, row.account_id, row.bucket),
+            (row.income, row.expenses, row.transaction_count),
+        )
+        for row in session.execute(select(
+            SpendingRollup.period,
+            SpendingRollup.account_id,
+            SpendingRollup.bucket,
+            SpendingRollup.income,
+            SpendingRollup.expenses,
+            SpendingRollup.transaction_count,
+        ))
+    )
+
+
+class TestBuckets(object):
+    """Tests for assigning times to weeks and months."""
+
+    @pytest.mark.parametrize("created", [
+        datetime(2020, 1, 5, 23, 59),  # Sunday
+        datetime(2020, 1, 6, 0, 0),  # Monday
+        datetime(2020, 1, 8, 12, 30),
+        datetime(2020, 2, 29, 8, 0),
+        datetime(2020, 12, 31, 23, 59, 59, 999999),
+    ])
+    def test_database_agrees_with_python(self, created):
+        from heath.models.rollup import PERIODS, bucket_expression, bucket_of
+        engine = create_engine("sqlite://")
+        with engine.connect() as connection:
+            for period in PERIODS:
+                assert connection.execute(
+                    select(bucket_expression(period, created)),
+                ).scalar() == bucket_of(period, created)
+
+    def test_weeks_start_on_monday(self):
+        from heath.models.rollup import WEEK, bucket_of
+        assert bucket_of(WEEK, datetime(2020, 1, 5)) == date(2019, 12, 30)
+        assert bucket_of(WEEK, datetime(2020, 1, 6)) == date(2020, 1, 6)
+
+
+class TestIncrementalRollups(object):
+    """Tests for the maintenance of the rollups on changes."""
+
+    def test_insert_adds_income_and_expenses(
+        self,
+        dbsession_for_unittest,
+        checking,
+    ):
+        add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 1, 6))
+        add_transaction(
+            dbsession_for_unittest, checking, -40.00, datetime(2020, 1, 20))
+
+        assert rollups(dbsession_for_unittest) == {
+            ("month", checking.id, date(2020, 1, 1)): (100, -40, 2),
+            ("week", checking.id, date(2020, 1, 6)): (100, 0, 1),
+            ("week", checking.id, date(2020, 1, 20)): (0, -40, 1),
+        }
+
+    def test_update_moves_transaction_to_other_bucket(
+        self,
+        dbsession_for_unittest,
+        checking,
+    ):
+        add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 1, 6))
+        transaction = add_transaction(
+            dbsession_for_unittest, checking, -40.00, datetime(2020, 1, 6))
+
+        transaction.created = datetime(2020, 2, 3)
+        transaction.amount = 15.00
+        dbsession_for_unittest.flush()
+
+        assert rollups(dbsession_for_unittest) == {
+            ("month", checking.id, date(2020, 1, 1)): (100, 0, 1),
+            ("month", checking.id, date(2020, 2, 1)): (15, 0, 1),
+            ("week", checking.id, date(2020, 1, 6)): (100, 0, 1),
+            ("week", checking.id, date(2020, 2, 3)): (15, 0, 1),
+        }
+
+    def test_delete_removes_empty_buckets(
+        self,
+        dbsession_for_unittest,
+        checking,
+    ):
+        transaction = add_transaction(
+            dbsession_for_unittest, checking, -40.00, datetime(2020, 1, 6))
+
+        dbsession_for_unittest.delete(transaction)
+        dbsession_for_unittest.flush()
+
+        assert rollups(dbsession_for_unittest) == {}
+
+    def test_transactions_without_account(self, dbsession_for_unittest):
+        add_transaction(
+            dbsession_for_unittest, None, 10.00, datetime(2020, 1, 6))
+
+        assert rollups(dbsession_for_unittest) == {
+            ("month", None, date(2020, 1, 1)): (10, 0, 1),
+            ("week", None, date(2020, 1, 6)): (10, 0, 1),
+        }
+
+    def test_remove_last_transaction_without_account(
+        self,
+        dbsession_for_unittest,
+    ):
+        transaction = add_transaction(
+            dbsession_for_unittest, None, 10.00, datetime(2020, 1, 6))
+        add_transaction(
+            dbsession_for_unittest, None, -5.00, datetime(2020, 1, 27))
+
+        dbsession_for_unittest.delete(transaction)
+        dbsession_for_unittest.flush()
+
+        assert rollups(dbsession_for_unittest) == {
+            ("month", None, date(2020, 1, 1)): (0, -5, 1),
+            ("week", None, date(2020, 1, 27)): (0, -5, 1),
+        }
+
+    def test_statements_do_not_grow_with_the_buckets(
+        self,
+        dbsession_for_unittest,
+        checking,
+    ):
+        from heath.models import ledger
+        from heath.models.rollup import update_rollups
+        connection = dbsession_for_unittest.connection()
+        statements = []
+
+        def count(*args):
+            statements.append(args)
+
+        event.listen(connection, "before_cursor_execute", count)
+        try:
+            update_rollups(connection, [
+                ledger.added(
+                    account_id,
+                    -1,
+                    datetime(2020, 1, 1) + timedelta(days=day),
+                )
+                for account_id in (checking.id, None)
+                for day in range(0, 400, 3)
+            ])
+            assert len(statements) == 1
+
+            statements.clear()
+            update_rollups(connection, [
+                ledger.removed(
+                    checking.id,
+                    -1,
+                    datetime(2020, 1, 1) + timedelta(days=day),
+                )
+                for day in range(0, 400, 3)
+            ])
+            assert len(statements) == 2
+        finally:
+            event.remove(connection, "before_cursor_execute", count)
+        assert set(account_id for _, account_id, _ in rollups(
+            dbsession_for_unittest)) == {None}
+
+    def test_check_and_rebuild_rollups(
+        self,
+        dbsession_for_unittest,
+        checking,
+    ):
+        add_transaction(
+            dbsession_for_unittest, checking, 100.00, datetime(2020, 1, 6))
+        from heath.models.rollup import (
+            SpendingRollup,
+            check_rollups,
+            rebuild_rollups,
+        )
+        connection = dbsession_for_unittest.connection()
+        assert check_rollups(connection) == []
+        connection.execute(SpendingRollup.__table__.update().values(income=1))
+
+        assert len(check_rollups(connection)) == 2
+
+        rebuild_rollups(connection)
+        assert check_rollups(connection) == []
+
+
+class TestParallelRebuild(object):
+    """Tests for rebuilding the rollups with several workers."""
+
+    def test_parallel_rebuild_matches_incremental(self, tmp_path):
+        from heath.models import get_engine, ledger
+        from heath.models.meta import Base
+        from heath.scripts import generate_data
+        engine = get_engine({
+            "sqlalchemy.url": "sqlite:///{}".format(tmp_path / "heath.db"),
+        })
+        Base.metadata.create_all(engine)
+        generate_data.generate(
+            engine,
+            accounts=4,
+            transactions=300,
+            seed=2,
+            start=datetime(2020, 1, 1),
+            days=120,
+            batch_size=100,
+            use_numpy=False,
+            report=lambda message: None,
+        )
+        with engine.begin() as connection:
+            incremental = rollups(connection)
+            ledger.rebuild(connection, workers=4)
+
+            assert rollups(connection) == incremental
+            assert ledger.check(connection) == []
+        engine.dispose()
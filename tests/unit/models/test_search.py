@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the full-text search of transaction descriptions."""
+
+import pytest
+
+
+def add_transaction(session, description):
+    from heath.models.transaction import Transaction
+    transaction = Transaction(description=description, amount=1.00)
+    session.add(transaction)
+    session.flush()
+    return transaction
+
+
+def search(session, text):
+    """Return the descriptions of the transactions matching `text`."""
+    from heath.models.search import search_statement, search_terms
+    from heath.models.transaction import Transaction
+    return session.execute(search_statement(
+        session.connection(),
+        search_terms(text),
+        Transaction.description,
+    )).scalars().all()
+
+
+class TestMatchExpression(object):
+    """Tests for turning user input into FTS5 queries."""
+
+    def test_last_term_is_prefix(self):
+        from heath.models.search import match_expression, search_terms
+        assert match_expression(search_terms("corner gro")) == (
+            '"corner" "gro"*')
+
+    def test_operators_and_quotes_are_ignored(self):
+        from heath.models.search import match_expression, search_terms
+        assert match_expression(search_terms('a OR "b" NOT c*')) == (
+            '"a" "OR" "b" "NOT" "c"*')
+
+    def test_no_expression_without_words(self):
+        from heath.models.search import match_expression, search_terms
+        assert match_expression(search_terms(" -*- ")) is None
+
+
+class TestFullTextSearch(object):
+    """Tests for searching with the FTS5 index."""
+
+    def test_index_is_created_with_table(self, dbsession_for_unittest):
+        from heath.models.search import fts5_available, has_search_index
+        connection = dbsession_for_unittest.connection()
+        assert has_search_index(connection) == fts5_available(connection)
+
+    def test_triggers_keep_index_in_sync(self, dbsession_for_unittest):
+        groceries = add_transaction(dbsession_for_unittest, "Groceries")
+        rent = add_transaction(dbsession_for_unittest, "Rent")
+
+        groceries.description = "Café au lait"
+        dbsession_for_unittest.delete(rent)
+        dbsession_for_unittest.flush()
+
+        assert search(dbsession_for_unittest, "groceries") == []
+        assert search(dbsession_for_unittest, "rent") == []
+        assert search(dbsession_for_unittest, "cafe") == ["Café au lait"]
+
+    def test_all_terms_have_to_match(self, dbsession_for_unittest):
+        add_transaction(dbsession_for_unittest, "Corner grocery store")
+        add_transaction(dbsession_for_unittest, "Grocery delivery")
+
+        assert search(dbsession_for_unittest, "grocery corn") == [
+            "Corner grocery store"]
+        assert len(search(dbsession_for_unittest, "gro")) == 2
+
+    def test_most_relevant_first(self, dbsession_for_unittest):
+        add_transaction(dbsession_for_unittest, "Rent and some other things")
+        add_transaction(dbsession_for_unittest, "Rent")
+
+        assert search(dbsession_for_unittest, "rent") == [
+            "Rent", "Rent and some other things"]
+
+    def test_pages_continue_past_the_window(
+        self,
+        dbsession_for_unittest,
+        monkeypatch,
+    ):
+        from heath.models.search import search_rows
+        from heath.models.transaction import Transaction
+        monkeypatch.setattr("heath.models.search.SEARCH_WINDOW", 4)
+        ids = [
+            add_transaction(
+                dbsession_for_unittest,
+                "Rent" + " and more" * (number % 3),
+            ).id
+            for number in range(10)
+        ]
+
+        found = []
+        for offset in range(0, 12, 3):
+            found.extend(search_rows(
+                dbsession_for_unittest.connection(),
+                ["rent"],
+                [Transaction.id],
+                offset=offset,
+                limit=3,
+            ))
+
+        found = [row.id for row in found]
+        # The newest hits ranked by relevance, then the older ones.
+        assert sorted(found[:4]) == ids[-4:]
+        assert found[:4] != ids[:-5:-1]
+        assert found[4:] == ids[-5::-1]
+
+
+class TestDeferredSearchIndex(object):
+    """Tests for indexing bulk inserts at the end."""
+
+    @pytest.fixture
+    def connection(self):
+        from sqlalchemy import create_engine
+        from heath.models.meta import Base
+        from heath.models.search import fts5_available
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+        with engine.connect() as connection:
+            if not fts5_available(connection):
+                pytest.skip("SQLite is compiled without FTS5")
+            yield connection
+        engine.dispose()
+
+    def insert(self, connection, *descriptions):
+        from heath.models.transaction import Transaction
+        connection.execute(Transaction.__table__.insert(), [
+            {"description": description, "amount": 1}
+            for description in descriptions
+        ])
+
+    def matches(self, connection, text):
+        from heath.models.search import search_statement, search_terms
+        from heath.models.transaction import Transaction
+        return connection.execute(search_statement(
+            connection,
+            search_terms(text),
+            Transaction.description,
+        )).scalars().all()
+
+    def has_insert_trigger(self, connection):
+        return connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' "
+            "AND name = 'transactions_fts_insert'"
+        ).scalar() is not None
+
+    def test_rows_are_indexed_at_the_end(self, connection):
+        from heath.models.search import deferred_search_index
+        self.insert(connection, "Rent January")
+        connection.commit()
+
+        with deferred_search_index(connection):
+            self.insert(connection, "Rent February", "Groceries")
+            assert not self.has_insert_trigger(connection)
+            assert self.matches(connection, "rent") == ["Rent January"]
+            connection.commit()
+
+        assert self.has_insert_trigger(connection)
+        assert sorted(self.matches(connection, "rent")) == [
+            "Rent February", "Rent January"]
+        assert self.matches(connection, "groceries") == ["Groceries"]
+
+    def test_committed_rows_are_indexed_on_errors(self, connection):
+        from heath.models.search import deferred_search_index
+        with pytest.raises(RuntimeError):
+            with deferred_search_index(connection):
+                self.insert(connection, "Rent")
+                connection.commit()
+                self.insert(connection, "Rolled back")
+                raise RuntimeError()
+
+        assert self.has_insert_trigger(connection)
+        assert self.matches(connection, "rent") == ["Rent"]
+        assert self.matches(connection, "rolled") == []
+
+
+class TestSearchFallback(object):
+    """Tests for searching without the FTS5 index."""
+
+    @pytest.fixture
+    def without_index(self, dbsession_for_unittest):
+        from heath.models.search import drop_search_index
+        drop_search_index(dbsession_for_unittest.connection())
+        return dbsession_for_unittest
+
+    def test_descriptions_are_scanned(self, without_index):
+        from heath.models.search import has_search_index
+        add_transaction(without_index, "Corner grocery store")
+        add_transaction(without_index, "Grocery delivery")
+
+        assert not has_search_index(without_index.connection())
+        assert search(without_index, "grocery") == [
+            "Grocery delivery", "Corner grocery store"]
+        assert search(without_index, "ery sto") == ["Corner grocery store"]
+
+    def test_wildcards_are_escaped(self, without_index):
+        add_transaction(without_index, "100% refund")
+        add_transaction(without_index, "100 dollars")
+
+        assert search(without_index, "100%") == [
+            "100 dollars", "100% refund"]
+        assert search(without_index, "100_") == []
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the SQLite connection profile and lock contention."""
+
+import sqlite3
+
+import pytest
+from pyramid import testing
+from sqlalchemy.exc import OperationalError
+
+
+def lock_error():
+    orig = sqlite3.OperationalError("database is locked")
+    orig.sqlite_errorcode = sqlite3.SQLITE_BUSY
+    return OperationalError("COMMIT", {}, orig)
+
+
+class TestPragmaSettings(object):
+    """Tests for reading the pragmas from the settings."""
+
+    def test_collects_prefixed_settings(self):
+        from heath.models.sqlite import pragmas_from_settings
+        pragmas = pragmas_from_settings({
+            "sqlalchemy.url": "sqlite://",
+            "heath.sqlite.journal_mode": "WAL",
+            "heath.sqlite.cache_size": " -2000 ",
+        })
+
+        assert pragmas == {"journal_mode": "wal", "cache_size": "-2000"}
+
+    @pytest.mark.parametrize("key, value", [
+        ("heath.sqlite.foreign_keys", "on"),
+        ("heath.sqlite.journal_mode", "wal; DROP TABLE accounts"),
+        ("heath.sqlite.busy_timeout", "soon"),
+    ])
+    def test_rejects_invalid_settings(self, key, value):
+        from heath.models.sqlite import pragmas_from_settings
+        with pytest.raises(ValueError):
+            pragmas_from_settings({key: value})
+
+    def test_pragmas_applied_to_connections(self, tmp_path):
+        from heath.models import get_engine
+        engine = get_engine({
+            "sqlalchemy.url": "sqlite:///{}".format(tmp_path / "test.db"),
+            "heath.sqlite.journal_mode": "wal",
+            "heath.sqlite.busy_timeout": "1234",
+        })
+
+        with engine.connect() as connection:
+            assert connection.exec_driver_sql(
+                "PRAGMA journal_mode").scalar() == "wal"
+            assert connection.exec_driver_sql(
+                "PRAGMA busy_timeout").scalar() == 1234
+        engine.dispose()
+
+
+class TestUnindexed(object):
+    """Tests for keeping conditions away from the indexes."""
+
+    def test_wraps_column_in_unary_plus(self):
+        from sqlalchemy.dialects import sqlite
+        from heath.models.sqlite import unindexed
+        from heath.models.transaction import Transaction
+        expression = unindexed(Transaction.amount) >= 1
+
+        compiled = expression.compile(dialect=sqlite.dialect())
+        assert str(compiled) == "(+ transactions.amount) >= ?"
+        assert compiled.binds["param_1"].type is Transaction.amount.type
+
+
+class TestLockContention(object):
+    """Tests for retrying and counting lock contention."""
+
+    @pytest.fixture
+    def registry(self):
+        config = testing.setUp()
+        from heath.models.sqlite import LockContentionStats
+        config.registry["sqlite_lock_stats"] = LockContentionStats()
+        yield config.registry
+        testing.tearDown()
+
+    def test_is_lock_error(self):
+        from heath.models.sqlite import is_lock_error
+        assert is_lock_error(lock_error())
+        assert not is_lock_error(ValueError("database is locked"))
+
+    def test_lock_error_marked_retryable(self, registry):
+        from pyramid_retry import IRetryableError
+        from heath.models.sqlite import lock_retry_tween_factory
+
+        error = lock_error()
+
+        def handler(request):
+            raise error
+
+        tween = lock_retry_tween_factory(handler, registry)
+        request = testing.DummyRequest(environ={
+            "retry.attempt": 0,
+            "retry.attempts": 3,
+        })
+        with pytest.raises(OperationalError):
+            tween(request)
+
+        assert IRetryableError.providedBy(error)
+        assert registry["sqlite_lock_stats"].failures == 0
+
+    def test_failure_counted_on_last_attempt(self, registry):
+        from pyramid_retry import IRetryableError
+        from heath.models.sqlite import lock_retry_tween_factory
+
+        error = lock_error()
+
+        def handler(request):
+            raise error
+
+        tween = lock_retry_tween_factory(handler, registry)
+        request = testing.DummyRequest(environ={
+            "retry.attempt": 2,
+            "retry.attempts": 3,
+        })
+        with pytest.raises(OperationalError):
+            tween(request)
+
+        assert not IRetryableError.providedBy(error)
+        assert registry["sqlite_lock_stats"].failures == 1
+
+    def test_retry_counted(self, registry):
+        from pyramid_retry import BeforeRetry
+        from heath.models.sqlite import count_lock_retry
+
+        request = testing.DummyRequest()
+        request.registry = registry
+        count_lock_retry(BeforeRetry(request, lock_error()))
+        count_lock_retry(BeforeRetry(request, ValueError()))
+
+        assert registry["sqlite_lock_stats"].as_dict() == {
+            "retries": 1,
+            "failures": 0,
+        }
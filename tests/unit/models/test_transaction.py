@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the transaction model."""
+
+from sqlalchemy.orm import Session
+
+from heath.models.meta import Base
+
+
+class TestVersion(object):
+    """Tests for the version keying cached renderings of transactions."""
+
+    def test_concurrent_updates_both_count(self, tmp_path):
+        from heath.models import get_engine
+        from heath.models.transaction import Transaction
+        engine = get_engine({
+            "sqlalchemy.url": "sqlite:///{}".format(tmp_path / "heath.db"),
+        })
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            session.add(Transaction(description="Rent", amount=-500))
+            session.commit()
+
+        with Session(engine) as first, Session(engine) as second:
+            first_copy = first.get(Transaction, 1)
+            second_copy = second.get(Transaction, 1)
+            first_copy.description = "Rent January"
+            first.commit()
+            # Loaded before the first update, which is not an error.
+            second_copy.amount = -550
+            second.commit()
+
+            assert second_copy.version == 3
+            assert second_copy.description == "Rent January"
+        engine.dispose()
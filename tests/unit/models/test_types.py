@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the custom column types."""
+
+from decimal import Decimal
+
+import pytest
+
+
+class TestToAmount(object):
+    """Tests for the conversion of input to amounts."""
+
+    @pytest.mark.parametrize("value, expected", [
+        ("100", Decimal("100.00")),
+        (" -99.99 ", Decimal("-99.99")),
+        (0.1, Decimal("0.10")),
+        (100, Decimal("100.00")),
+        ("1.005", Decimal("1.01")),
+        ("92233720368547758.07", Decimal("92233720368547758.07")),
+    ])
+    def test_valid_amounts(self, value, expected):
+        from heath.models.types import to_amount
+        assert to_amount(value) == expected
+
+    @pytest.mark.parametrize("value", [
+        "",
+        "Not a number",
+        None,
+        "NaN",
+        "Infinity",
+        "1e20",
+        "92233720368547758.071",
+        "1e30",
+        "-1e400",
+    ])
+    def test_invalid_amounts(self, value):
+        from heath.models.types import to_amount
+        with pytest.raises(ValueError):
+            to_amount(value)
+
+
+class TestToId(object):
+    """Tests for the conversion of input to ids."""
+
+    @pytest.mark.parametrize("value, expected", [
+        ("1", 1),
+        ("9223372036854775807", 2 ** 63 - 1),
+        ("-9223372036854775807", 1 - 2 ** 63),
+    ])
+    def test_valid_ids(self, value, expected):
+        from heath.models.types import to_id
+        assert to_id(value) == expected
+
+    @pytest.mark.parametrize("value", [
+        "",
+        "one",
+        "1.5",
+        "9223372036854775808",
+        "99999999999999999999999",
+    ])
+    def test_invalid_ids(self, value):
+        from heath.models.types import to_id
+        with pytest.raises(ValueError):
+            to_id(value)
+
+
+class TestCents(object):
+    """Tests for storing amounts as integer cents."""
+
+    def test_amount_stored_as_integer_cents(self, dbsession_for_unittest):
+        from heath.models.transaction import Transaction
+        dbsession_for_unittest.add(Transaction(
+            description="Coffee",
+            amount="3.45",
+        ))
+        dbsession_for_unittest.flush()
+
+        stored = dbsession_for_unittest.connection().exec_driver_sql(
+            "SELECT amount, typeof(amount) FROM transactions",
+        ).one()
+        assert tuple(stored) == (345, "integer")
+
+    def test_sums_are_exact(self, dbsession_for_unittest):
+        from heath.models.ledger import check, get_budget
+        from heath.models.transaction import Transaction
+        for _ in range(10):
+            dbsession_for_unittest.add(Transaction(
+                description="Ten cents",
+                amount=0.1,
+            ))
+        dbsession_for_unittest.flush()
+
+        assert get_budget(dbsession_for_unittest) == Decimal("1.00")
+        assert check(dbsession_for_unittest.connection()) == []
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the build of the static files."""
+
+import gzip
+import json
+import os
+
+import pytest
+from pyramid import testing
+
+from heath.scripts import build_static
+
+
+CSS = b"body { color: black; }\n" * 20
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(range(256))
+
+
+@pytest.fixture
+def static_dir(tmp_path):
+    (tmp_path / "theme.css").write_bytes(CSS)
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "icon.png").write_bytes(PNG)
+    return str(tmp_path)
+
+
+class TestBuild(object):
+    def test_files_get_hashed_names(self, static_dir):
+        manifest = build_static.build(static_dir)
+
+        assert sorted(manifest) == ["images/icon.png", "theme.css"]
+        assert manifest["theme.css"].startswith("build/theme.")
+        assert manifest["images/icon.png"].startswith("build/images/icon.")
+        with open(os.path.join(static_dir, manifest["theme.css"]),
+                  "rb") as f:
+            assert f.read() == CSS
+        with open(os.path.join(static_dir, "build", "manifest.json")) as f:
+            assert json.load(f) == manifest
+
+    def test_name_changes_with_content(self, static_dir):
+        before = build_static.build(static_dir)["theme.css"]
+        with open(os.path.join(static_dir, "theme.css"), "ab") as f:
+            f.write(b"a { color: blue; }\n")
+
+        after = build_static.build(static_dir)["theme.css"]
+
+        assert after != before
+        assert not os.path.exists(os.path.join(static_dir, before))
+
+    def test_only_text_is_compressed(self, static_dir):
+        manifest = build_static.build(static_dir)
+
+        with gzip.open(
+            os.path.join(static_dir, manifest["theme.css"] + ".gz"),
+        ) as f:
+            assert f.read() == CSS
+        assert not os.path.exists(
+            os.path.join(static_dir, manifest["images/icon.png"] + ".gz"))
+
+    def test_static_urls_use_hashed_names(self, static_dir, monkeypatch):
+        manifest = build_static.build(static_dir)
+        monkeypatch.setattr(
+            "heath.routes.STATIC_MANIFEST",
+            os.path.join(static_dir, "build", "manifest.json"),
+        )
+        config = testing.setUp()
+        try:
+            config.include("heath.routes")
+            request = testing.DummyRequest()
+
+            url = request.static_url("heath:static/theme.css")
+        finally:
+            testing.tearDown()
+
+        assert url == "http://example.com/static/" + manifest["theme.css"]
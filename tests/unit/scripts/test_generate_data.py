@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the synthetic ledger generator."""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine
+
+from heath.scripts import generate_data
+
+
+START = datetime(2020, 1, 1)
+END = datetime(2020, 2, 1)
+
+
+@pytest.fixture
+def engine():
+    from heath.models.meta import Base
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+class TestBatches(object):
+    """Tests for the batch generators."""
+
+    def test_python_batch_is_reproducible(self):
+        def batch(seed):
+            return generate_data.python_batch(
+                seed, 0, 100, START, END, [1, 2, 3], [0.5, 0.3, 0.2])
+
+        assert batch(1) == batch(1)
+        assert batch(1) != batch(2)
+
+    def test_python_batch_is_realistic(self):
+        batch = generate_data.python_batch(
+            1, 0, 1000, START, END, [1, 2], [0.9, 0.1])
+
+        assert batch.created == sorted(batch.created)
+        assert START <= batch.created[0] and batch.created[-1] < END
+        assert set(batch.descriptions) <= set(generate_data.DESCRIPTIONS)
+        assert all(cents != 0 for cents in batch.cents)
+        assert sum(cents < 0 for cents in batch.cents) > 800
+        assert batch.account_ids.count(1) > batch.account_ids.count(2)
+
+    def test_numpy_batch_is_reproducible(self):
+        pytest.importorskip("numpy")
+
+        def batch(seed):
+            return generate_data.numpy_batch(
+                seed, 0, 100, START, END, [1, 2, 3], [0.5, 0.3, 0.2])
+
+        assert batch(1) == batch(1)
+        assert batch(1) != batch(2)
+        assert batch(1).created == sorted(batch(1).created)
+
+
+class TestGenerate(object):
+    """Tests for inserting the generated ledger."""
+
+    def test_generate_updates_ledger(self, engine):
+        from heath.models import ledger
+        inserted = generate_data.generate(
+            engine,
+            accounts=3,
+            transactions=250,
+            seed=1,
+            batch_size=100,
+            commit_every=2,
+            use_numpy=False,
+            report=lambda message: None,
+        )
+
+        assert inserted == 250
+        with engine.connect() as connection:
+            assert ledger.check(connection) == []
+            assert connection.exec_driver_sql(
+                "SELECT count(*) FROM accounts").scalar() == 3
+            assert connection.exec_driver_sql(
+                "SELECT count(*) FROM transactions").scalar() == 250
+
+    def test_generate_nothing(self, engine):
+        inserted = generate_data.generate(
+            engine,
+            accounts=1,
+            transactions=0,
+            use_numpy=False,
+            report=lambda message: None,
+        )
+
+        assert inserted == 0
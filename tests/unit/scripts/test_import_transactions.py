@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the bulk import script."""
+
+import io
+from datetime import datetime
+
+import pytest
+
+from heath.scripts import import_transactions
+
+
+CSV_DATA = """date,description,amount,account
+2020-01-31,Salary,2500.00,Checking
+2020-02-01,Rent,-900.50,
+2020-02-02,Broken,not a number,Checking
+"""
+
+OFX_DATA = """OFXHEADER:100
+<OFX><BANKMSGSRSV1><STMTTRNRS><STMTRS><BANKTRANLIST>
+<STMTTRN>
+<TRNTYPE>DEBIT
+<DTPOSTED>20200201120000[-5:EST]
+<TRNAMT>-42.10
+<NAME>Grocery Store
+</STMTTRN>
+<STMTTRN><TRNTYPE>CREDIT<DTPOSTED>20200203<TRNAMT>100.00<MEMO>Refund</STMTTRN>
+</BANKTRANLIST></STMTRS></STMTTRNRS></BANKMSGSRSV1></OFX>
+"""
+
+QIF_DATA = """!Type:Bank
+D02/01/2020
+T-1,042.10
+PLandlord
+^
+D02/03'20
+T100.00
+MRefund
+^
+"""
+
+
+class TestReaders(object):
+    """Tests for the file format readers."""
+
+    def test_read_csv(self):
+        records = list(import_transactions.read_csv(io.StringIO(CSV_DATA)))
+
+        assert len(records) == 3
+        assert records[0].description == "Salary"
+        assert records[0].amount == "2500.00"
+        assert records[0].account == "Checking"
+        assert records[1].account is None
+
+    def test_read_ofx(self):
+        records = list(import_transactions.read_ofx(io.StringIO(OFX_DATA)))
+
+        assert [record.description for record in records] == [
+            "Grocery Store",
+            "Refund",
+        ]
+        assert records[0].amount == "-42.10"
+        assert records[0].date == "20200201120000"
+
+    def test_read_ofx_in_small_chunks(self):
+        """Tags split across chunk boundaries are reassembled."""
+        tokens = list(import_transactions.ofx_tokens(
+            io.StringIO(OFX_DATA),
+            chunk_size=7,
+        ))
+        expected = list(import_transactions.ofx_tokens(io.StringIO(OFX_DATA)))
+
+        assert tokens == expected
+
+    def test_read_qif(self):
+        records = list(import_transactions.read_qif(io.StringIO(QIF_DATA)))
+
+        assert [record.description for record in records] == [
+            "Landlord",
+            "Refund",
+        ]
+        assert records[0].amount == "-1042.10"
+        assert records[1].date == "02/03'20"
+
+
+class TestValidation(object):
+    """Tests for the validation step of the pipeline."""
+
+    def test_invalid_records_are_reported(self):
+        errors = []
+        rows = list(import_transactions.validated_rows(
+            import_transactions.read_csv(io.StringIO(CSV_DATA)),
+            import_transactions.CSV_DATE_FORMATS,
+            errors,
+        ))
+
+        assert len(rows) == 2
+        assert rows[0].amount == 2500.00
+        assert rows[0].created == datetime(2020, 1, 31)
+        assert errors == ["Record 4: Amount has to be a number."]
+
+    def test_too_large_amount_is_invalid(self):
+        record = import_transactions.Record(1, "", "1e30", "2020-01-31", None)
+        with pytest.raises(import_transactions.InvalidRecord):
+            import_transactions.validate(
+                record,
+                import_transactions.CSV_DATE_FORMATS,
+            )
+
+    def test_unknown_date_format_is_invalid(self):
+        record = import_transactions.Record(1, "", "1", "yesterday", None)
+        with pytest.raises(import_transactions.InvalidRecord):
+            import_transactions.validate(
+                record,
+                import_transactions.CSV_DATE_FORMATS,
+            )
+
+
+class TestImportRows(object):
+    """Tests for the batched insert."""
+
+    def test_import_updates_ledger(self):
+        from sqlalchemy import create_engine
+        from heath.models import ledger
+        from heath.models.meta import Base
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+
+        rows = import_transactions.validated_rows(
+            import_transactions.read_csv(io.StringIO(CSV_DATA)),
+            import_transactions.CSV_DATE_FORMATS,
+            [],
+        )
+        inserted = import_transactions.import_rows(
+            engine,
+            rows,
+            batch_size=1,
+            commit_every=1,
+            account="Cash",
+            report=lambda message: None,
+        )
+
+        assert inserted == 2
+        with engine.connect() as connection:
+            assert ledger.check(connection) == []
+            names = set(connection.exec_driver_sql(
+                "SELECT name FROM accounts",
+            ).scalars())
+        assert names == {"Checking", "Cash"}
+
+    def test_imported_rows_are_searchable(self):
+        from sqlalchemy import create_engine
+        from heath.models.meta import Base
+        from heath.models.search import search_statement
+        from heath.models.transaction import Transaction
+        engine = create_engine("sqlite://")
+        Base.metadata.create_all(engine)
+
+        import_transactions.import_rows(
+            engine,
+            import_transactions.validated_rows(
+                import_transactions.read_csv(io.StringIO(CSV_DATA)),
+                import_transactions.CSV_DATE_FORMATS,
+                [],
+            ),
+            batch_size=1,
+            commit_every=1,
+            report=lambda message: None,
+        )
+
+        with engine.connect() as connection:
+            assert connection.execute(search_statement(
+                connection,
+                ["salary"],
+                Transaction.description,
+            )).scalars().all() == ["Salary"]
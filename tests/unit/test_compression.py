@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the compression of responses."""
+
+import zlib
+
+import pytest
+from webob import Request
+
+from heath import compression
+
+
+class ClosingIter(object):
+    def __init__(self, chunks):
+        self.chunks = chunks
+        self.closed = False
+
+    def __iter__(self):
+        return iter(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class TestNegotiate(object):
+    @pytest.mark.parametrize("header, expected", [
+        (None, None),
+        ("gzip", "gzip"),
+        ("deflate, gzip;q=0.5", "gzip"),
+        ("*", "gzip"),
+        ("identity", None),
+        ("gzip;q=0", None),
+    ])
+    def test_accepted_encoding(self, header, expected):
+        headers = {"Accept-Encoding": header} if header else {}
+        request = Request.blank("/", headers=headers)
+
+        assert compression.negotiate(request) == expected
+
+
+class TestCompressedChunks(object):
+    def test_every_chunk_can_be_decompressed_when_sent(self):
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = compression.compressed_chunks(
+            [b"first ", b"", b"second"],
+            compression.GzipEncoder(),
+        )
+
+        assert decompressor.decompress(next(chunks)) == b"first "
+        assert decompressor.decompress(next(chunks)) == b"second"
+        decompressor.decompress(next(chunks))
+        assert decompressor.eof
+
+    def test_original_is_closed(self):
+        app_iter = ClosingIter([b"a" * 10])
+
+        chunks = compression.compressed_chunks(
+            app_iter,
+            compression.GzipEncoder(),
+        )
+        next(chunks)
+        chunks.close()
+
+        assert app_iter.closed
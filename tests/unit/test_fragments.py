@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the cache of rendered fragments."""
+
+from types import SimpleNamespace
+
+import jinja2
+import pytest
+import transaction
+
+from heath import fragments
+
+
+@pytest.fixture
+def environment():
+    environment = jinja2.Environment(
+        extensions=[fragments.FragmentCacheExtension],
+        autoescape=True,
+    )
+    environment.fragment_cache = fragments.FragmentCache()
+    return environment
+
+
+ROW = (
+    '{% cache "transaction", row.id, row.version %}'
+    "<td>{{ row.description }}</td>"
+    "{% endcache %}"
+)
+
+
+class TestFragmentCache(object):
+    def test_least_recently_used_are_evicted(self):
+        cache = fragments.FragmentCache(
+            size=3 * fragments.ENTRY_SIZE + 6)
+        cache.set(("t", "transaction", 1, 1), "aa")
+        cache.set(("t", "transaction", 2, 1), "bb")
+        cache.get(("t", "transaction", 1, 1))
+
+        cache.set(("t", "transaction", 3, 1), "cccc")
+
+        assert cache.get(("t", "transaction", 1, 1)) == "aa"
+        assert cache.get(("t", "transaction", 2, 1)) is None
+        assert cache.used == 2 * fragments.ENTRY_SIZE + 6
+
+    def test_too_large_fragments_are_not_cached(self):
+        cache = fragments.FragmentCache(size=fragments.ENTRY_SIZE + 3)
+
+        cache.set(("t", "transaction", 1, 1), "abcd")
+
+        assert len(cache) == 0
+
+    def test_invalidate_removes_only_fragments_of_row(self):
+        cache = fragments.FragmentCache()
+        cache.set(("t", "transaction", 1, 1), "a")
+        cache.set(("u", "transaction", 1, 2), "b")
+        cache.set(("t", "transaction", 2, 1), "c")
+        cache.set(("t", "account", 1, 1), "d")
+
+        cache.invalidate("transaction", 1)
+
+        assert len(cache) == 2
+        assert cache.get(("t", "transaction", 2, 1)) == "c"
+        assert cache.get(("t", "account", 1, 1)) == "d"
+        assert cache.used == 2 * fragments.size_of("c")
+
+
+class TestCacheTag(object):
+    def test_fragment_rendered_once_per_version(self, environment):
+        template = environment.from_string(ROW)
+        row = SimpleNamespace(id=1, version=1, description="Rent")
+
+        assert template.render(row=row) == "<td>Rent</td>"
+        row.description = "Changed without a new version"
+        assert template.render(row=row) == "<td>Rent</td>"
+        row.version = 2
+        assert template.render(row=row) == (
+            "<td>Changed without a new version</td>")
+
+    def test_cached_fragments_stay_escaped(self, environment):
+        template = environment.from_string(ROW + "{{ '<' }}")
+        row = SimpleNamespace(id=1, version=1, description="<b>")
+
+        template.render(row=row)
+
+        assert template.render(row=row) == "<td>&lt;b&gt;</td>&lt;"
+
+    def test_key_includes_template(self, environment):
+        environment.loader = jinja2.DictLoader({
+            "list.jinja2": ROW,
+            "search.jinja2": ROW.replace("td>", "th>"),
+        })
+        row = SimpleNamespace(id=1, version=1, description="Rent")
+        environment.get_template("list.jinja2").render(row=row)
+
+        assert environment.get_template("search.jinja2").render(row=row) == (
+            "<th>Rent</th>")
+
+    def test_rendered_every_time_without_cache(self, environment):
+        environment.fragment_cache = None
+        template = environment.from_string(ROW)
+        row = SimpleNamespace(id=1, version=1, description="Rent")
+        template.render(row=row)
+        row.description = "Changed"
+
+        assert template.render(row=row) == "<td>Changed</td>"
+
+    def test_new_fragments_not_cached_if_disabled(self, environment):
+        template = environment.from_string(ROW)
+        row = SimpleNamespace(id=1, version=1, description="Rent")
+
+        template.render(row=row, cache_new_fragments=False)
+        assert len(environment.fragment_cache) == 0
+        template.render(row=row)
+        row.description = "Changed"
+
+        assert template.render(row=row, cache_new_fragments=False) == (
+            "<td>Rent</td>")
+
+    def test_version_is_required(self, environment):
+        with pytest.raises(jinja2.TemplateSyntaxError):
+            environment.from_string(
+                '{% cache "transaction", 1 %}x{% endcache %}')
+
+
+class TestFragmentsChanged(object):
+    def test_invalidated_on_commit(self):
+        cache = fragments.FragmentCache()
+        cache.set(("t", "transaction", 1, 1), "a")
+        request = SimpleNamespace(
+            registry={"fragment_cache": cache},
+            tm=transaction.TransactionManager(explicit=True),
+        )
+
+        with request.tm:
+            fragments.fragments_changed(request, "transaction", 1)
+            assert len(cache) == 1
+
+        assert len(cache) == 0
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the ETags derived from the data version."""
+
+from types import SimpleNamespace
+
+import pytest
+from pyramid.request import Request
+from pyramid.response import Response
+
+from heath import httpcache
+
+
+def make_etag_view(token):
+    calls = []
+
+    def view(context, request):
+        calls.append(request)
+        return Response("page")
+
+    wrapper = httpcache.etag_view(view, SimpleNamespace(
+        options={"etag": True},
+        registry={"etag_token": token},
+    ))
+    wrapper.calls = calls
+    return wrapper
+
+
+@pytest.fixture
+def etag_view(dbsession_for_unittest):
+    return make_etag_view("deploy")
+
+
+def get(dbsession, if_none_match=None):
+    request = Request.blank("/")
+    request.dbsession = dbsession
+    if if_none_match is not None:
+        request.headers["If-None-Match"] = if_none_match
+    return request
+
+
+def add_account(dbsession, name):
+    from heath.models.account import Account
+    dbsession.add(Account(name=name))
+    dbsession.flush()
+
+
+class TestETagView(object):
+    def test_current_version_is_not_modified(
+        self,
+        dbsession_for_unittest,
+        etag_view,
+    ):
+        response = etag_view(None, get(dbsession_for_unittest))
+
+        not_modified = etag_view(
+            None, get(dbsession_for_unittest, '"{}"'.format(response.etag)))
+
+        assert not_modified.status_code == 304
+        assert not_modified.etag == response.etag
+        assert len(etag_view.calls) == 1
+
+    def test_every_write_changes_the_etag(
+        self,
+        dbsession_for_unittest,
+        etag_view,
+    ):
+        etags = [etag_view(None, get(dbsession_for_unittest)).etag]
+
+        add_account(dbsession_for_unittest, "Checking")
+        etags.append(etag_view(None, get(dbsession_for_unittest)).etag)
+        add_account(dbsession_for_unittest, "Savings")
+        etags.append(etag_view(None, get(dbsession_for_unittest)).etag)
+
+        assert len(set(etags)) == 3
+
+    def test_rolled_back_write_keeps_the_etag(
+        self,
+        dbsession_for_unittest,
+        etag_view,
+    ):
+        etag = etag_view(None, get(dbsession_for_unittest)).etag
+
+        savepoint = dbsession_for_unittest.begin_nested()
+        add_account(dbsession_for_unittest, "Checking")
+        savepoint.rollback()
+
+        assert etag_view(None, get(dbsession_for_unittest)).etag == etag
+
+    def test_other_deploy_changes_the_etag(
+        self,
+        dbsession_for_unittest,
+        etag_view,
+    ):
+        etag = etag_view(None, get(dbsession_for_unittest)).etag
+        deployed = make_etag_view("next-deploy")
+
+        response = deployed(
+            None, get(dbsession_for_unittest, '"{}"'.format(etag)))
+
+        assert response.status_code == 200
+        assert response.etag != etag
+
+
+class TestETagToken(object):
+    def test_setting_is_used(self):
+        assert httpcache.get_etag_token({"heath.etag_token": "abc"}) == "abc"
+
+    def test_hash_of_the_code_by_default(self):
+        token = httpcache.get_etag_token({})
+
+        assert token == httpcache.code_token()
+        assert len(token) == httpcache.TOKEN_LENGTH
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the query guard."""
+
+import logging
+from types import SimpleNamespace
+
+import pytest
+from pyramid import testing
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from heath import queryguard
+
+
+@pytest.fixture
+def session_factory():
+    from heath.models.account import Account
+    from heath.models.meta import Base
+    from heath.models.transaction import Transaction
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine)
+    queryguard.install(engine, factory)
+    with factory() as dbsession:
+        for number in range(3):
+            dbsession.add(Transaction(
+                description=str(number),
+                amount=1,
+                account=Account(name=str(number)),
+            ))
+        dbsession.commit()
+    yield factory
+    engine.dispose()
+
+
+def make_info(mode, budget=None):
+    return SimpleNamespace(
+        registry=SimpleNamespace(settings={"heath.query_guard": mode}),
+        options={"query_budget": budget},
+    )
+
+
+class TestRecording(object):
+    def test_repeated_lazy_loads_are_detected(self, session_factory):
+        from heath.models.transaction import Transaction
+        with session_factory() as dbsession:
+            with queryguard.recording() as query_log:
+                for transaction in dbsession.query(Transaction):
+                    transaction.account.name
+
+        assert query_log.count == 4
+        assert query_log.lazy_loads == {"Transaction.account": 3}
+        assert query_log.problems(budget=2) == [
+            "4 statements issued, the budget is 2",
+            "Transaction.account lazy loaded 3 times, load it eagerly",
+        ]
+
+    def test_eager_loading_passes(self, session_factory):
+        from sqlalchemy.orm import joinedload
+        from heath.models.transaction import Transaction
+        with session_factory() as dbsession:
+            with queryguard.recording() as query_log:
+                for transaction in dbsession.query(Transaction).options(
+                        joinedload(Transaction.account)):
+                    transaction.account.name
+
+        assert query_log.problems(budget=1) == []
+
+    def test_nested_recordings(self, session_factory):
+        from heath.models.account import Account
+        with session_factory() as dbsession:
+            with queryguard.recording() as outer:
+                dbsession.query(Account).all()
+                with queryguard.recording() as inner:
+                    dbsession.query(Account).all()
+
+        assert (outer.count, inner.count) == (2, 1)
+
+
+class TestGuardedView(object):
+    def over_budget_view(self, session_factory):
+        from heath.models.account import Account
+
+        def view(context, request):
+            with session_factory() as dbsession:
+                dbsession.query(Account).all()
+                dbsession.query(Account).all()
+            return "response"
+        return view
+
+    def test_raise_mode(self, session_factory):
+        view = queryguard.guarded_view(
+            self.over_budget_view(session_factory),
+            make_info("raise", budget=1),
+        )
+
+        with pytest.raises(queryguard.QueryBudgetExceeded):
+            view(None, testing.DummyRequest())
+
+    def test_warn_mode(self, session_factory, caplog):
+        view = queryguard.guarded_view(
+            self.over_budget_view(session_factory),
+            make_info("warn", budget=1),
+        )
+
+        with caplog.at_level(logging.WARNING, logger="heath.queryguard"):
+            assert view(None, testing.DummyRequest()) == "response"
+        assert "2 statements issued" in caplog.text
+
+    def test_off_mode_leaves_view_alone(self, session_factory):
+        view = self.over_budget_view(session_factory)
+
+        assert queryguard.guarded_view(view, make_info("off", 1)) is view
+
+    def test_invalid_mode(self):
+        with pytest.raises(ValueError):
+            queryguard.guarded_view(lambda c, r: None, make_info("loud"))
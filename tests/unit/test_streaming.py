@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+
+"""Unit tests for the streaming template rendering."""
+
+import jinja2
+
+from heath.streaming import encoded_chunks
+
+
+class TestEncodedChunks(object):
+    def test_chunks_hold_at_least_chunk_size(self):
+        template = jinja2.Template(
+            "{% for row in rows %}{{ row }};{% endfor %}")
+
+        chunks = list(encoded_chunks(
+            template,
+            {"rows": iter(["ab", "cd", "é"])},
+            chunk_size=4,
+        ))
+
+        assert chunks == [b"ab;cd", ";é;".encode("utf-8")]
+
+    def test_rows_are_read_while_rendering(self):
+        template = jinja2.Template(
+            "{% for row in rows %}{{ row }}{% endfor %}")
+        read = []
+
+        def rows():
+            for row in ("a" * 4, "b" * 4):
+                read.append(row)
+                yield row
+
+        chunks = encoded_chunks(template, {"rows": rows()}, chunk_size=4)
+
+        assert next(chunks) == b"aaaa"
+        assert read == ["aaaa"]
@@ -116,6 +116,17 @@ class TestTransactionCreateView(object):
         first_transaction = dbsession_for_unittest.query(Transaction).first()
         assert first_transaction is None
 
+    def test_non_finite_amount_leads_to_error_message(
+        self,
+        dummy_post_create_request,
+    ):
+        dummy_post_create_request.POST["amount"] = "NaN"
+
+        from heath.views.transactions import TransactionView
+        response = TransactionView(dummy_post_create_request).create_post()
+
+        assert response["errors"][0] == "Amount has to be a number."
+
     # TODO: Test empty description leads to error message
     # TODO: Test empty amount leads to error message
 
@@ -152,8 +163,23 @@ class TestTransactionListView(object):
         response = TransactionView(dummy_get_request).list()
 
         assert "transactions" in response
-        assert example_transactions[0] in response["transactions"]
-        assert example_transactions[1] in response["transactions"]
+        ids = [row.id for row in response["transactions"]]
+        assert example_transactions[0].id in ids
+        assert example_transactions[1].id in ids
+
+    def test_list_rows_are_not_entities(
+        self,
+        dummy_get_request,
+        example_transactions,
+    ):
+        from heath.models.transaction import Transaction
+        from heath.views.transactions import TransactionView
+        response = TransactionView(dummy_get_request).list()
+
+        row = response["transactions"][0]
+        assert not isinstance(row, Transaction)
+        assert row._fields == (
+            "id", "created", "description", "amount", "version")
 
     def test_transactions_in_reverse_order(
         self,
@@ -164,8 +190,8 @@ class TestTransactionListView(object):
         response = TransactionView(dummy_get_request).list()
 
         # Test order of transactions (last transaction is first in list)
-        assert example_transactions[-1] == response["transactions"][0]
-        assert example_transactions[0] == response["transactions"][-1]
+        assert example_transactions[-1].id == response["transactions"][0].id
+        assert example_transactions[0].id == response["transactions"][-1].id
 
     def test_transaction_sum(
         self,
@@ -179,6 +205,188 @@ class TestTransactionListView(object):
         assert response["budget"] == 60.0
 
 
+class TestTransactionListPagination(object):
+    """Unit tests for the keyset pagination of the list view."""
+
+    @pytest.fixture
+    def paged_request(self, dummy_get_request, example_transactions):
+        """Return a list request with a page size of one."""
+        dummy_get_request.registry.settings["heath.page_size"] = 1
+        return dummy_get_request
+
+    def test_page_size_limits_transactions(self, paged_request):
+        from heath.views.transactions import TransactionView
+        response = TransactionView(paged_request).list()
+
+        assert len(response["transactions"]) == 1
+        assert response["previous_cursor"] is None
+        assert response["next_cursor"] is not None
+
+    def test_next_cursor_returns_following_page(
+        self,
+        paged_request,
+        example_transactions,
+    ):
+        from heath.views.transactions import TransactionView
+        first_page = TransactionView(paged_request).list()
+
+        paged_request.GET["after"] = first_page["next_cursor"]
+        second_page = TransactionView(paged_request).list()
+
+        assert [row.id for row in second_page["transactions"]] == [
+            example_transactions[0].id,
+        ]
+        assert second_page["next_cursor"] is None
+        assert second_page["previous_cursor"] is not None
+
+    def test_previous_cursor_returns_preceding_page(
+        self,
+        paged_request,
+        example_transactions,
+    ):
+        from heath.views.transactions import TransactionView
+        first_page = TransactionView(paged_request).list()
+        paged_request.GET["after"] = first_page["next_cursor"]
+        second_page = TransactionView(paged_request).list()
+
+        del paged_request.GET["after"]
+        paged_request.GET["before"] = second_page["previous_cursor"]
+        previous_page = TransactionView(paged_request).list()
+
+        assert [row.id for row in previous_page["transactions"]] == [
+            example_transactions[1].id,
+        ]
+        assert previous_page["previous_cursor"] is None
+        assert previous_page["next_cursor"] is not None
+
+    @pytest.fixture
+    def undated_transactions(self, dbsession_for_unittest, paged_request):
+        """Add two transactions without a creation time, after the others."""
+        from sqlalchemy import update
+        from heath.models.transaction import Transaction
+        undated = [
+            Transaction(description=description, amount=1)
+            for description in ("First undated", "Second undated")
+        ]
+        dbsession_for_unittest.add_all(undated)
+        dbsession_for_unittest.flush()
+        # The ORM would fill in the default for None.
+        dbsession_for_unittest.execute(update(Transaction).where(
+            Transaction.id.in_([row.id for row in undated]),
+        ).values(created=None))
+
+    def walk_pages(self, request, direction="after"):
+        """Return the ids of the pages from the request on."""
+        from heath.views.transactions import TransactionView
+        cursor_key = {"after": "next_cursor", "before": "previous_cursor"}
+        pages = []
+        while True:
+            page = TransactionView(request).list()
+            pages.append([row.id for row in page["transactions"]])
+            if page[cursor_key[direction]] is None:
+                return pages
+            request.GET.pop("after", None)
+            request.GET.pop("before", None)
+            request.GET[direction] = page[cursor_key[direction]]
+
+    @pytest.mark.parametrize("sort, expected", [
+        # SQLite sorts NULL before other values.
+        ("created", [[3], [4], [1], [2]]),
+        ("-created", [[2], [1], [4], [3]]),
+    ])
+    def test_pages_include_undated_transactions(
+        self,
+        paged_request,
+        undated_transactions,
+        sort,
+        expected,
+    ):
+        paged_request.GET["sort"] = sort
+
+        pages = self.walk_pages(paged_request)
+
+        assert pages == expected
+
+    @pytest.mark.parametrize("sort", ["created", "-created"])
+    def test_previous_pages_include_undated_transactions(
+        self,
+        paged_request,
+        undated_transactions,
+        sort,
+    ):
+        paged_request.GET["sort"] = sort
+        forward = self.walk_pages(paged_request)
+
+        backward = self.walk_pages(paged_request, "before")
+
+        assert backward == list(reversed(forward))
+
+    def test_invalid_cursor_leads_to_bad_request(self, paged_request):
+        paged_request.GET["after"] = "not-a-cursor"
+
+        from pyramid.httpexceptions import HTTPBadRequest
+        from heath.views.transactions import TransactionView
+        with pytest.raises(HTTPBadRequest):
+            TransactionView(paged_request).list()
+
+
+class TestTransactionListFilters(object):
+    """Unit tests for filtering and sorting the list view."""
+
+    def test_amount_range_filters_transactions(
+        self,
+        dummy_get_request,
+        example_transactions,
+    ):
+        dummy_get_request.GET["min_amount"] = "0"
+        dummy_get_request.GET["max_amount"] = "100"
+
+        from heath.views.transactions import TransactionView
+        response = TransactionView(dummy_get_request).list()
+
+        assert [row.id for row in response["transactions"]] == [
+            example_transactions[0].id,
+        ]
+        assert response["budget"] == 100.0
+        assert response["filter_params"] == {
+            "min_amount": "0",
+            "max_amount": "100",
+        }
+
+    def test_sort_by_amount(self, dummy_get_request, example_transactions):
+        dummy_get_request.GET["sort"] = "amount"
+
+        from heath.views.transactions import TransactionView
+        response = TransactionView(dummy_get_request).list()
+
+        amounts = [row.amount for row in response["transactions"]]
+        assert amounts == sorted(amounts)
+        assert response["budget"] == 60.0
+
+    def test_unknown_sort_leads_to_bad_request(self, dummy_get_request):
+        dummy_get_request.GET["sort"] = "description"
+
+        from pyramid.httpexceptions import HTTPBadRequest
+        from heath.views.transactions import TransactionView
+        with pytest.raises(HTTPBadRequest):
+            TransactionView(dummy_get_request).list()
+
+    def test_cursor_of_other_sort_leads_to_bad_request(
+        self,
+        dummy_get_request,
+        example_transactions,
+    ):
+        dummy_get_request.registry.settings["heath.page_size"] = 1
+        from heath.views.transactions import TransactionView
+        first_page = TransactionView(dummy_get_request).list()
+
+        dummy_get_request.GET["after"] = first_page["next_cursor"]
+        dummy_get_request.GET["sort"] = "-amount"
+        from pyramid.httpexceptions import HTTPBadRequest
+        with pytest.raises(HTTPBadRequest):
+            TransactionView(dummy_get_request).list()
+
+
 class TestTransactionDetailView(object):
     """Tests for the transaction detail view."""
 
@@ -403,3 +611,39 @@ class TestTransactionDeleteView(object):
 
         from pyramid.httpexceptions import HTTPFound
         assert isinstance(response, HTTPFound)
+
+    def test_deletion_updates_budget(
+        self,
+        dummy_post_request,
+        example_transactions,
+        dbsession_for_unittest,
+    ):
+        dummy_post_request.POST["delete.confirm"] = "delete.confirm"
+        dummy_post_request.matchdict["transaction_id"] = 1
+
+        from heath.models import ledger
+        from heath.views.transactions import TransactionView
+        TransactionView(dummy_post_request).delete_post()
+
+        assert ledger.get_budget(dbsession_for_unittest) == -40
+        assert ledger.check(dbsession_for_unittest.connection()) == []
+
+    def test_confirmed_deletion_of_missing_transaction(
+        self,
+        dummy_post_request,
+    ):
+        dummy_post_request.POST["delete.confirm"] = "delete.confirm"
+        dummy_post_request.matchdict["transaction_id"] = 1
+
+        from pyramid.httpexceptions import HTTPNotFound
+        from heath.views.transactions import TransactionView
+        with pytest.raises(HTTPNotFound):
+            TransactionView(dummy_post_request).delete_post()
+
+    def test_non_integer_id_is_not_found(self, dummy_get_request):
+        dummy_get_request.matchdict["transaction_id"] = "one"
+
+        from pyramid.httpexceptions import HTTPNotFound
+        from heath.views.transactions import TransactionView
+        with pytest.raises(HTTPNotFound):
+            TransactionView(dummy_get_request).delete_get()